@@ -24,15 +24,17 @@ from tools import (
 
 
 class Agent:
-    def __init__(self, robot_name, model="gpt-4o") -> None:
+    def __init__(self, robot_name, model="gpt-4o", llm=None) -> None:
         self.model = model
+        # AsyncLLMClient of the episode (llm.py), None for the process default
+        self.llm = llm
         self.robot_name = robot_name
         self.memory = []
 
 
 class CommunicationAgent(Agent):
-    def __init__(self, robot_name, all_rooms, mode="Act", model="gpt-4o") -> None:
-        super().__init__(robot_name, model)
+    def __init__(self, robot_name, all_rooms, mode="Act", model="gpt-4o", llm=None) -> None:
+        super().__init__(robot_name, model, llm)
         self.phase = 0  # 0: Plan, 1: Goal Update
         if "plan" in mode.lower():
             self.mode = "Plan_then_Act"
@@ -89,7 +91,7 @@ class CommunicationAgent(Agent):
             goal=purpose,
             all_rooms=self.all_rooms,
         )
-        response = completion(plan_prompt)["response"].lower()
+        response = completion(plan_prompt, llm=self.llm)["response"].lower()
         facts = parse_json_from_response(response, "facts")
         plan = parse_json_from_response(response, "plan")
         if isinstance(plan, str):
@@ -149,7 +151,7 @@ class CommunicationAgent(Agent):
             facts=facts_str,
             all_rooms=self.all_rooms,
         )
-        response = completion(communicate_prompt)["response"]
+        response = completion(communicate_prompt, llm=self.llm)["response"]
 
         messages = [{"role": "user", "content": communicate_prompt}]
         for i in range(5):
@@ -172,7 +174,7 @@ class CommunicationAgent(Agent):
                 guidence_str = (
                     f"Your last answer: {contents} not fit the format. 'contents' is a list of json!\n Check your output format, and try again.")
                 messages.append({"role": "user", "content": guidence_str})
-                response = chat_completion(messages, 0.7)["response"] 
+                response = chat_completion(messages, 0.7, self.llm)["response"] 
         return contents
 
 
@@ -206,7 +208,7 @@ class CommunicationAgent(Agent):
             facts=facts_str,
             all_rooms=self.all_rooms,
         )
-        response = completion(goal_update_prompt)["response"]
+        response = completion(goal_update_prompt, llm=self.llm)["response"]
         facts = parse_json_from_response(response, "facts")
         updated_goals = parse_json_from_response(response, "plan")
         self.goal = updated_goals
@@ -277,8 +279,8 @@ class CommunicationAgent(Agent):
 
 
 class ActionAgent(Agent):
-    def __init__(self, robot_name, model="gpt-4o") -> None:
-        super().__init__(robot_name, model)
+    def __init__(self, robot_name, model="gpt-4o", llm=None) -> None:
+        super().__init__(robot_name, model, llm)
         self.action_prompt = action_prompt_template
 
     def act(
@@ -292,7 +294,8 @@ class ActionAgent(Agent):
         scene_graph,
         misplaced_objects,
         item_mapper,
-        rooms
+        rooms,
+        client=None,
     ):
         action_space_str = "\n".join(action_space)
         prompt = self.action_prompt.format(
@@ -312,7 +315,7 @@ class ActionAgent(Agent):
         print(f"{self.robot_name}\n{action_space_str}\n")
 
         messages = [{"role": "user", "content": prompt}]
-        response = completion(prompt)["response"]
+        response = completion(prompt, llm=self.llm)["response"]
         for i in range(5):
             action = parse_json_from_response(response, "action")
             try:
@@ -329,7 +332,7 @@ class ActionAgent(Agent):
                     f"Your last answer action: {action} \nNot find in action space. \nYou should keep '[]' and '<>' in your output and replace content within it, eg. [explore] <roomA>, [gopick] <apple>, [goplace] <table>, [gopull] <bed>, [stop]\nTry again."
                 )
                 messages.append({"role": "user", "content": guidence_str})
-                response = chat_completion(messages, 0.7)["response"]
+                response = chat_completion(messages, 0.7, self.llm)["response"]
             
             if i == 4:
                 action = "[wait]"
@@ -352,7 +355,7 @@ class ActionAgent(Agent):
                     possible_object=misplaced_objects_str
                 )
                 messages = [{"role": "user", "content": prompt}]
-                response = completion(prompt)["response"]
+                response = completion(prompt, llm=self.llm)["response"]
                 for i in range(5):
                     trapped_object = parse_json_from_response(response, "target_object")
                     if trapped_object in misplaced_objects:
@@ -363,11 +366,11 @@ class ActionAgent(Agent):
                         guidence_str = (
                             f"Your last answer object: {trapped_object},  not in possible object.")
                         messages.append({"role": "user", "content": guidence_str})
-                        response = chat_completion(messages, 0.7)["response"]
+                        response = chat_completion(messages, 0.7, self.llm)["response"]
 
                     if i == 4:
                         trapped_object = random.choice(misplaced_objects)
-                direction = get_moving_direction(item_mapper.get_env_object_id(movable_object), item_mapper.get_env_object_id(trapped_object))
+                direction = get_moving_direction(item_mapper.get_env_object_id(movable_object), item_mapper.get_env_object_id(trapped_object), client=client)
                 action = f"[gopull] <{movable_object}> {str(direction)}"
         
         print(f"{self.robot_name} action: {action}")
@@ -375,8 +378,8 @@ class ActionAgent(Agent):
 
 
 class ObservationAgent(Agent):
-    def __init__(self, robot_name, model="gpt-4o") -> None:
-        super().__init__(robot_name, model)
+    def __init__(self, robot_name, model="gpt-4o", llm=None) -> None:
+        super().__init__(robot_name, model, llm)
         self.misplaced_detect_prompt = misplaced_detect_prompt
         self.misplaced_object_container_reason_prompt = (
             misplaced_object_container_reason_prompt
@@ -398,7 +401,7 @@ class ObservationAgent(Agent):
         prompt = self.misplaced_detect_prompt.format(
             obj_and_description=obs_str,
         )
-        response = completion(prompt)["response"]
+        response = completion(prompt, llm=self.llm)["response"]
         misplaced_obj = parse_json_from_response(response, "misplaced_object")
         return misplaced_obj
 
@@ -417,7 +420,7 @@ class ObservationAgent(Agent):
             obj_and_container=json.dumps(obj_and_container, indent=4),
             known_container=known_obj,
         )
-        response = completion(prompt)["response"]
+        response = completion(prompt, llm=self.llm)["response"]
         updated_obj_and_container = parse_json_from_response(
             response, "updated_obj_and_container"
         )
@@ -494,8 +497,8 @@ class ObservationAgent(Agent):
 
 
 class RelfectionAgent(Agent):
-    def __init__(self, robot_name, model="gpt-4o") -> None:
-        super().__init__(robot_name, model)
+    def __init__(self, robot_name, model="gpt-4o", llm=None) -> None:
+        super().__init__(robot_name, model, llm)
         self.success_reflection_prompt = success_reflection_prompt
         self.failed_reflection_prompt = failed_reflection_prompt
 
@@ -517,7 +520,7 @@ class RelfectionAgent(Agent):
                 dialogue_history="\n".join(dialogue),
                 action=action,
             )
-            response = completion(reflection_prompt)["response"]
+            response = completion(reflection_prompt, llm=self.llm)["response"]
             comm_flag = parse_json_from_response(response, "comm_flag")
             comm_goal = parse_json_from_response(response, "comm_goal")
 
@@ -530,7 +533,7 @@ class RelfectionAgent(Agent):
                 action=action,
                 feedback=feedback,
             )
-            response = completion(reflection_prompt)["response"]
+            response = completion(reflection_prompt, llm=self.llm)["response"]
             reflection = parse_json_from_response(response, "reflection")
             solution = parse_json_from_response(response, "solution")
             comm_flag = parse_json_from_response(response, "comm_flag")
@@ -540,8 +543,8 @@ class RelfectionAgent(Agent):
 
 
 class ProgressAgent(Agent):
-    def __init__(self, robot_name, model="gpt-4o"):
-        super().__init__(robot_name, model)
+    def __init__(self, robot_name, model="gpt-4o", llm=None):
+        super().__init__(robot_name, model, llm)
         self.comm_task_evaluation_prompt = comm_task_evaluation_prompt
 
     def after_comm(
@@ -560,7 +563,7 @@ class ProgressAgent(Agent):
             action_history=action_history,
             dialogue_history=dialogue_history,
         )
-        response = completion(prompt)["response"]
+        response = completion(prompt, llm=self.llm)["response"]
         try:
             response = response.split("```json")[1].split("```")[0]
         except Exception as e:
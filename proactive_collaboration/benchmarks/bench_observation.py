@@ -0,0 +1,134 @@
+"""
+Benchmark the observation policies of Env.goto_point.
+
+One robot of a dataset episode walks the same routes (from its start location through
+the explore points of the scene, in a random order) once per policy. The report gives the
+wall time of the walks, the observations per waypoint and, from a second pass with
+audit=True, the recall of the sampled observations against observing every waypoint.
+
+Policies are "key=value,..." ObservationPolicy kwargs, e.g. "every=10,heading_change=45".
+
+Run from proactive_collaboration/ against a simulator (or robot_skill_sets/unity/sim_server.py):
+    python benchmarks/bench_observation.py --remote-url http://127.0.0.1:7210/ --dataset datasets/dataset_s0_72.json
+    python benchmarks/bench_observation.py --remote-url http://127.0.0.1:7210/ --policies every=1 every=5 every=10,heading_change=45
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "robot_skill_sets"))
+
+from constants import EXPLOREPOINTS
+from env import Env
+from episode_context import EpisodeContext
+from observation_policy import ObservationPolicy
+from unity.ue_api import robot_teleport
+
+DEFAULT_POLICIES = ["every=1", "every=5", "every=10", "every=10,heading_change=45"]
+
+
+def parse_policy(spec):
+    """ObservationPolicy kwargs of "every=10,room_change=0,heading_change=45"."""
+    kwargs = {}
+    for item in filter(None, spec.split(",")):
+        key, value = item.split("=")
+        if key == "room_change":
+            kwargs[key] = value.lower() not in ("0", "false", "no")
+        elif key == "every":
+            kwargs[key] = int(value)
+        else:
+            kwargs[key] = float(value)
+    return kwargs
+
+
+def walk_targets(scene_index, walks, seed=0):
+    points = [point for room_points in EXPLOREPOINTS.get(scene_index, {}).values() for point in room_points]
+    rng = random.Random(seed)
+    return [rng.choice(points) for _ in range(walks)] if points else []
+
+
+def run_walks(context, robot_config, targets, policy):
+    """
+    Walk the robot from its start location through `targets` with `policy`.
+
+    Returns:
+        tuple: (seconds of the goto_point calls, observed object names, policy summary)
+    """
+    robot_name = robot_config["name"]
+    env = Env({robot_name: robot_config}, [robot_name], context.scene_index, context=context, observation_policy=policy)
+    # the robot is placed and the scene reset without the log noise of a real episode
+    with contextlib.redirect_stdout(io.StringIO()):
+        env.init_scene(context.scene_index)
+        env.set_robot([robot_name])
+        robot_teleport(
+            {robot_name: {"location": robot_config["init_location"], "rotation": robot_config["init_rotation"]}},
+            client=env.client,
+        )
+        env.get_current_coordinate(robot_name)
+    seconds = 0.0
+    observed = set()
+    for target in targets:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, messages = env.goto_point(robot_name, target)
+        seconds += time.perf_counter() - start
+        observed.update(messages)
+    return seconds, observed, policy.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote-url", required=True)
+    parser.add_argument("--dataset", default=None, help="default: datasets/dataset_s<scene>_72.json")
+    parser.add_argument("--scene", default="0")
+    parser.add_argument("--episode", type=int, default=0, help="episode whose first team robot walks")
+    parser.add_argument("--walks", type=int, default=10)
+    parser.add_argument("--policies", nargs="*", default=DEFAULT_POLICIES)
+    parser.add_argument("--no-audit", action="store_true", help="skip the recall pass")
+    parser.add_argument("--save", default=None, help="save the results as json")
+    args = parser.parse_args()
+
+    context = EpisodeContext(args.remote_url, args.scene, dataset=args.dataset)
+    with open(context.dataset, "r") as f:
+        episode = json.load(f)[args.episode]
+    robot_name = episode["robot_team"][0]
+    robot_config = dict(episode["robot_pool"][robot_name], name=robot_name)
+    targets = walk_targets(context.scene_index, args.walks)
+    if not targets:
+        sys.exit("no explore points for scene %s" % context.scene_index)
+
+    results = {}
+    baseline_seconds = None
+    print("%-30s %9s %9s %11s %9s %8s" % ("policy", "seconds", "speedup", "obs/waypt", "objects", "recall"))
+    for spec in args.policies:
+        kwargs = parse_policy(spec)
+        seconds, observed, summary = run_walks(context, robot_config, targets, ObservationPolicy(**kwargs))
+        if baseline_seconds is None:
+            baseline_seconds = seconds
+        recall = None
+        if not args.no_audit and kwargs.get("every", 1) > 1:
+            _, _, audited = run_walks(context, robot_config, targets, ObservationPolicy(audit=True, **kwargs))
+            recall = audited["recall"]
+        results[spec] = {"seconds": seconds, "objects": len(observed), "recall": recall, "stats": summary}
+        print(
+            "%-30s %9.2f %8.1fx %11.2f %9d %8s"
+            % (
+                spec,
+                seconds,
+                baseline_seconds / seconds if seconds else 0.0,
+                summary["observation_rate"] or 0.0,
+                len(observed),
+                "-" if recall is None else "%.3f" % recall,
+            )
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
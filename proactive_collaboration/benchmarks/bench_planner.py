@@ -0,0 +1,169 @@
+"""
+Benchmark the Oracle path planners on the reachable grid of every scene.
+
+Compares the original float BFS with the integer grid BFS and A* of planner.py on the
+same random start / goal pairs, and checks that they agree (same path for bfs, same
+path length for astar). Also checks that Oracle picks the same nearest (connected)
+reachable point as the original scan over the reachable point set, ties included.
+
+Run from proactive_collaboration/:
+    python benchmarks/bench_planner.py                      # grids from the simulator
+    python benchmarks/bench_planner.py --save-grids grids/  # ... and keep them
+    python benchmarks/bench_planner.py --grids grids/       # offline, from saved grids
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "robot_skill_sets"))
+
+from oracle import Oracle
+from reachable_grid import ReachableGrid
+
+SCENES = [str(i) for i in range(10)]
+GRID_SIZE = 0.1
+
+
+def load_grid(scene, grids_dir=None, save_dir=None):
+    """Raw reachable points of `scene`, from `grids_dir` or from the simulator."""
+    if grids_dir is not None:
+        path = os.path.join(grids_dir, "scene_%s.json" % scene)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+    from unity.ue_api import get_reachable_points, select_scene
+
+    select_scene(scene)
+    time.sleep(2)
+    raw_points = get_reachable_points({"step_size": GRID_SIZE})["reachable_point"]
+    if save_dir is not None:
+        os.makedirs(save_dir, exist_ok=True)
+        with open(os.path.join(save_dir, "scene_%s.json" % scene), "w") as f:
+            json.dump(raw_points, f)
+    return raw_points
+
+
+def nearest_reference(reachable_points, position, connected=None):
+    """
+    The original Oracle.get_nearest_(connected_)reachable_point: the first point of the set
+    scan strictly nearer than the ones before (and in `connected`, the points reachable
+    from the start, if given).
+    """
+    approx_target = None
+    least_dist = 1e10
+    for p in reachable_points:
+        dist = np.linalg.norm(np.array(p) - np.array(position))
+        if dist < least_dist and (connected is None or p in connected):
+            least_dist = dist
+            approx_target = p
+    return approx_target
+
+
+def reachable_from(reachable_points, start):
+    """Points of `reachable_points` connected to `start` by 4-neighbour moves."""
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, z = queue.popleft()
+        for dx, dz in ((GRID_SIZE, 0), (-GRID_SIZE, 0), (0, GRID_SIZE), (0, -GRID_SIZE)):
+            point = (np.round(x + dx, 3), np.round(z + dz, 3))
+            if point in reachable_points and point not in seen:
+                seen.add(point)
+                queue.append(point)
+    return seen
+
+
+def nearest_mismatches(raw_points, oracle, queries, seed=0):
+    """Targets (cells, half cells and points off the grid) where Oracle's choice differs."""
+    reachable_points = set()
+    for point in raw_points:
+        x, _, z = eval(point) if isinstance(point, str) else point
+        reachable_points.add((x, z))
+    rng = random.Random(seed)
+    points = sorted(reachable_points)
+    mismatches = 0
+    for _ in range(queries):
+        start = rng.choice(points)
+        base = rng.choice(points)
+        target = (
+            round(base[0] + rng.choice([0, 0.05, -0.05, 0.5, -1.05]), 3),
+            round(base[1] + rng.choice([0, 0.05, -0.05, 0.35, 1.05]), 3),
+        )
+        expected = (
+            nearest_reference(reachable_points, target),
+            nearest_reference(reachable_points, target, reachable_from(reachable_points, start)),
+        )
+        got = (
+            oracle.get_nearest_reachable_point(target),
+            oracle.get_nearest_connected_reachable_point(target, start),
+        )
+        if got != expected:
+            mismatches += 1
+    return mismatches
+
+
+def bench_scene(raw_points, pairs, seed=0):
+    grid = ReachableGrid(raw_points, GRID_SIZE)
+    oracles = {
+        name: Oracle(grid, GRID_SIZE, 0.2, planner=name)
+        for name in ("float_bfs", "bfs", "astar")
+    }
+    points = sorted(grid.points)
+    rng = random.Random(seed)
+    queries = [(rng.choice(points), rng.choice(points)) for _ in range(pairs)]
+
+    timings = {}
+    paths = {}
+    for name, oracle in oracles.items():
+        start_time = time.perf_counter()
+        paths[name] = [oracle.shortest_path(s, e) for s, e in queries]
+        timings[name] = time.perf_counter() - start_time
+
+    mismatches = 0
+    for reference, bfs, astar in zip(paths["float_bfs"], paths["bfs"], paths["astar"]):
+        if bfs != reference or len(astar) != len(reference):
+            mismatches += 1
+    mismatches += nearest_mismatches(raw_points, oracles["bfs"], pairs, seed)
+    return len(grid), timings, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grids", default=None, help="directory of scene_<id>.json reachable points")
+    parser.add_argument("--save-grids", default=None, help="save the fetched grids to this directory")
+    parser.add_argument("--scenes", nargs="*", default=SCENES)
+    parser.add_argument("--pairs", type=int, default=50, help="random start / goal pairs per scene")
+    args = parser.parse_args()
+
+    print("%-6s %7s %12s %12s %12s %8s %8s" % ("scene", "cells", "float_bfs ms", "bfs ms", "astar ms", "speedup", "mismatch"))
+    for scene in args.scenes:
+        raw_points = load_grid(scene, args.grids, args.save_grids)
+        if not raw_points:
+            print("%-6s no grid" % scene)
+            continue
+        cells, timings, mismatches = bench_scene(raw_points, args.pairs)
+        per_query = {name: 1000 * t / args.pairs for name, t in timings.items()}
+        best = min(per_query["bfs"], per_query["astar"])
+        print(
+            "%-6s %7d %12.2f %12.2f %12.2f %7.0fx %8d"
+            % (
+                scene,
+                cells,
+                per_query["float_bfs"],
+                per_query["bfs"],
+                per_query["astar"],
+                per_query["float_bfs"] / max(best, 1e-9),
+                mismatches,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
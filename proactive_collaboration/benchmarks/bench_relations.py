@@ -0,0 +1,167 @@
+"""
+Benchmark ultilities.parse_relations on get_object_neighbors payloads.
+
+The payloads are the get_object_neighbors responses of recorded simulator traces
+(TrafficRecorder, traces/<run>/<scene>/dataset_<id>.jsonl.gz) and, to also cover dense
+neighborhoods, random payloads. Every payload is parsed with parse_relations and with the
+original pairwise implementation kept below, the run fails if any relation differs.
+
+Run from proactive_collaboration/:
+    python benchmarks/bench_relations.py --traces traces/120_ours/0
+    python benchmarks/bench_relations.py --synthetic 2000 --max-neighbors 26
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "robot_skill_sets"))
+
+from ultilities import parse_relations
+
+ENDPOINT = "v1/info/get_object_neighbors"
+
+
+def parse_relations_reference(object_neighbors):
+    """parse_relations before the offset join: every neighbor against every other one."""
+    relations = {}
+
+    for obj, neighbors in object_neighbors.items():
+        if obj in ["error_info", "is_success"]:  # Skip non-object keys
+            continue
+
+        on_relations = set()
+        between_relations = set()
+
+        for rel_pos, neighbor in neighbors.items():
+            rel_pos_tuple = tuple(map(float, rel_pos.strip("()").split(",")))
+
+            if rel_pos_tuple == (0.0, -1.0, 0.0):
+                on_relations.add(neighbor)
+
+            for other_rel_pos, other_neighbor in neighbors.items():
+                if neighbor == other_neighbor or other_neighbor == obj:
+                    continue
+
+                other_rel_pos_tuple = tuple(map(float, other_rel_pos.strip("()").split(",")))
+
+                if rel_pos_tuple[0] == -other_rel_pos_tuple[0] and rel_pos_tuple[1:] == other_rel_pos_tuple[1:]:
+                    between_relations.add(tuple(sorted([neighbor, other_neighbor])))
+
+                if rel_pos_tuple[2] == -other_rel_pos_tuple[2] and rel_pos_tuple[:2] == other_rel_pos_tuple[:2]:
+                    between_relations.add(tuple(sorted([neighbor, other_neighbor])))
+
+        relations[obj] = {
+            "on": list(on_relations),
+            "between": list(between_relations),
+        }
+
+    return relations
+
+
+def trace_payloads(paths):
+    """get_object_neighbors responses of the traces in `paths` (files or directories)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".jsonl.gz"))
+        else:
+            files.append(path)
+    payloads = []
+    for path in files:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry["endpoint"] == ENDPOINT and isinstance(entry["response"], dict):
+                        payloads.append(entry["response"])
+    return payloads
+
+
+def synthetic_payloads(count, max_objects=8, max_neighbors=12, seed=0):
+    """Random payloads: neighbors at (half) unit offsets, with the key formats of the simulator."""
+    rng = random.Random(seed)
+    steps = [-1, -0.5, 0, 0.5, 1]
+    offsets = [offset for offset in itertools.product(steps, [-1, 0, 1], steps) if offset != (0, 0, 0)]
+    names = ["%s_%02d" % (kind, i) for kind in ("Table", "Chair", "Book", "Cup", "Sofa", "Lamp") for i in range(6)]
+    payloads = []
+    for _ in range(count):
+        payload = {"is_success": True}
+        for obj in rng.sample(names, rng.randint(1, max_objects)):
+            neighbors = {}
+            for offset in rng.sample(offsets, rng.randint(0, max_neighbors)):
+                key = "(%s)" % ", ".join(
+                    str(value) if rng.random() < 0.5 else str(float(value)) for value in offset
+                )
+                # sometimes the object itself or a neighbor seen at several offsets
+                neighbors[key] = obj if rng.random() < 0.05 else rng.choice(names[:12])
+            payload[obj] = neighbors
+        payloads.append(payload)
+    return payloads
+
+
+def normalized(relations):
+    return {
+        obj: (sorted(relation["on"]), sorted(relation["between"]))
+        for obj, relation in relations.items()
+    }
+
+
+def time_calls(function, payloads, repeat):
+    """Best time of `repeat` passes of `function` over `payloads`, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            function(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--traces", nargs="*", default=[], help="trace files or directories")
+    parser.add_argument("--synthetic", type=int, default=1000, help="number of random payloads")
+    parser.add_argument("--max-neighbors", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sets = {}
+    if args.traces:
+        sets["recorded"] = trace_payloads(args.traces)
+    if args.synthetic:
+        sets["synthetic"] = synthetic_payloads(args.synthetic, max_neighbors=args.max_neighbors)
+
+    mismatches = 0
+    print("%-10s %8s %10s %12s %12s %8s" % ("payloads", "count", "neighbors", "pairwise us", "join us", "speedup"))
+    for name, payloads in sets.items():
+        if not payloads:
+            print("%-10s no get_object_neighbors calls" % name)
+            continue
+        for payload in payloads:
+            if normalized(parse_relations(payload)) != normalized(parse_relations_reference(payload)):
+                mismatches += 1
+                if mismatches <= 3:
+                    print("MISMATCH", json.dumps(payload))
+        neighbors = sum(len(value) for payload in payloads for value in payload.values() if isinstance(value, dict))
+        reference = time_calls(parse_relations_reference, payloads, args.repeat)
+        joined = time_calls(parse_relations, payloads, args.repeat)
+        print(
+            "%-10s %8d %10d %12.1f %12.1f %7.1fx"
+            % (
+                name,
+                len(payloads),
+                neighbors,
+                reference / len(payloads) * 1e6,
+                joined / len(payloads) * 1e6,
+                reference / joined,
+            )
+        )
+
+    print("mismatches: %d" % mismatches)
+    sys.exit(1 if mismatches else 0)
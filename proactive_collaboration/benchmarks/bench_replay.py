@@ -0,0 +1,131 @@
+"""
+Check that a recorded multi-robot episode replays from its trace (ue_api.TrafficReplayer).
+
+The team of a dataset episode explores the rooms of the scene for a few co_act ticks
+while the simulator traffic is recorded, then the same ticks are replayed from the trace
+several times, each replayed call delayed by a random jitter so the robots' threads
+interleave (and batch their observation calls) differently than when recording. The run
+fails on any replay miss or if a replayed tick gives other action results than recorded.
+
+Run from proactive_collaboration/ against a simulator (or robot_skill_sets/unity/sim_server.py):
+    python benchmarks/bench_replay.py --remote-url http://127.0.0.1:7210/ --dataset datasets/dataset_s0_72.json
+    python benchmarks/bench_replay.py --remote-url http://127.0.0.1:7210/ --ticks 8 --runs 5 --jitter 0.02
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "robot_skill_sets"))
+
+from env import Env
+from episode_context import EpisodeContext
+from unity.ue_api import ReplayMiss, start_traffic, stop_traffic
+
+
+def tick_actions(env, robots, tick):
+    """Every robot explores a room with explore points, a different one per robot and tick."""
+    rooms = sorted(room for room in env.robot_map[robots[0]]["robot_explore_map"] if room in env.rooms)
+    return {robot: "[explore] <%s>" % rooms[(i + tick) % len(rooms)] for i, robot in enumerate(robots)}
+
+
+def run_episode(context, robot_pool, robots, ticks):
+    """
+    Results of `ticks` co_act ticks of the team, one json string per tick.
+
+    Returns:
+        tuple: (tick results, seconds)
+    """
+    env = Env(robot_pool, list(robots), context.scene_index, context=context)
+    results = []
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            env.init_scene(context.scene_index)
+            env.set_robot(list(robots))
+            for tick in range(ticks):
+                action_result = env.co_act(tick_actions(env, robots, tick))
+                results.append(json.dumps(action_result, sort_keys=True, default=str))
+    finally:
+        env.close()
+    return results, time.perf_counter() - start
+
+
+def jitter_replay(client, jitter, seed):
+    """Delay every replayed call of `client` by a random time up to `jitter` seconds."""
+    rng = random.Random(seed)
+    post = client.replayer.post
+
+    def delayed(suffix, payload):
+        time.sleep(rng.random() * jitter)
+        return post(suffix, payload)
+
+    client.replayer.post = delayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote-url", required=True)
+    parser.add_argument("--dataset", default=None, help="default: datasets/dataset_s<scene>_72.json")
+    parser.add_argument("--scene", default="0")
+    parser.add_argument("--episode", type=int, default=0)
+    parser.add_argument("--robots", type=int, default=4, help="team size, robots of the pool beyond the team fill it up")
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="replays of the recorded trace")
+    parser.add_argument("--jitter", type=float, default=0.01, help="max delay in seconds of a replayed call")
+    parser.add_argument("--trace", default=None, help="default: a temporary file")
+    args = parser.parse_args()
+
+    context = EpisodeContext(args.remote_url, args.scene, dataset=args.dataset)
+    with open(context.dataset, "r") as f:
+        episode = json.load(f)[args.episode]
+    robot_pool = {name: dict(config, name=name) for name, config in episode["robot_pool"].items()}
+    robots = (list(episode["robot_team"]) + [name for name in robot_pool if name not in episode["robot_team"]])[
+        : args.robots
+    ]
+    if len(robots) < 2:
+        sys.exit("episode %d has a single robot, a multi-robot episode is needed" % args.episode)
+    trace = args.trace or os.path.join(tempfile.mkdtemp(), "bench_replay.jsonl.gz")
+
+    start_traffic("record", trace, remote_url=args.remote_url)
+    try:
+        recorded, seconds = run_episode(context, robot_pool, robots, args.ticks)
+    finally:
+        stats = stop_traffic(remote_url=args.remote_url)
+    print(
+        "recorded %d ticks of %s: %d calls, %.2fs -> %s"
+        % (args.ticks, ", ".join(robots), stats["total"]["calls"], seconds, trace)
+    )
+
+    failures = 0
+    print("%-5s %8s %8s %10s %9s" % ("run", "seconds", "calls", "mismatch", "misses"))
+    for run in range(args.runs):
+        client = start_traffic("replay", trace, remote_url=args.remote_url)
+        jitter_replay(client, args.jitter, run)
+        error = None
+        try:
+            replayed, seconds = run_episode(context, robot_pool, robots, args.ticks)
+        except ReplayMiss as e:
+            replayed, seconds, error = [], 0.0, e
+        finally:
+            stats = stop_traffic(remote_url=args.remote_url)
+        mismatches = [tick for tick, result in enumerate(recorded) if tick >= len(replayed) or replayed[tick] != result]
+        print(
+            "%-5d %8.2f %8d %10d %9d"
+            % (run, seconds, stats["total"]["calls"], len(mismatches), stats["misses"])
+        )
+        if error is not None:
+            print("MISS", error)
+        elif mismatches:
+            print("MISMATCH tick %d" % mismatches[0])
+        failures += len(mismatches) + stats["misses"]
+
+    print("failures: %d" % failures)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,94 @@
+"""
+Benchmark RoomIndex against the per-room is_point_in_quadrilateral loop of Env.
+
+For every scene of cfg/constants.json the points are the 0.1 m lattice robots stand on
+(coordinates rounded like ReachableGrid.coords) over the bounding box of the rooms, the
+room polygon vertices and random points. Every point is classified with RoomIndex, with
+RoomIndex baked on a grid of the lattice, and with the original loop (first room of EDGES
+whose polygon contains the point, else "hallway"); the run fails if any room differs.
+
+Run from proactive_collaboration/:
+    python benchmarks/bench_rooms.py
+    python benchmarks/bench_rooms.py --scenes 0 1 --random 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "robot_skill_sets"))
+
+from reachable_grid import ReachableGrid
+from room_index import RoomIndex
+from ultilities import is_point_in_quadrilateral
+
+DEFAULT_CONSTANTS = os.path.join(os.path.dirname(ROOT), "cfg", "constants.json")
+
+
+def reference_room(rooms, point):
+    """Room of an (x, z) point as Env.get_robot_room computed it."""
+    for name, polygon in rooms.items():
+        if is_point_in_quadrilateral(polygon, point):
+            return name
+    return "hallway"
+
+
+def scene_points(rooms, grid_size=0.1, count=0, seed=0):
+    """(lattice points, vertices, random points) of a scene, as lists of [x, z]."""
+    corners = np.asarray([vertex for polygon in rooms.values() for vertex in polygon], dtype=float)
+    low = np.floor(corners.min(axis=0) / grid_size).astype(int) - 2
+    high = np.ceil(corners.max(axis=0) / grid_size).astype(int) + 2
+    cells = np.stack(
+        np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing="ij"), axis=-1
+    ).reshape(-1, 2)
+    lattice = np.round(cells * grid_size, 3).tolist()
+    vertices = corners.tolist()
+    rng = np.random.default_rng(seed)
+    random_points = rng.uniform(corners.min(axis=0) - 0.5, corners.max(axis=0) + 0.5, size=(count, 2)).tolist()
+    return lattice, vertices, random_points
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--constants", default=DEFAULT_CONSTANTS)
+    parser.add_argument("--scenes", nargs="*", default=None, help="default: every scene with EDGES")
+    parser.add_argument("--random", type=int, default=5000, help="random points per scene")
+    args = parser.parse_args()
+
+    with open(args.constants, "r") as f:
+        edges = json.load(f)["EDGES"]
+    scenes = args.scenes or sorted(edges, key=str)
+
+    mismatches = 0
+    totals = {"reference": 0.0, "index": 0.0}
+    print("%-6s %-9s %8s %10s %8s" % ("scene", "points", "count", "mismatch", "baked"))
+    for scene in scenes:
+        rooms = edges[scene]
+        index = RoomIndex(rooms)
+        lattice, vertices, random_points = scene_points(rooms, count=args.random)
+        baked = RoomIndex(rooms).bake(ReachableGrid([[x, 0.0, z] for x, z in lattice], 0.1))
+        for name, points in (("lattice", lattice), ("vertices", vertices), ("random", random_points)):
+            start = time.perf_counter()
+            expected = [reference_room(rooms, point) for point in points]
+            totals["reference"] += time.perf_counter() - start
+            start = time.perf_counter()
+            got = index.rooms_of(points)
+            totals["index"] += time.perf_counter() - start
+            got_baked = baked.rooms_of(points)
+            wrong = [i for i, room in enumerate(expected) if got[i] != room]
+            wrong_baked = [i for i, room in enumerate(expected) if got_baked[i] != room]
+            for i in (wrong + wrong_baked)[: max(0, 3 - mismatches)]:
+                print("MISMATCH", scene, points[i], expected[i], got[i], got_baked[i])
+            mismatches += len(wrong) + len(wrong_baked)
+            print("%-6s %-9s %8d %10d %8d" % (scene, name, len(points), len(wrong), len(wrong_baked)))
+
+    print(
+        "reference %.3fs, room index %.3fs (%.0fx)"
+        % (totals["reference"], totals["index"], totals["reference"] / totals["index"] if totals["index"] else 0.0)
+    )
+    print("mismatches: %d" % mismatches)
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,133 @@
+"""
+Benchmark the import (startup) time of the agent modules.
+
+Every module is imported in fresh interpreters with `python -X importtime`, the report
+gives the median cumulative import time of the module, its heaviest dependencies, and
+the heavy packages (cv2, matplotlib, ...) it pulls in at import time although they are
+only needed by a few functions. Worker processes of a sweep (runner.py) pay this on
+every start, so a regression fails the run when compared with a saved baseline.
+
+Run from proactive_collaboration/:
+    python benchmarks/bench_startup.py                                # report
+    python benchmarks/bench_startup.py --save benchmarks/startup.json # ... and save a baseline
+    python benchmarks/bench_startup.py --baseline benchmarks/startup.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["unity.ue_api", "scene_cache", "llm", "communicator", "env", "tools", "main"]
+# packages that must not be imported by importing the modules above
+HEAVY = ["cv2", "matplotlib", "flask", "PIL", "tiktoken", "openai", "torch", "sklearn"]
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def import_profile(module, extra_paths=()):
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: {"total_us": cumulative import time of the module, "wall_s": interpreter
+            wall time, "imports": {package: cumulative us} of the imports of the module},
+            or {"error": last line of stderr} if the import failed.
+    """
+    paths = [os.path.join(ROOT, "robot_skill_sets")] + list(extra_paths)
+    code = "import sys; sys.path[1:1] = %r; import %s" % (paths, module)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    # a package is reported after its own imports: the subtree of the module is everything
+    # since the previous top-level entry (the interpreter startup, e.g. site)
+    imports = {}
+    subtree = {}
+    total = None
+    for line in proc.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if indent == "":
+            if name == module:
+                total, imports = int(cumulative), subtree
+            subtree = {}
+        else:
+            subtree[name] = max(subtree.get(name, 0), int(cumulative))
+    if proc.returncode != 0 or total is None:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else "exit code %d" % proc.returncode}
+    return {"total_us": total, "wall_s": wall, "imports": imports}
+
+
+def bench_module(module, repeat=5, extra_paths=()):
+    """Median import profile of `module` over `repeat` interpreters."""
+    runs = [import_profile(module, extra_paths) for _ in range(repeat)]
+    failed = [run for run in runs if "error" in run]
+    if failed:
+        return {"error": failed[0]["error"]}
+    imports = runs[-1]["imports"]
+    top_level = {name: us for name, us in imports.items() if "." not in name}
+    return {
+        "total_ms": statistics.median(run["total_us"] for run in runs) / 1000,
+        "wall_ms": statistics.median(run["wall_s"] for run in runs) * 1000,
+        "heaviest": sorted(top_level.items(), key=lambda item: -item[1])[:5],
+        "heavy_imports": sorted(name for name in HEAVY if name in imports),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: slower than tolerance, or new heavy imports."""
+    regressions = []
+    for module, result in results.items():
+        if "error" in result:
+            continue
+        if result["heavy_imports"]:
+            regressions.append("%s imports %s" % (module, ", ".join(result["heavy_imports"])))
+        before = baseline.get(module, {}).get("total_ms")
+        if before and result["total_ms"] > before * (1 + tolerance):
+            regressions.append(
+                "%s: %.1f ms > %.1f ms baseline (+%d%%)"
+                % (module, result["total_ms"], before, 100 * (result["total_ms"] / before - 1))
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--path", nargs="*", default=[], help="extra sys.path entries of the imports")
+    parser.add_argument("--save", default=None, help="save the results as a baseline json")
+    parser.add_argument("--baseline", default=None, help="baseline json to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown over the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    print("%-14s %10s %10s  %s" % ("module", "import ms", "wall ms", "heaviest dependencies (ms)"))
+    for module in args.modules:
+        result = bench_module(module, args.repeat, args.path)
+        results[module] = result
+        if "error" in result:
+            print("%-14s failed: %s" % (module, result["error"]))
+            continue
+        heaviest = ", ".join("%s %.0f" % (name, us / 1000) for name, us in result["heaviest"])
+        print("%-14s %10.1f %10.1f  %s" % (module, result["total_ms"], result["wall_ms"], heaviest))
+        if result["heavy_imports"]:
+            print("%-14s heavy imports: %s" % ("", ", ".join(result["heavy_imports"])))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        sys.exit(1 if regressions else 0)
@@ -19,7 +19,7 @@ from robot_skill_sets.ultilities import (
 )
 
 
-def check_relation(relations):
+def check_relation(relations, llm=None):
     res = {}
     object_count = len(relations)
     rule_success = len(relations)
@@ -49,7 +49,7 @@ def check_relation(relations):
         obj_and_description=obs_str,
     )
 
-    response = completion(prompt)["response"]
+    response = completion(prompt, llm=llm)["response"]
     from tools import parse_json_from_response, get_closest_match
     
     misplaced_obj = parse_json_from_response(response, "misplaced_object")
@@ -6,14 +6,17 @@ from typing import Dict, List, Tuple
 from robot import Robot
 from tools import parse_json_from_response, robot_name_formulation
 from dispatch_robot import DispatchRobot
-import tiktoken
 
-encoder = tiktoken.encoding_for_model('gpt-4o-mini')
+# tiktoken encoder, loaded on first use (loading it may download the encoding)
+encoder = None
 
 def get_token_length(text:str):
-    return len(encoder.encode(text))
+    global encoder
+    if encoder is None:
+        import tiktoken
 
-dispatch_robot = DispatchRobot()
+        encoder = tiktoken.encoding_for_model('gpt-4o-mini')
+    return len(encoder.encode(text))
 
 class MultiRobotCommunicator:
     """Handles communication among multiple robots by maintaining dialogue history, managing communication counts,
@@ -40,6 +43,8 @@ class MultiRobotCommunicator:
             robot.name for robot in robots
         ]  # List of participating robot names
         self.env = env
+        context = getattr(env, "context", None)
+        self.dispatch_robot = DispatchRobot(context.llm if context is not None else None)
         self.step = step
         self.comm_counts = {
             tuple(sorted(pair)): 0 for pair in combinations(self.robot_names, 2)
@@ -149,14 +154,14 @@ class MultiRobotCommunicator:
                     continue
                 
                 if "request_new_member" in receivers[0].lower():
-                    dispatched_robot_list = dispatch_robot.get_dispatched_list(current_robot, message, self.robot_pool)
+                    dispatched_robot_list = self.dispatch_robot.get_dispatched_list(current_robot, message, self.robot_pool)
                     if dispatched_robot_list:
                         self.robot_names, self.num_robot_pairs, max_iterations= self.add_robot(dispatched_robot_list)
                         receivers = dispatched_robot_list
-                        robot_pool, robot_team = dispatch_robot.dispatch_robot(current_robot, message, dispatched_robot_list, self.env, self.robot_pool, self.robots)
+                        robot_pool, robot_team = self.dispatch_robot.dispatch_robot(current_robot, message, dispatched_robot_list, self.env, self.robot_pool, self.robots)
                         self.robot_pool = robot_pool
                         self.robots = robot_team
-                        dispatch_robot.update_teammates_info(self.robot_pool, self.robots)
+                        self.dispatch_robot.update_teammates_info(self.robot_pool, self.robots)
                     else:
                         continue
 
@@ -4,13 +4,17 @@ from tools import parse_json_from_response
 from termcolor import colored
 
 class DispatchRobot():
+    def __init__(self, llm=None):
+        # AsyncLLMClient of the episode (llm.py), None for the process default
+        self.llm = llm
+
     def get_dispatched_list(self, robot_name, message, robot_pool):
         robot_list = None
         robot_pool_info = ""
         for robot in robot_pool:
             robot_pool_info += f"name: {robot.name}, {robot.capacity}\n"
         prompt = dispatch_robot_prompt.format(request_message=message, robot_pool=robot_pool_info)
-        response = completion(prompt)["response"]  
+        response = completion(prompt, llm=self.llm)["response"]  
         robot_list = parse_json_from_response(response, "robot_list")
         if isinstance(robot_list, str):
             robot_list = [robot_list]
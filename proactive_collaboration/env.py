@@ -3,6 +3,7 @@ import copy
 import json
 import os
 import pprint
+import queue
 import random
 import sys
 import threading
@@ -24,12 +25,19 @@ sys.path.append(module_dir)
 
 from constants import EDGES, EXPLOREPOINTS
 from robot_skill_sets.actions import (
-    robot_go_to_point,
+    robot_follow_trajectory,
     robot_pick_obj,
     robot_place_obj,
     robot_pull_obj,
 )
-from robot_skill_sets.obs_and_state import single_robot_observation, single_robot_state
+from robot_skill_sets.obs_and_state import (
+    PANORAMA_HEADINGS,
+    ObservationBatcher,
+    multi_robot_observation,
+    panoramic_observation,
+    single_robot_observation,
+    single_robot_state,
+)
 from robot_skill_sets.sub_skill_executor import (
     robot_go_to_obj_path,
     robot_go_to_point_path,
@@ -45,7 +53,17 @@ from robot_skill_sets.ultilities import (
     relation_to_str,
     turn_to_target,
 )
-from robot_skill_sets.unity.ue_api import (
+# imported through the same module paths as the skill sets so that env and the
+# skills share one ue_api instance (one keep-alive connection pool per endpoint)
+# and one set of scene caches
+from cooperative_planner import CooperativePlanner
+from distance_tables import load_distance_tables
+from observation_policy import ObservationPolicy
+from room_index import RoomIndex
+from tick_scheduler import DEFAULT_MAX_WORKERS, TickScheduler
+from scene_cache import get_object_meta, get_object_type_data, get_reachable_grid
+from unity.ue_api import (
+    get_client,
     get_object_info,
     get_object_neighbors,
     get_object_type,
@@ -63,8 +81,23 @@ from robot_skill_sets.unity.ue_api import (
 
 
 class Env:
-    def __init__(self, robot_pool, robot_team, scene_index="0"):
+    def __init__(
+        self,
+        robot_pool,
+        robot_team,
+        scene_index="0",
+        cooperative_planning=False,
+        context=None,
+        bake_rooms=False,
+        observation_policy=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        endpoint_limit=None,
+    ):
         self.scene_index = copy.deepcopy(scene_index)
+        # episode context (episode_context.py): every simulator call of this env goes to the
+        # client of its endpoint, so several envs can run in one process
+        self.context = context
+        self.client = context.client if context is not None else get_client()
         self.robot_pool = copy.deepcopy(robot_pool)  # with identities and locations
         self.robot_team = copy.deepcopy(robot_team)  # only names
         self.robot_map = {}
@@ -79,6 +112,33 @@ class Env:
         self.this_actions_time_step = 0
 
         self.team_each_time_step = {}
+        # concurrent get_observation calls (e.g. parallel goto_point in co_act) are merged
+        # into one batched get_observations round
+        self.observation_batcher = ObservationBatcher(self.get_observations)
+        # precomputed path distances of the scene (robot_skill_sets/distance_tables.py), None if missing
+        self.distance_tables = load_distance_tables(self.scene_index)
+        # plan the routes of one co_act tick together with a reservation table instead of
+        # independently (cooperative_planner.py), off by default
+        self.cooperative_planner = CooperativePlanner() if cooperative_planning else None
+        # {robot_name: (target_loc, route)} planned up front for the actions of a tick (plan_tick)
+        self._tick_plans = {}
+        # room polygons of the scene (room_index.py), rebuilt in init_scene; with bake_rooms
+        # the rooms of the reachable cells are also rasterised there
+        self.bake_rooms = bake_rooms
+        self.room_index = RoomIndex(EDGES.get(self.scene_index))
+        # when goto_point observes along a route (observation_policy.py), every waypoint by default
+        self.observation_policy = observation_policy or ObservationPolicy()
+        # summed latency breakdown of the check_arround scans (panoramic_observation)
+        self.scan_stats = {"scans": 0}
+        self._scan_lock = threading.Lock()
+        # one bounded pool for the actions of every co_act tick and their subtasks
+        # (tick_scheduler.py), endpoint_limit caps the tasks running against the simulator
+        self.scheduler = TickScheduler(max_workers, self.client.remote_url, endpoint_limit)
+        # asynchronous actions (start_actions / wait_actions): completion events, the robots
+        # acting {robot_name: (label, start time step, action)} and the time step each robot is free at
+        self._action_events = queue.Queue()
+        self._in_flight = {}
+        self.robot_clock = {}
         for robot in robot_pool:
             self.robot_map[robot] = {}
             self.robot_map[robot]["robot_plan"] = ""
@@ -105,13 +165,59 @@ class Env:
         self.action_step += 1
         self.this_actions_time_step = 5
         self.total_route_step += 5 * len(robot_action)
-        
-        pull_object_and_robot = defaultdict(list)  # {object_name: robot_list}
-        pull_object_robot_direction = {}           # {object_name: direction}
+        if self.cooperative_planner is not None:
+            self.cooperative_planner.reset()
+            self._tick_plans = {}
+
         action_result = {}                         # {robot_name: {flag, message, observation}}
+        tasks = self._action_tasks(robot_action)
+        self.plan_tick(robot_action, tasks)
+
+        # 收集所有任务的结果
+        results, tick = self.scheduler.run_tick([(label, fn, args) for label, fn, args, _ in tasks])
+        for result in results:
+            if isinstance(result, tuple):
+                # 非 [gopull] 动作的结果
+                robot, action_info = result
+                action_result[robot] = action_info
+            elif isinstance(result, dict):
+                # [gopull] 动作的结果
+                action_result.update(result)
+        print(
+            colored(
+                f"tick {tick['tick']}: {tick['wall']:.2f}s, critical path {tick['critical_task']} "
+                f"{tick['critical_path']:.2f}s (queued {tick['critical_queue']:.2f}s), "
+                f"parallelism {tick['parallelism']:.1f}",
+                "red",
+            )
+        )
+
+        self.total_time_step += self.this_actions_time_step
+
+        print(colored("########## robot team and count history #############", 'red'))
+        self.team_each_time_step[self.total_time_step] = {}
+        self.team_each_time_step[self.total_time_step]['robot_team'] = copy.deepcopy(self.robot_team)
+        self.team_each_time_step[self.total_time_step]['member_count'] = len(self.robot_team)
+        self.team_each_time_step[self.total_time_step]['action_step'] = self.action_step
+        self.team_each_time_step[self.total_time_step]['action'] = robot_action
+        self.team_each_time_step[self.total_time_step]['total_route_step'] = self.total_route_step
+        pprint.pprint(self.team_each_time_step)
+        print(colored("########## robot team total route #############", 'red'))
+        pprint.pprint(self.total_route_step)
+        print(colored("########## robot action plan step #############", 'red'))
+        pprint.pprint(self.action_step)
+        return action_result
 
-        # 锁用于线程安全地修改共享数据结构
-        lock = threading.Lock()
+    def _action_tasks(self, robot_action):
+        """
+        Tasks of the actions {robot_name: action}: one per robot, and one per pulled object for
+        all the robots of the [gopull] actions on that object.
+
+        Returns:
+            list: [(label, fn, args, robot names), ...]
+        """
+        pull_object_and_robot = defaultdict(list)  # {object_name: robot_list}
+        pull_object_robot_direction = {}           # {object_name: direction}
 
         # 第一阶段：收集所有 [gopull] 动作的信息
         for robot, action in robot_action.items():
@@ -126,119 +232,257 @@ class Env:
                 # else:
                 #     direction = [0, 0, 1]  # 默认方向，可以根据需求调整
 
-                # 线程安全地更新 pull_object_and_robot 和 pull_object_robot_direction
-                with lock:
-                    pull_object_and_robot[object_name].append(robot)
-                    if object_name not in pull_object_robot_direction:
-                        pull_object_robot_direction[object_name] = direction
+                pull_object_and_robot[object_name].append(robot)
+                if object_name not in pull_object_robot_direction:
+                    pull_object_robot_direction[object_name] = direction
 
-        # 第二阶段：并行执行所有动作
-        def execute_non_gopull_action(robot, action):
-            """执行非 [gopull] 动作并返回结果。"""
-            flag = False
-            message = None
-            observation = None
+        tasks = []
 
-            if action.startswith("[explore]"):
-                room = action.split("<")[1].split(">")[0]
-                if room not in self.rooms:
-                    flag = False
-                    message = f"{room} is not exist."
-                else:
-                    flag, observation = self.explore(robot, room)
-                    if not flag:
-                        message = "on the way"
+        # 提交所有非 [gopull] 动作的执行任务
+        for robot, action in robot_action.items():
+            action = action.strip()
+            if not action.startswith("[gopull]"):
+                tasks.append((robot, self._execute_action, (robot, action), [robot]))
+
+        # 提交所有 [gopull] 动作的执行任务
+        for object_name, robot_list in pull_object_and_robot.items():
+            direction = pull_object_robot_direction[object_name]
+            tasks.append(
+                (f"gopull {object_name}", self._execute_joint_gopull, (object_name, robot_list, direction), robot_list)
+            )
+        return tasks
 
-            elif action.startswith("[gopick]"):
-                object_name = action.split("<")[1].split(">")[0]
-                flag, message, observation = self.go_pick_obj(robot, object_name)
+    def plan_tick(self, robot_action, tasks, starts=None):
+        """
+        Cooperative planning: plan the routes of the robots moving in the actions {robot_name:
+        action}, one after the other in the order of `tasks` (_action_tasks), before the tasks
+        run. The actions then follow these routes, so the planning order does not depend on
+        which worker thread reaches goto_point first. `starts` gives the time step each robot's
+        route starts at (asynchronous actions), 0 for all by default.
+        """
+        if self.cooperative_planner is None or not robot_action:
+            return
+        starts = starts or {}
+        for robot in robot_action:
+            self._tick_plans.pop(robot, None)
+        grid = get_reachable_grid(0.1, client=self.client)
+        infos = get_object_info({"object_list": list(robot_action)}, client=self.client)
+        for label, fn, args, robots in tasks:
+            if fn == self._execute_joint_gopull:
+                targets = self._joint_targets(robots, args[0], infos)
+            else:
+                robot = robots[0]
+                target_loc = self._move_target(robot, robot_action[robot].strip(), infos[robot]["location"])
+                targets = {robot: target_loc} if target_loc is not None else {}
+            for robot, target_loc in targets.items():
+                route = self.cooperative_planner.plan(
+                    robot, infos[robot]["location"], target_loc, grid, starts.get(robot, 0)
+                )
+                self._tick_plans[robot] = (target_loc, route)
+
+    def _move_target(self, robot, action, robot_loc):
+        """Target location of the navigation of a non-[gopull] action, None if it does not move."""
+        if action.startswith("[explore]"):
+            room = action.split("<")[1].split(">")[0]
+            if room in self.rooms and len(self.robot_map[robot]["robot_explore_map"].get(room, [])) > 0:
+                return self._explore_target(robot, room, robot_loc)
+        elif action.startswith("[gopick]") or action.startswith("[goplace]"):
+            object_name = action.split("<")[1].split(">")[0]
+            return self._object_target(robot, object_name, robot_loc)
+        return None
+
+    def _planned(self, robot_name, target_loc=None):
+        """
+        The route plan_tick planned for `robot_name` (to `target_loc` if given) as
+        (target_loc, route), taken out of the plans, None if there is none.
+        """
+        planned = self._tick_plans.pop(robot_name, None)
+        if planned is None or (target_loc is not None and list(planned[0]) != list(target_loc)):
+            return None
+        return planned
 
-            elif action.startswith("[goplace]"):
-                object_name = action.split("<")[1].split(">")[0]
-                flag, message, observation = self.go_place_obj(robot, object_name)
+    def _execute_action(self, robot, action):
+        """执行非 [gopull] 动作并返回结果。"""
+        flag = False
+        message = None
+        observation = None
 
-            elif action.startswith("[request_new_member]"):
-                flag = True
-                message = None
-                observation = None
+        if action.startswith("[explore]"):
+            room = action.split("<")[1].split(">")[0]
+            if room not in self.rooms:
+                flag = False
+                message = f"{room} is not exist."
+            else:
+                flag, observation = self.explore(robot, room)
+                if not flag:
+                    message = "on the way"
 
-            elif action.startswith("[wait]"):
-                self.robot_map[robot]["robot_plan"] = "[wait]"
-                flag = True
-                message = None
-                observation = None
+        elif action.startswith("[gopick]"):
+            object_name = action.split("<")[1].split(">")[0]
+            flag, message, observation = self.go_pick_obj(robot, object_name)
 
-            else:
-                flag = False
-                message = "Invalid action"
-                observation = None
+        elif action.startswith("[goplace]"):
+            object_name = action.split("<")[1].split(">")[0]
+            flag, message, observation = self.go_place_obj(robot, object_name)
+
+        elif action.startswith("[request_new_member]"):
+            flag = True
+            message = None
+            observation = None
+
+        elif action.startswith("[wait]"):
+            self.robot_map[robot]["robot_plan"] = "[wait]"
+            flag = True
+            message = None
+            observation = None
 
-            return robot, {
+        else:
+            flag = False
+            message = "Invalid action"
+            observation = None
+
+        return robot, {
+            "flag": flag,
+            "message": message,
+            "observation": observation,
+        }
+
+    def _execute_joint_gopull(self, object_name, robot_list, direction):
+        """执行 [gopull] 动作并返回结果。"""
+        joint_go_pull_ret = self.joint_go_pull(robot_list, object_name, direction)
+        results = {}
+        for robot in robot_list:
+            ret = joint_go_pull_ret.get(robot, {})
+            flag = ret.get('flag', False)
+            goto_flag = ret.get('goto_flag', False)
+            message = ret.get('message', '')
+            observation = ret.get("obs", None)
+            if not goto_flag:
+                message = "on the way"
+            results[robot] = {
                 "flag": flag,
                 "message": message,
                 "observation": observation,
             }
+        return results
 
-        def execute_joint_gopull(object_name, robot_list, direction):
-            """执行 [gopull] 动作并返回结果。"""
-            joint_go_pull_ret = self.joint_go_pull(robot_list, object_name, direction)
-            results = {}
-            for robot in robot_list:
-                ret = joint_go_pull_ret.get(robot, {})
-                flag = ret.get('flag', False)
-                goto_flag = ret.get('goto_flag', False)
-                message = ret.get('message', '')
-                observation = ret.get("obs", None)
-                if not goto_flag:
-                    message = "on the way"
-                results[robot] = {
-                    "flag": flag,
-                    "message": message,
-                    "observation": observation,
-                }
-            return results
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-
-            # 提交所有非 [gopull] 动作的执行任务
-            for robot, action in robot_action.items():
-                action = action.strip()
-                if not action.startswith("[gopull]"):
-                    futures.append(executor.submit(execute_non_gopull_action, robot, action))
-
-            # 提交所有 [gopull] 动作的执行任务
-            for object_name, robot_list in pull_object_and_robot.items():
-                direction = pull_object_robot_direction[object_name]
-                futures.append(executor.submit(execute_joint_gopull, object_name, robot_list, direction))
-
-            # 收集所有任务的结果
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if isinstance(result, tuple):
-                    # 非 [gopull] 动作的结果
-                    robot, action_info = result
-                    action_result[robot] = action_info
-                elif isinstance(result, dict):
-                    # [gopull] 动作的结果
-                    action_result.update(result)
+    def start_actions(self, robot_action: dict):
+        """
+        Asynchronous co_act: start the actions {robot_name: action} and return at once. Each
+        robot, and each group of [gopull] robots on one object, runs as its own task, so the
+        robots progress independently; `wait_actions` returns the completed ones and their
+        robots can get a new action while the others are still acting.
+
+        Time steps: every robot has its own clock. An action starts at the clock of its
+        robots (the latest one for a [gopull] group), or at total_time_step when no action is
+        running, and lasts max(5, its navigation steps) like a co_act tick. total_time_step
+        is the latest end of the completed actions.
+        """
+        if not robot_action:
+            return
+        busy = [robot for robot in robot_action if robot in self._in_flight]
+        if busy:
+            raise ValueError(f"{busy} still acting")
+        barrier = not self._in_flight
+        if barrier and self.cooperative_planner is not None:
+            self.cooperative_planner.reset()
+            self._tick_plans = {}
+        self.action_step += 1
+        self.total_route_step += 5 * len(robot_action)
+        tasks = self._action_tasks(robot_action)
+        starts = {}
+        for label, fn, args, robots in tasks:
+            if barrier:
+                start = self.total_time_step
+            else:
+                start = max(self.robot_clock.get(robot, self.total_time_step) for robot in robots)
+            for robot in robots:
+                self.robot_map[robot]["action_steps"] = 0
+                self._in_flight[robot] = (label, start, robot_action[robot])
+                starts[robot] = start
+        self.plan_tick(robot_action, tasks, starts)
+        for label, fn, args, robots in tasks:
+            self.scheduler.submit(self._run_action, fn, args, robots, label=label)
+
+    def _run_action(self, fn, args, robots):
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        steps = max([5] + [self.robot_map[robot].get("action_steps", 0) for robot in robots])
+        self._action_events.put((robots, result, error, steps))
+
+    def pending_actions(self):
+        """Robots whose action (start_actions) has not been returned by `wait_actions` yet."""
+        return set(self._in_flight)
+
+    def wait_actions(self, wait_all=False, timeout=None):
+        """
+        Wait until at least one started action completed (every one with `wait_all`).
 
-        self.total_time_step += self.this_actions_time_step
+        Args:
+            wait_all (bool): Wait for every started action.
+            timeout (float): Seconds to wait for each completion, None to wait as long as it
+                takes. When it runs out, the actions completed so far are returned (none if
+                no action completed) and the others stay pending.
 
-        print(colored("########## robot team and count history #############", 'red'))
-        self.team_each_time_step[self.total_time_step] = {}
-        self.team_each_time_step[self.total_time_step]['robot_team'] = copy.deepcopy(self.robot_team)
-        self.team_each_time_step[self.total_time_step]['member_count'] = len(self.robot_team)
-        self.team_each_time_step[self.total_time_step]['action_step'] = self.action_step
-        self.team_each_time_step[self.total_time_step]['action'] = robot_action
-        self.team_each_time_step[self.total_time_step]['total_route_step'] = self.total_route_step
-        pprint.pprint(self.team_each_time_step)
-        print(colored("########## robot team total route #############", 'red'))
-        pprint.pprint(self.total_route_step)
-        print(colored("########## robot action plan step #############", 'red'))
-        pprint.pprint(self.action_step)
+        Returns:
+            dict: {robot_name: {flag, message, observation, time_step}} of the completed
+                actions, as co_act, time_step is the time step the action ended at.
+        """
+        action_result = {}
+        events = []
+        while self._in_flight:
+            done = {robot for event in events for robot in event[0]}
+            if events and (not wait_all or not set(self._in_flight) - done):
+                break
+            try:
+                events.append(self._action_events.get(timeout=timeout))
+            except queue.Empty:
+                break
+            # the other actions that completed meanwhile
+            while True:
+                try:
+                    events.append(self._action_events.get_nowait())
+                except queue.Empty:
+                    break
+        if not events:
+            return action_result
+
+        error = None
+        actions = {}
+        for robots, result, event_error, steps in events:
+            label, start, _ = self._in_flight[robots[0]]
+            end = start + steps
+            for robot in robots:
+                actions[robot] = self._in_flight.pop(robot)[2]
+                self.robot_clock[robot] = end
+            self.total_time_step = max(self.total_time_step, end)
+            if event_error is not None:
+                error = error or event_error
+                continue
+            if isinstance(result, tuple):
+                robot, action_info = result
+                action_result[robot] = dict(action_info, time_step=end)
+            elif isinstance(result, dict):
+                action_result.update({robot: dict(info, time_step=end) for robot, info in result.items()})
+            print(colored(f"{label} done: time step {start} -> {end}", "red"))
+
+        # completions that do not move total_time_step add to the record of that time step
+        record = self.team_each_time_step.setdefault(self.total_time_step, {})
+        record['robot_team'] = copy.deepcopy(self.robot_team)
+        record['member_count'] = len(self.robot_team)
+        record['action_step'] = self.action_step
+        record['action'] = dict(record.get('action', {}), **actions)
+        record['total_route_step'] = self.total_route_step
+        if error is not None:
+            raise error
         return action_result
 
+    def close(self):
+        """Shuts the worker pool of the co_act ticks down, call at the end of the episode."""
+        self.scheduler.close()
+
 
     def init_scene(self, scene_idx):
         # 选择房间
@@ -248,7 +492,11 @@ class Env:
             self.robot_map[robot]["robot_explore_map"] = copy.deepcopy(
                 EXPLOREPOINTS.get(self.scene_index)
             )
-        select_scene(scene_idx)
+        self.distance_tables = load_distance_tables(self.scene_index)
+        self.room_index = RoomIndex(EDGES.get(self.scene_index))
+        select_scene(scene_idx, client=self.client)
+        if self.bake_rooms:
+            self.room_index.bake(get_reachable_grid(0.1, client=self.client))
 
     def init_misplaced_objects(self, object_list: list, locations: list, random_idx = 0):
         """
@@ -275,7 +523,8 @@ class Env:
                 move_input[obj] = random_location  # Assign the location to the object.
 
             move_object(
-                move_input
+                move_input,
+                client=self.client,
             )  # Assuming move_object is defined elsewhere in your code.
             pprint.pprint(move_input)
             pprint.pprint(self.robot_pool)
@@ -291,7 +540,8 @@ class Env:
                 move_input[obj] = fix_location  # Assign the location to the object.
                 idx += 1
             move_object(
-                move_input
+                move_input,
+                client=self.client,
             )  # Assuming move_object is defined elsewhere in your code.
             pprint.pprint(move_input)
             pprint.pprint(self.robot_pool)
@@ -315,7 +565,7 @@ class Env:
                 selected_robots[name] = self.robot_pool[name]
             else:
                 return "wrong robot name " + name
-        robot_setup(selected_robots)
+        robot_setup(selected_robots, client=self.client)
         for name in robot_name_list:
             _ = self.get_current_coordinate(name)
         self.robot_team = robot_name_list
@@ -326,6 +576,8 @@ class Env:
         Returns an observation message for a given robot in the team, detailing the objects it can see,
         their locations, and the relationships to those objects.
 
+        Concurrent callers are batched together, see `get_observations`.
+
         Args:
             robot_name (str): The name of the robot requesting the observation.
 
@@ -337,44 +589,95 @@ class Env:
                     - "type": A list of types (e.g., "pick", "place", or "Unknown").
                 - If the robot name is invalid, returns {"error": "Invalid robot name"}.
         """
-        if robot_name in self.robot_team:
-            # Step 1: Retrieve robot's observed objects, their locations, and neighboring objects
-            seen_object_list, object_locations, object_neighbors = (
-                single_robot_observation(robot_name)
-            )
+        return self.observation_batcher.observe(robot_name)
 
-            if not seen_object_list:
-                return {}
+    def get_observations(self, robot_names, headings=None):
+        """
+        Batched observation for several robots in one pipeline: one get_robot_obs call for all
+        robots, then object info, neighbors and types are fetched once for the union of the
+        seen objects and fanned back out to each robot.
 
-            # Step 2: Parse relationships between objects
-            relations = parse_relations(object_neighbors)
+        Args:
+            robot_names (list): The names of the robots requesting an observation.
+            headings (dict, optional): {robot_name: yaw}. The listed robots are first turned to
+                that yaw (in place, one robot_teleport call for all of them).
 
-            # Step 3: Retrieve object types
-            object_type_meta = get_object_type({"object_list": seen_object_list}).get(
-                "data", {}
-            )
+        Returns:
+            dict: {robot_name: observation}, each observation in the format of `get_observation`.
+        """
+        res = {}
+        team_robots = []
+        for robot_name in robot_names:
+            if robot_name in self.robot_team:
+                team_robots.append(robot_name)
+            else:
+                res[robot_name] = {"error": "Invalid robot name"}
+        if not team_robots:
+            return res
 
-            # Step 4: Prepare the result dictionary
-            res = {}
-            # default_room = "Bedroom"  # Configurable default room
+        if headings:
+            teleport_action = {}
+            for robot_name, yaw in headings.items():
+                rotation = list(self.robot_pool[robot_name]["init_rotation"])
+                rotation[1] = yaw
+                teleport_action[robot_name] = {
+                    "location": self.robot_pool[robot_name]["init_location"],
+                    "rotation": rotation,
+                }
+                self.robot_pool[robot_name]["init_rotation"] = rotation
+            robot_teleport(teleport_action, client=self.client)
 
-            for key in seen_object_list:
-                if key not in {"error_info", "is_success", robot_name}:
-                    placeable = object_type_meta.get(key + "Placeable", "False")
-                    obj_type = [object_type_meta.get(key, "Unknown")]
-                    if placeable == "True":
-                        obj_type.append("Placeable")
+        # Step 1: Retrieve robots' observed objects, their locations, and neighboring objects
+        seen_objects, object_locations, object_neighbors = multi_robot_observation(
+            team_robots, client=self.client
+        )
+        all_seen = sorted(
+            {key for seen in seen_objects.values() if seen for key in seen}
+        )
+        if not all_seen:
+            res.update({robot_name: {} for robot_name in team_robots})
+            return res
 
-                    res[key] = {
-                        # "room": default_room,  # Replace with dynamic assignment if available
-                        "coordinate": object_locations[key]["location"],
-                        "description": relation_to_str([key], {key: relations[key]}),
-                        "type": obj_type,
-                    }
+        # Step 2: Parse relationships between objects
+        relations = parse_relations(object_neighbors)
 
-            return res
-        else:
-            return {"error": "Invalid robot name"}
+        # Step 3: Retrieve object types
+        object_type_meta = get_object_type_data(all_seen, client=self.client)
+
+        # Step 4: Prepare the result dictionary of every robot
+        for robot_name in team_robots:
+            res[robot_name] = self._observation_message(
+                robot_name,
+                seen_objects[robot_name],
+                object_locations,
+                relations,
+                object_type_meta,
+            )
+        return res
+
+    def _observation_message(
+        self, robot_name, seen_object_list, object_locations, relations, object_type_meta
+    ):
+        if not seen_object_list:
+            return {}
+        res = {}
+        # default_room = "Bedroom"  # Configurable default room
+
+        for key in seen_object_list:
+            if key not in {"error_info", "is_success", robot_name}:
+                placeable = object_type_meta.get(key + "Placeable", "False")
+                obj_type = [object_type_meta.get(key, "Unknown")]
+                if placeable == "True":
+                    obj_type.append("Placeable")
+
+                res[key] = {
+                    # "room": default_room,  # Replace with dynamic assignment if available
+                    "coordinate": object_locations[key]["location"],
+                    "description": relation_to_str([key], {key: relations[key]}),
+                    "type": obj_type,
+                }
+
+        return res
 
     def get_reasonable_actions(self, robot_name, object_name_list):
         """
@@ -393,19 +696,17 @@ class Env:
                 - "place": If the object is placeable and within arm's reach.
         """
         arm_length = float(self.get_robot_arm_length(robot_name))
-        robot_infos = get_object_info({"object_list": [robot_name]})
-        objects_infos = get_object_info({"object_list": object_name_list})
+        robot_infos = get_object_info({"object_list": [robot_name]}, client=self.client)
+        objects_infos = get_object_info({"object_list": object_name_list}, client=self.client)
         robot_location = robot_infos[robot_name].get("location")
         res = {}
-        object_type_input = {"object_list": object_name_list}
-        meta_type = get_object_type(object_type_input).get("data")
+        object_meta = get_object_meta(object_name_list, client=self.client)
         for object_name in object_name_list:
             object_location = objects_infos[object_name].get("location")
-            edge_points_list = parse_coordinates_from_string(
-                meta_type[object_name + "EdgePoints"]
-            )
-            object_type = meta_type.get(object_name)
-            object_placeable = meta_type[object_name + "Placeable"]
+            meta = object_meta[object_name]
+            edge_points_list = meta.edge_points
+            object_type = meta.type
+            object_placeable = meta.placeable
             res[object_name] = []
             # res[object_name]["type"] = object_type
             # res[object_name]["placeable"] = object_placeable
@@ -455,16 +756,30 @@ class Env:
                 - "hallway" if the robot is not within any defined room quadrilateral.
             ROOMS =["Kitchen", "livingroom", "bedroom", "bathroom", "office", "Hallway", "DiningRoom"]
         """
-        self.robot_map[robot_name]["robot_room"] = ""
-        corridinate = self.get_current_coordinate(robot_name)
-        for key in EDGES.get(self.scene_index):
-            if is_point_in_quadrilateral(
-                EDGES[self.scene_index].get(key), [corridinate[0], corridinate[2]]
-            ):
-                self.robot_map[robot_name]["robot_room"] = key
-                return key
-        self.robot_map[robot_name]["robot_room"] = "hallway"
-        return "hallway"
+        return self.get_robot_rooms([robot_name])[robot_name]
+
+    def get_robot_rooms(self, robot_names):
+        """
+        Batched get_robot_room: one get_object_info call for all robots, then one room index
+        lookup. Updates the robots' locations and rotations like get_current_coordinate,
+        except for the robots of running actions (start_actions), whose tasks own their pose.
+
+        Returns:
+            dict: {robot_name: room name}
+        """
+        robot_names = list(robot_names)
+        if not robot_names:
+            return {}
+        robot_states = get_object_info({"object_list": robot_names}, client=self.client)
+        for robot_name in robot_names:
+            if robot_name in self._in_flight:
+                continue
+            self.robot_pool[robot_name]["init_location"] = robot_states[robot_name]["location"]
+            self.robot_pool[robot_name]["init_rotation"] = robot_states[robot_name]["rotation"]
+        rooms = self.room_index.rooms_of([robot_states[name]["location"] for name in robot_names])
+        for robot_name, room in zip(robot_names, rooms):
+            self.robot_map[robot_name]["robot_room"] = room
+        return dict(zip(robot_names, rooms))
 
     ## updated 12 20
     def get_object_room(self, object_name):
@@ -482,18 +797,22 @@ class Env:
         Notes:
             ROOMS = ["Kitchen", "livingroom", "bedroom", "bathroom", "office", "Hallway", "DiningRoom"]
         """
-        state_input = {"object_list": [object_name]}
-        object_state = get_object_info(state_input)
-        coordinate = object_state[object_name]["location"]
-
-        # Check each defined room polygon to see if the object's position falls inside it.
-        for room_name in EDGES.get(self.scene_index, {}):
-            if is_point_in_quadrilateral(
-                EDGES[self.scene_index].get(room_name), [coordinate[0], coordinate[2]]
-            ):
-                return room_name
-        # If no matching room is found, return "hallway".
-        return "hallway"
+        return self.get_object_rooms([object_name])[object_name]
+
+    def get_object_rooms(self, object_names):
+        """
+        Batched get_object_room: one get_object_info call for all objects, then one room
+        index lookup.
+
+        Returns:
+            dict: {object_name: room name}
+        """
+        object_names = list(dict.fromkeys(object_names))
+        if not object_names:
+            return {}
+        object_states = get_object_info({"object_list": object_names}, client=self.client)
+        rooms = self.room_index.rooms_of([object_states[name]["location"] for name in object_names])
+        return dict(zip(object_names, rooms))
 
     def get_current_coordinate(self, robot_name):
         """
@@ -503,7 +822,7 @@ class Env:
             list: A list of [x, y, z] coordinates representing the robot's current location.
         """
         state_input = {"object_list": [robot_name]}
-        robot_state = get_object_info(state_input)
+        robot_state = get_object_info(state_input, client=self.client)
         self.robot_pool[robot_name]["init_location"] = robot_state[robot_name][
             "location"
         ]
@@ -520,7 +839,7 @@ class Env:
             float: The length of the robot's arm. Returns 0 if the robot does not have a hand.
         """
         robot_status_input = {"robot_list": [robot_name]}
-        robot_status = get_robot_status(robot_status_input)
+        robot_status = get_robot_status(robot_status_input, client=self.client)
         if robot_status[robot_name]["hand"] != "True":
             return 0
         else:
@@ -549,7 +868,7 @@ class Env:
         flag, obs = self.goto_object(robot_name, object_name)
         self.robot_map[robot_name]["robot_plan"] = "[gopick] <" + object_name + ">"
         if flag == True:
-            is_success, reason = robot_pick_obj(robot_name, object_name)
+            is_success, reason = robot_pick_obj(robot_name, object_name, client=self.client)
             return is_success, reason, obs
         return flag, "on the way to object", obs
 
@@ -579,7 +898,7 @@ class Env:
             "[goplaceto] <" + target_receiver + ">"
         )
         if flag == True:
-            is_success, reason = robot_place_obj(robot_name, target_receiver)
+            is_success, reason = robot_place_obj(robot_name, target_receiver, client=self.client)
             return is_success, reason, obs
         return flag, "on the way to target_receiver", obs
 
@@ -599,24 +918,15 @@ class Env:
         self.robot_map[robot_name]["robot_plan"] = "[goto] <" + object_name + ">"
         # self.robot_map[robot_name]['robot_route'] = robot_go_to_obj_path(robot_name, object_name)
         InfoInput = {"object_list": [robot_name, object_name]}
-        infos = get_object_info(InfoInput)
+        infos = get_object_info(InfoInput, client=self.client)
         robot_loc = infos[robot_name]["location"]
 
-        # get robot team location list
-        teammateInput = {"object_list": self.robot_team}
-        teammateinfos = get_object_info(teammateInput)
-        teammate_loc_list = []
-        for robot_teammate in self.robot_team:
-            if robot_teammate != robot_name:
-                # teammate_loc_list.append(teammateinfos[robot_teammate]["location"])
-                # add 目标点
-                if len(self.robot_map[robot_teammate]["robot_route"]) >= 1:
-                    teammate_loc_list.append(
-                        self.robot_map[robot_teammate]["robot_route"][-1]
-                    )
-        target_loc = obs_get_nearest_edge_point_list(
-            robot_loc, object_name, teammate_loc_list
-        )
+        # target planned with the route in plan_tick (cooperative planning)
+        planned = self._tick_plans.get(robot_name)
+        if planned is not None:
+            target_loc = planned[0]
+        else:
+            target_loc = self._object_target(robot_name, object_name, robot_loc)
         flag, accumulated_message = self.goto_point(robot_name, target_loc)
         # turn to obj
         object_position = infos[object_name]["location"]
@@ -627,10 +937,32 @@ class Env:
                 self.robot_pool[robot_name]["init_location"],
                 self.robot_pool[robot_name]["init_rotation"],
                 object_position,
-            )
+            ),
+            client=self.client,
         )
         return flag, accumulated_message
 
+    def _object_target(self, robot_name, object_name, robot_loc):
+        """Edge point of `object_name` the robot goes to, away from the teammates' goals."""
+        # get robot team location list
+        teammateInput = {"object_list": self.robot_team}
+        teammateinfos = get_object_info(teammateInput, client=self.client)
+        teammate_loc_list = []
+        for robot_teammate in self.robot_team:
+            if robot_teammate != robot_name:
+                # teammate_loc_list.append(teammateinfos[robot_teammate]["location"])
+                # add 目标点
+                if len(self.robot_map[robot_teammate]["robot_route"]) >= 1:
+                    teammate_loc_list.append(
+                        self.robot_map[robot_teammate]["robot_route"][-1]
+                    )
+        if self.cooperative_planner is not None:
+            # goals reserved by the teammates already planned in this tick
+            teammate_loc_list.extend(self.cooperative_planner.reserved_goals(exclude=robot_name))
+        return obs_get_nearest_edge_point_list(
+            robot_loc, object_name, teammate_loc_list, client=self.client
+        )
+
     ## updated 12 20
     def joint_goto_object(self, robot_list, object_name):
         """
@@ -654,103 +986,178 @@ class Env:
         """
         # 获取机器人和目标物体位置信息
         robots_infos_input = {"object_list": robot_list}
-        robots_infos = get_object_info(robots_infos_input)
+        robots_infos = get_object_info(robots_infos_input, client=self.client)
 
         object_loc_input = {"object_list": [object_name]}
-        object_infos = get_object_info(object_loc_input)
+        object_infos = get_object_info(object_loc_input, client=self.client)
         object_loc = object_infos[object_name]["location"]
 
-        # 顺序计算每个机器人的目标点
-        avoiding_point_list = []
-        target_locs = {}
-        for robot_name in robot_list:
-            robot_loc = robots_infos[robot_name]["location"]
-            target_loc = obs_get_nearest_edge_point_list(
-                robot_loc, object_name, avoiding_point_list
-            )
-            avoiding_point_list.append(target_loc.copy())
-            target_locs[robot_name] = target_loc
+        # 协同规划：目标点和路径已在 plan_tick 中按顺序规划并预约
+        planned = {robot_name: self._planned(robot_name) for robot_name in robot_list}
+        if self.cooperative_planner is not None and all(plan is not None for plan in planned.values()):
+            target_locs = {robot_name: plan[0] for robot_name, plan in planned.items()}
+            routes = {robot_name: plan[1] for robot_name, plan in planned.items()}
+        else:
+            # 顺序计算每个机器人的目标点
+            target_locs = self._joint_targets(robot_list, object_name, robots_infos)
+            routes = {robot_name: None for robot_name in robot_list}
+            if self.cooperative_planner is not None:
+                grid = get_reachable_grid(0.1, client=self.client)
+                for robot_name in robot_list:
+                    routes[robot_name] = self.cooperative_planner.plan(
+                        robot_name,
+                        robots_infos[robot_name]["location"],
+                        target_locs[robot_name],
+                        grid,
+                        self._plan_start(robot_name),
+                    )
 
         # 并行执行goto_point
         ret = {}
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_robot = {
-                executor.submit(
-                    self.goto_point, robot_name, target_locs[robot_name]
-                ): robot_name
+        results = self.scheduler.run_all(
+            [
+                (robot_name, self.goto_point, (robot_name, target_locs[robot_name], routes[robot_name]))
                 for robot_name in robot_list
+            ]
+        )
+        for robot_name, (flag, accumulated_message) in zip(robot_list, results):
+            ret[robot_name] = {
+                "goto_flag": flag,
+                "obs": copy.deepcopy(accumulated_message),
             }
 
-            for future in concurrent.futures.as_completed(future_to_robot):
-                robot_name = future_to_robot[future]
-                flag, accumulated_message = future.result()
+            # 导航成功后，让机器人面向目标物体（这里不一定需要并行，可根据需求选择）
+            if flag:
+                robot_teleport(
+                    turn_to_target(
+                        robot_name,
+                        self.robot_pool[robot_name]["init_location"],
+                        self.robot_pool[robot_name]["init_rotation"],
+                        object_loc,
+                    ),
+                    client=self.client,
+                )
 
-                ret[robot_name] = {
-                    "goto_flag": flag,
-                    "obs": copy.deepcopy(accumulated_message),
-                }
+        return ret
 
-                # 导航成功后，让机器人面向目标物体（这里不一定需要并行，可根据需求选择）
-                if flag:
-                    robot_teleport(
-                        turn_to_target(
-                            robot_name,
-                            self.robot_pool[robot_name]["init_location"],
-                            self.robot_pool[robot_name]["init_rotation"],
-                            object_loc,
-                        )
-                    )
+    def _joint_targets(self, robot_list, object_name, robots_infos):
+        """Edge points of `object_name` for the [gopull] robots, computed in order so they differ."""
+        avoiding_point_list = []
+        target_locs = {}
+        for robot_name in robot_list:
+            robot_loc = robots_infos[robot_name]["location"]
+            target_loc = obs_get_nearest_edge_point_list(
+                robot_loc, object_name, avoiding_point_list, client=self.client
+            )
+            avoiding_point_list.append(target_loc.copy())
+            target_locs[robot_name] = target_loc
+        return target_locs
 
-        return ret
+    def _plan_start(self, robot_name):
+        """Time step a route planned now starts at: the start of the robot's running action."""
+        return self._in_flight[robot_name][1] if robot_name in self._in_flight else 0
 
-    def goto_point(self, robot_name, target_loc):
+    def goto_point(self, robot_name, target_loc, route=None):
         """
         Navigate the robot to a specific target location, step by step, and gather observation messages.
+        The route is executed as one trajectory (robot_follow_trajectory): the robot is only
+        teleported at the waypoints where the observation policy observes and at the last one.
 
         Args:
             robot_name (str): The name of the robot performing the navigation.
             target_loc (list): The target location [x, y, z] to which the robot navigates.
+            route (list): Route already planned for this robot (cooperative planning), planned here if None.
 
         Returns:
             tuple:
                 - flag (bool): Indicates whether the robot has reached the target location.
                 - accumulated_message (dict): A dictionary containing observation messages during the navigation.
         """
-        step = 0
         flag = False
         accumulated_message = {}
         # self.refresh_robot(robot_name)
-        self.robot_map[robot_name]["robot_route"] = robot_go_to_point_path(
-            robot_name, target_loc
-        )
-        self.robot_map[robot_name]["robot_route"].pop(0)
-        for _ in range(self.robot_map[robot_name]["robot_speed"]):
-            step += 1
-            if len(self.robot_map[robot_name]["robot_route"]) <= 1:
-                # accumulated_obs
-                currentObs = self.get_observation(robot_name)
-                for key in currentObs:
-                    accumulated_message[key] = currentObs[key]
-                flag = True
-                break
-                # return True, accumulated_message
+        if route is None and self.cooperative_planner is not None:
+            planned = self._planned(robot_name, target_loc)
+            if planned is not None:
+                route = planned[1]
             else:
-                target_position = self.robot_map[robot_name]["robot_route"].pop(0)
-                next_position, next_rotation = robot_go_to_point(
+                # a move plan_tick did not foresee
+                robot_loc = get_object_info({"object_list": [robot_name]}, client=self.client)[robot_name]["location"]
+                route = self.cooperative_planner.plan(
                     robot_name,
-                    self.robot_pool[robot_name]["init_location"],
-                    self.robot_pool[robot_name]["init_rotation"],
-                    target_position,
+                    robot_loc,
+                    target_loc,
+                    get_reachable_grid(0.1, client=self.client),
+                    self._plan_start(robot_name),
                 )
-                self.robot_pool[robot_name]["init_location"] = next_position
-                self.robot_pool[robot_name]["init_rotation"] = next_rotation
-                currentObs = self.get_observation(robot_name)
-                for key in currentObs:
-                    accumulated_message[key] = currentObs[key]
-        
+        if route is None:
+            route = robot_go_to_point_path(robot_name, target_loc, client=self.client)
+        self.robot_map[robot_name]["robot_route"] = route
+        self.robot_map[robot_name]["robot_route"].pop(0)
+        policy = self.observation_policy
+        walk = policy.start(
+            self.robot_pool[robot_name]["init_location"],
+            self.robot_pool[robot_name]["init_rotation"],
+            self.room_index.room_of,
+        )
+        robot_speed = self.robot_map[robot_name]["robot_speed"]
+        route = self.robot_map[robot_name]["robot_route"]
+        # one step per key point, the last point of the route is not visited, and one more
+        # step to observe at the end if the route is done within robot_speed steps
+        key_points = route[: max(0, min(len(route) - 1, robot_speed))]
+        reached = robot_speed > 0 and len(route) <= robot_speed
+        del route[: len(key_points)]
+        kept = {}
+
+        def sample(index, location, rotation):
+            kept[index] = policy.due(walk, location, rotation, last=index + 1 == robot_speed)
+            return kept[index] or policy.audit
+
+        def observe(index, location, rotation):
+            self.robot_pool[robot_name]["init_location"] = location
+            self.robot_pool[robot_name]["init_rotation"] = rotation
+            currentObs = self.get_observation(robot_name)
+            policy.seen(walk, currentObs, kept[index])
+            return currentObs
+
+        if key_points:
+            next_position, next_rotation, observations = robot_follow_trajectory(
+                robot_name,
+                self.robot_pool[robot_name]["init_location"],
+                self.robot_pool[robot_name]["init_rotation"],
+                key_points,
+                sample=sample,
+                observe=observe,
+                client=self.client,
+            )
+            self.robot_pool[robot_name]["init_location"] = next_position
+            self.robot_pool[robot_name]["init_rotation"] = next_rotation
+            for index, currentObs in observations:
+                if kept[index]:
+                    for key in currentObs:
+                        accumulated_message[key] = currentObs[key]
+        step = len(key_points)
+        if reached:
+            # accumulated_obs
+            step += 1
+            policy.due(
+                walk,
+                self.robot_pool[robot_name]["init_location"],
+                self.robot_pool[robot_name]["init_rotation"],
+                last=True,
+            )
+            currentObs = self.get_observation(robot_name)
+            policy.seen(walk, currentObs, True)
+            for key in currentObs:
+                accumulated_message[key] = currentObs[key]
+            flag = True
+        policy.finish(walk)
+
         # update step counts
         if step > self.this_actions_time_step:
             self.this_actions_time_step = step
+        # per robot for the asynchronous actions (start_actions)
+        self.robot_map[robot_name]["action_steps"] = max(self.robot_map[robot_name].get("action_steps", 0), step)
         self.total_route_step += step
 
         return flag, accumulated_message
@@ -781,7 +1188,7 @@ class Env:
             message (str): message to be sent
         """
         self.robot_map[robot_name]["robot_plan"] = "[pick] <" + object_name + ">"
-        return robot_pick_obj(robot_name, object_name)
+        return robot_pick_obj(robot_name, object_name, client=self.client)
 
     def place(self, robot_name, target_receiver):
         """Place object_name and return flag and message
@@ -793,7 +1200,7 @@ class Env:
             message (str): message to be sent
         """
         self.robot_map[robot_name]["robot_plan"] = "[place] <" + target_receiver + ">"
-        return robot_place_obj(robot_name, target_receiver)
+        return robot_place_obj(robot_name, target_receiver, client=self.client)
 
     ## updated 12 20
     def joint_go_pull(
@@ -883,7 +1290,7 @@ class Env:
             self.robot_map[robot_name]["robot_plan"] = "[pull] <" + object_name + ">"
         direction_string = f"({direction[0]},{direction[1]},{direction[2]})"
         flag, message, details = robot_pull_obj(
-            robot_list, object_name, needed_force, direction_string
+            robot_list, object_name, needed_force, direction_string, client=self.client
         )
         message += ";"
         for robot_name in robot_list:
@@ -907,16 +1314,12 @@ class Env:
             return True, accumulated_message
         else:
             robot_loc = self.get_current_coordinate(robot_name)
-            candidate_explor_points = self.robot_map[robot_name]["robot_explore_map"][
-                room_name
-            ]
-            mindistance = 100000
-            # target_loc = candidate_explor_points[0]
-            for point in candidate_explor_points:
-                dis = get_2d_distance(point, robot_loc)
-                if dis < mindistance:
-                    target_loc = point.copy()
-                    mindistance = dis
+            # target planned with the route in plan_tick (cooperative planning)
+            planned = self._tick_plans.get(robot_name)
+            if planned is not None and planned[0] in self.robot_map[robot_name]["robot_explore_map"][room_name]:
+                target_loc = list(planned[0])
+            else:
+                target_loc = self._explore_target(robot_name, room_name, robot_loc)
             flag, accumulated_message = self.goto_point(robot_name, target_loc)
             if flag:
                 # safe remive item
@@ -926,9 +1329,49 @@ class Env:
                 accumulated_message = self.check_arround(robot_name, accumulated_message)
         return flag, accumulated_message
 
+    def _explore_target(self, robot_name, room_name, robot_loc):
+        """The explore point of `room_name` left to the robot that is nearest to `robot_loc`."""
+        candidate_explor_points = self.robot_map[robot_name]["robot_explore_map"][
+            room_name
+        ]
+        # points unreachable from the robot (inf path distance) come after the reachable
+        # ones, the straight-line nearest first
+        mindistance = (True, 100000)
+        # target_loc = candidate_explor_points[0]
+        for point in candidate_explor_points:
+            dis = self.get_path_distance(point, robot_loc)
+            if dis == float("inf"):
+                dis = (True, get_2d_distance(point, robot_loc))
+            else:
+                dis = (False, dis)
+            if dis < mindistance:
+                target_loc = point.copy()
+                mindistance = dis
+        return target_loc
+
+    def get_path_distance(self, point, location):
+        """
+        Path distance between an explore point and a location, looked up in the precomputed
+        distance tables of the scene, inf if the point is unreachable from the location. Falls
+        back to the straight-line 2D distance when the tables are missing or do not know the
+        point.
+        """
+        if self.distance_tables is not None:
+            dis = self.distance_tables.path_distance(point, location)
+            if dis is not None:
+                return dis
+        return get_2d_distance(point, location)
+
+    def get_room_distance(self, room_a, room_b):
+        """Path distance between two rooms, None without distance tables."""
+        if self.distance_tables is None:
+            return None
+        return self.distance_tables.room_distance(room_a, room_b)
+
     def check_arround(self, robot_name, up_to_now_messages):
         """
         Checks the surroundings of the robot by rotating its view in multiple directions and updating observed messages.
+        The latency breakdown of the scan is added to `scan_stats`.
 
         Args:
             robot_name (str): The name of the robot performing the check.
@@ -937,26 +1380,45 @@ class Env:
         Returns:
             dict: Updated dictionary with additional observations from checking the surroundings.
         """
+        if robot_name not in self.robot_team:
+            up_to_now_messages["error"] = "Invalid robot name"
+            return up_to_now_messages
         state_input = {"object_list": [robot_name]}
-        robot_state = get_object_info(state_input)
+        robot_state = get_object_info(state_input, client=self.client)
         location = robot_state[robot_name]["location"]
         rotation = robot_state[robot_name]["rotation"]
-        for degree in [0, 45, 90, 135, 180, -45, -90, -135]:
-            teleport_action = {
-                robot_name: {
-                    "location": location,
-                    "rotation": [rotation[0], degree, rotation[2]],
-                }
-            }
-            robot_teleport(teleport_action)
-            currentObs = self.get_observation(robot_name)
-            for key in currentObs:
-                up_to_now_messages[key] = currentObs[key]
+        # one panoramic scan: 8 turns + get_robot_obs, then info / neighbors / types once
+        # for everything seen
+        seen_by_heading, object_locations, object_neighbors, timings = panoramic_observation(
+            robot_name, location, rotation, PANORAMA_HEADINGS, executor=self.scheduler, client=self.client
+        )
+        all_seen = sorted({key for _, seen in seen_by_heading if seen for key in seen})
+        if all_seen:
+            start = time.perf_counter()
+            object_type_meta = get_object_type_data(all_seen, client=self.client)
+            timings["types"] = time.perf_counter() - start
+            start = time.perf_counter()
+            relations = parse_relations(object_neighbors)
+            for _, seen in seen_by_heading:
+                currentObs = self._observation_message(
+                    robot_name, seen, object_locations, relations, object_type_meta
+                )
+                for key in currentObs:
+                    up_to_now_messages[key] = currentObs[key]
+            timings["parse"] = time.perf_counter() - start
+        self.add_scan_timings(timings)
         return up_to_now_messages
 
+    def add_scan_timings(self, timings):
+        """Adds the latency breakdown of one check_arround scan to `scan_stats`."""
+        with self._scan_lock:
+            self.scan_stats["scans"] += 1
+            for key, value in timings.items():
+                self.scan_stats[key] = self.scan_stats.get(key, 0) + value
+
     def check_result(self, object_list):
         state_input = {"object_list": object_list}
-        object_neighbors = get_object_neighbors(state_input)
+        object_neighbors = get_object_neighbors(state_input, client=self.client)
         relations = parse_relations(object_neighbors)
         return object_neighbors, relations
 
@@ -0,0 +1,66 @@
+"""
+Everything one episode runs against: the simulator endpoint, the scene and dataset, the
+output directories and the LLM client.
+
+The context is passed to `init_config` / `Env` / `main.run` instead of being read from
+module globals at import time, so several environments (e.g. one per simulator endpoint)
+can run in one process:
+
+    context = EpisodeContext("http://127.0.0.1:7210/", scene_index="0")
+    env, robot_pool, robot_team, rooms, misplaced = init_config(3, context.dataset, context=context)
+"""
+import json
+import os
+
+SELECT_ARGS_PATH = "args/select_args.json"
+
+
+class EpisodeContext:
+    """
+    Args:
+        remote_url (str): Simulator endpoint, e.g. "http://127.0.0.1:7210/".
+        scene_index (str): Scene of the dataset.
+        dataset (str): Dataset file, default datasets/dataset_s<scene>_72.json.
+        save_dir (str): Directory of the episode results, default output/120_ours/<scene>.
+        trace_dir (str): Directory of the simulator traffic traces, default traces/120_ours/<scene>.
+        log_dir (str): Log directory, default logs/120_ours/<scene>/<port>.
+        llm (AsyncLLMClient): LLM client of the agents (llm.py), None for the process default.
+    """
+
+    def __init__(self, remote_url, scene_index, dataset=None, save_dir=None, trace_dir=None, log_dir=None, llm=None):
+        self.remote_url = remote_url
+        self.scene_index = str(scene_index)
+        self.dataset = dataset or f"datasets/dataset_s{self.scene_index}_72.json"
+        self.save_dir = save_dir or f"output/120_ours/{self.scene_index}"
+        self.trace_dir = trace_dir or f"traces/120_ours/{self.scene_index}"
+        self.log_dir = log_dir or f"logs/120_ours/{self.scene_index}/{self.port}"
+        self.llm = llm
+
+    @classmethod
+    def from_select_args(cls, path=SELECT_ARGS_PATH, **overrides):
+        """Context of args/select_args.json ({"remote_url", "scene"}), fields can be overridden."""
+        with open(path, "r") as f:
+            select_args = json.load(f)
+        kwargs = {"remote_url": select_args["remote_url"], "scene_index": select_args["scene"]}
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    @property
+    def port(self):
+        return self.remote_url.rstrip("/").split(":")[-1]
+
+    @property
+    def client(self):
+        """Shared SimulatorClient of the endpoint (one keep-alive pool per endpoint)."""
+        from unity.ue_api import get_client
+
+        return get_client(self.remote_url)
+
+    def result_path(self, dataset_id):
+        return os.path.join(self.save_dir, f"dataset_{dataset_id}.json")
+
+    def trace_path(self, dataset_id):
+        return os.path.join(self.trace_dir, f"dataset_{dataset_id}.jsonl.gz")
+
+    def __repr__(self):
+        return f"EpisodeContext({self.remote_url!r}, scene_index={self.scene_index!r}, dataset={self.dataset!r})"
@@ -1,15 +1,23 @@
+import asyncio
 import base64
-import concurrent.futures
 import os
+import random
+import re
+import threading
+import time
 from io import BytesIO
-from typing import Any, List, Tuple
+from typing import Any, List, Optional
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from PIL import Image
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from llm_cache import cache_from_env
+
+# openai and PIL are imported on first use: importing them costs more than the rest of the
+# agent code together (see benchmarks/bench_startup.py)
 
 load_dotenv()
+# LLM_PROFILE: an env file overriding .env, e.g. profiles/mock_llm.env
+if os.getenv("LLM_PROFILE"):
+    load_dotenv(os.getenv("LLM_PROFILE"), override=True)
 
 # Environment configuration
 USE_HK_API = os.getenv("USE_HK_API", "False")
@@ -23,16 +31,238 @@ elif USE_HK_API.lower() == "true":
 else:
     raise ValueError("USE_HK_API must be either 'True' or 'False'.")
 
-print("Using model:", MODEL)
-print("Using base URL:", BASE_URL)
-print()
+# on-disk response cache, see llm_cache.py (LLM_CACHE_MODE, default bypass)
+LLM_CACHE = cache_from_env()
+
+# Limits shared by every request of the process (see AsyncLLMClient)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a rate-limit reset duration such as "20ms", "1s" or "6m0s" into seconds.
+
+    Returns:
+        float: The duration in seconds, or None if `value` is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def retry_delay(headers, attempt: int) -> float:
+    """
+    Seconds to wait before retrying a rejected request, as told by the server
+    (retry-after-ms, retry-after, x-ratelimit-reset-*). Falls back to a capped
+    exponential delay only when the server gives no hint.
+    """
+    if headers is not None:
+        retry_after_ms = parse_duration(headers.get("retry-after-ms"))
+        if retry_after_ms is not None:
+            return retry_after_ms / 1000
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after is not None:
+            return retry_after
+        resets = [
+            parse_duration(headers.get("x-ratelimit-reset-requests")),
+            parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        ]
+        resets = [reset for reset in resets if reset is not None]
+        if resets:
+            return max(resets)
+    return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough token count of a request (4 characters per token) plus a completion allowance."""
+    chars = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    return chars // 4 + 512
+
+
+class TokenBucket:
+    """
+    Async token bucket holding at most `per_minute` tokens, refilled continuously.
+
+    Args:
+        per_minute (float): Capacity and refill rate per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def pause(self, seconds: float):
+        """Empty the bucket for `seconds`, e.g. when the server reports no budget left."""
+        self._refill()
+        self.tokens = 0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    async def acquire(self, amount: float):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+                await asyncio.sleep(wait + max(0.0, self.updated - time.monotonic()))
+
+
+class AsyncLLMClient:
+    """
+    AsyncOpenAI client with a global concurrency limit and requests-per-minute /
+    tokens-per-minute token buckets.
+
+    The SDK's own retries are disabled: rejected requests (429, 5xx) are retried after
+    the delay given by the server's rate-limit headers, and the buckets are paused
+    when the headers report an exhausted budget.
+
+    Args:
+        api_key (str): API key.
+        base_url (str): Base URL of the OpenAI-compatible API.
+        max_concurrency (int): Max requests in flight.
+        rpm (float): Requests per minute.
+        tpm (float): Tokens per minute.
+        max_retries (int): Max retries of one request.
+        model (str): Model of the requests.
+    """
+
+    def __init__(self, api_key, base_url, max_concurrency, rpm, tpm, max_retries, model=MODEL):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.model = model
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+
+    def _apply_headers(self, headers, estimate: int):
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests is not None and remaining_requests.isdigit() and int(remaining_requests) == 0:
+            self.request_bucket.pause(parse_duration(headers.get("x-ratelimit-reset-requests")) or 1)
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and remaining_tokens.isdigit() and int(remaining_tokens) < estimate:
+            self.token_bucket.pause(parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1)
+
+    async def chat(self, messages: list, temperature: float = 0.7) -> dict:
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+        estimate = estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(estimate)
+            async with self.semaphore:
+                try:
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model=self.model, messages=messages, temperature=temperature
+                    )
+                except APIStatusError as e:
+                    if e.status_code != 429 and e.status_code < 500:
+                        raise
+                    self._apply_headers(e.response.headers, estimate)
+                    error, delay = e, retry_delay(e.response.headers, attempt)
+                except (APIConnectionError, APITimeoutError) as e:
+                    error, delay = e, retry_delay(None, attempt)
+                else:
+                    self._apply_headers(raw.headers, estimate)
+                    response = raw.parse()
+                    return {
+                        "response": response.choices[0].message.content,
+                        "tokens_in": response.usage.prompt_tokens,
+                        "tokens_out": response.usage.completion_tokens,
+                        "tokens_total": response.usage.prompt_tokens
+                        + response.usage.completion_tokens,
+                    }
+            if attempt == self.max_retries:
+                raise error
+            print(f"LLM request failed ({error.__class__.__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Sync OpenAI client of the environment configuration, built on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=BASE_URL)
+    return _client
+
+
+def get_async_client() -> AsyncLLMClient:
+    """
+    AsyncLLMClient of the environment configuration, built on first use. It is the
+    default of every request without an explicit `llm` client, so these share its limits.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            print("Using model:", MODEL)
+            print("Using base URL:", BASE_URL)
+            print()
+            _async_client = AsyncLLMClient(
+                OPENAI_API_KEY, BASE_URL, LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM, LLM_MAX_RETRIES
+            )
+    return _async_client
+
 
-client = OpenAI(api_key=OPENAI_API_KEY, base_url=BASE_URL)
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def run_async(coroutine):
+    """
+    Runs `coroutine` on the background event loop shared by all LLM requests and
+    waits for its result, so sync callers from any thread share the same limits.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
 
 
 def get_embedding(text, model="text-embedding-3-small"):
     text = text.replace("\n", " ")
-    return client.embeddings.create(input = [text], model=model).data[0].embedding
+    return get_openai_client().embeddings.create(input = [text], model=model).data[0].embedding
 
 
 def encode_image(file_path: str, img_res: int = 1080) -> str:
@@ -46,6 +276,8 @@ def encode_image(file_path: str, img_res: int = 1080) -> str:
     Returns:
         str: Base64 encoded string of the image.
     """
+    from PIL import Image
+
     image = Image.open(file_path)
     width, height = image.size
     image = image.resize((img_res, int(img_res * height / width)), Image.LANCZOS)
@@ -85,37 +317,44 @@ def get_image_chat_prompt(prompt: str, image_path: Any) -> List[dict]:
     return content
 
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def chat_completion(messages: list, temperature: float = 0.7) -> dict:
+async def achat_completion(messages: list, temperature: float = 0.7, llm: Optional[AsyncLLMClient] = None) -> dict:
     """
-    Sends a completion request to the OpenAI chat API with retry logic.
+    Sends a completion request through the LLM response cache and the rate-limited async client.
 
     Args:
         messages (list): The messages to send to the chat API.
         temperature (float): The temperature for response variation, defaults to 0.7.
+        llm (AsyncLLMClient): Client of the request, defaults to `get_async_client()`.
 
     Returns:
-        dict: The response content with token usage details, or None if failed.
+        dict: The response content with token usage details.
     """
+    llm = llm or get_async_client()
     try:
-        response = client.chat.completions.create(
-            model=MODEL, messages=messages, temperature=temperature
+        return await LLM_CACHE.afetch(
+            llm.model, temperature, messages, lambda: llm.chat(messages, temperature)
         )
-        return {
-            "response": response.choices[0].message.content,
-            "tokens_in": response.usage.prompt_tokens,
-            "tokens_out": response.usage.completion_tokens,
-            "tokens_total": response.usage.prompt_tokens
-            + response.usage.completion_tokens,
-        }
-
     except Exception as e:
         print("Error in chat completion:", e)
         raise e
 
 
+def chat_completion(messages: list, temperature: float = 0.7, llm: Optional[AsyncLLMClient] = None) -> dict:
+    """
+    Sends a completion request to the OpenAI chat API (sync wrapper of achat_completion).
+
+    Args:
+        messages (list): The messages to send to the chat API.
+        temperature (float): The temperature for response variation, defaults to 0.7.
+        llm (AsyncLLMClient): Client of the request, defaults to `get_async_client()`.
+
+    Returns:
+        dict: The response content with token usage details, or None if failed.
+    """
+    return run_async(achat_completion(messages, temperature, llm))
 
-def completion(prompt: str, temperature: float = 0.7):
+
+def completion(prompt: str, temperature: float = 0.7, llm: Optional[AsyncLLMClient] = None):
     """
     Generates a completion for the given prompt using a chat-based AI model.
 
@@ -124,58 +363,51 @@ def completion(prompt: str, temperature: float = 0.7):
     """
     # {"role": "system", "content": "The following is a conversation with some AI Agent."}
     messages = [{"role": "user", "content": prompt}]
-    response = chat_completion(messages, temperature)
+    response = chat_completion(messages, temperature, llm)
     return response
 
 
-def threaded_completion(prompts: list[str], temperature: float = 0.7) -> list[dict]:
+def threaded_completion(
+    prompts: list[str], temperature: float = 0.7, llm: Optional[AsyncLLMClient] = None
+) -> list[dict]:
     """
-    Executes multiple completion requests in parallel using threads.
+    Executes multiple completion requests concurrently on the shared async client.
 
     Args:
         prompts (list[str]): A list of prompts to generate completions for.
         temperature (float): The temperature for response variation, defaults to 0.7.
+        llm (AsyncLLMClient): Client of the requests, defaults to `get_async_client()`.
 
     Returns:
         list[dict]: A list of responses for each prompt in `prompts`.
     """
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(completion, prompt, temperature): i
-            for i, prompt in enumerate(prompts)
-        }
-        results = []
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                results.append(result)
-        return results
+    return threaded_chat_completion(
+        [[{"role": "user", "content": prompt}] for prompt in prompts], temperature, llm
+    )
 
 
 def threaded_chat_completion(
-    messages: list[list], temperature: float = 0.7
+    messages: list[list], temperature: float = 0.7, llm: Optional[AsyncLLMClient] = None
 ) -> list[dict]:
     """
-    Executes multiple chat completion requests in parallel using threads.
+    Executes multiple chat completion requests concurrently on the shared async client.
+    Concurrency and rate are bounded by the client's limits, not by the number of requests.
 
     Args:
         messages (list[list]): A list of message lists, each representing a single conversation.
         temperature (float): The temperature for response variation, defaults to 0.7.
+        llm (AsyncLLMClient): Client of the requests, defaults to `get_async_client()`.
 
     Returns:
-        list[dict]: A list of responses for each message list in `messages`.
-    """
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(chat_completion, message, temperature): i
-            for i, message in enumerate(messages)
-        }
-        results = []
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                results.append(result)
-        return results
+        list[dict]: A list of responses for each message list in `messages`, in order.
+    """
+
+    async def gather():
+        return await asyncio.gather(
+            *(achat_completion(message, temperature, llm) for message in messages)
+        )
+
+    return [result for result in run_async(gather()) if result]
 
 
 if __name__ == "__main__":
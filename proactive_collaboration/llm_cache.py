@@ -0,0 +1,182 @@
+"""
+Persistent, content-addressed cache of LLM responses (SQLite).
+
+Entries are keyed on sha256(model, temperature, messages). The cache mode is one of
+    read_through  return cached responses, call the API and store on a miss
+    record_only   always call the API and store (refresh) the response
+    replay_only   only return cached responses, a miss raises LLMCacheMiss
+    bypass        no cache (default)
+and is set with the LLM_CACHE_MODE environment variable (LLM_CACHE_PATH and
+LLM_CACHE_MAX_ENTRIES set the database file and its size bound).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+MODES = ("read_through", "record_only", "replay_only", "bypass")
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay_only mode when a prompt is not in the cache."""
+
+
+def cache_key(model: str, temperature: float, messages: list) -> str:
+    """sha256 of the request, stable across runs and dict orderings."""
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": messages},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed LLM response cache, safe to share between threads.
+
+    Every thread gets its own connection; the database runs in WAL mode so readers do
+    not block the writer. Every 100 writes, the least recently used entries beyond
+    `max_entries` are evicted.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        mode (str): One of MODES.
+        max_entries (int): Size bound of the cache.
+    """
+
+    def __init__(self, path: str, mode: str = "bypass", max_entries: int = 200000):
+        if mode not in MODES:
+            raise ValueError(f"LLM cache mode must be one of {MODES}, got {mode!r}.")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts_since_evict = 0
+        if mode != "bypass":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+                    " created REAL, last_used REAL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)"
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[dict]:
+        conn = self._connection()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response: dict):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii=False), now, now),
+            )
+        with self._lock:
+            self._puts_since_evict += 1
+            evict = self._puts_since_evict >= 100
+            if evict:
+                self._puts_since_evict = 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond `max_entries`."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def _lookup(self, model: str, temperature: float, messages: list):
+        """(key, cached response or None) of a request, raises LLMCacheMiss in replay_only."""
+        key = cache_key(model, temperature, messages)
+        if self.mode == "record_only":
+            return key, None
+        cached = self.get(key)
+        if cached is None and self.mode == "replay_only":
+            raise LLMCacheMiss(f"No cached response for request {key}.")
+        return key, cached
+
+    def fetch(self, model: str, temperature: float, messages: list, call: Callable[[], dict]) -> dict:
+        """
+        Return the response of `call()` for this request, going through the cache
+        according to the mode.
+        """
+        if self.mode == "bypass":
+            return call()
+        key, cached = self._lookup(model, temperature, messages)
+        if cached is not None:
+            return cached
+        response = call()
+        if response is not None:
+            self.put(key, model, response)
+        return response
+
+    async def afetch(self, model: str, temperature: float, messages: list, call: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        `fetch` for a coroutine function `call`. The SQLite reads and writes (and evictions)
+        run in worker threads, so a slow or locked database does not stall the event loop.
+        """
+        if self.mode == "bypass":
+            return await call()
+        key, cached = await asyncio.to_thread(self._lookup, model, temperature, messages)
+        if cached is not None:
+            return cached
+        response = await call()
+        if response is not None:
+            await asyncio.to_thread(self.put, key, model, response)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def cache_from_env() -> LLMCache:
+    return LLMCache(
+        os.getenv("LLM_CACHE_PATH", "llm_cache/llm_cache.sqlite"),
+        os.getenv("LLM_CACHE_MODE", "bypass").lower(),
+        int(os.getenv("LLM_CACHE_MAX_ENTRIES", "200000")),
+    )
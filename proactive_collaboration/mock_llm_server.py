@@ -0,0 +1,298 @@
+"""
+Local OpenAI-compatible stand-in for benchmarking the agent loop offline.
+
+POST /v1/chat/completions answers every prompt of prompts.py with a schema-valid
+```json``` block, so parse_json_from_response and the agents work unchanged:
+    rules   (default) deterministic rule-based answers, the prompt type is recognized
+            by its text and the answer only depends on the prompt.
+    replay  answers recorded in an LLM cache database (see llm_cache.py, record with
+            LLM_CACHE_MODE=record_only), falling back to the rules on a miss unless
+            --strict is set.
+Every answer is delayed by --latency seconds (+ up to --jitter, + --token-latency per
+output token) to emulate the API.
+
+Usage (from proactive_collaboration/):
+    python mock_llm_server.py --port 18000 --latency 0.5 --jitter 0.2
+    LLM_PROFILE=profiles/mock_llm.env python main.py
+"""
+import argparse
+import ast
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from llm_cache import LLMCache, cache_key
+
+ACTION_SPACE_MARKER = "Select the next action from the following action space:"
+
+
+def stable_hash(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def section(prompt, title):
+    """Text of the `=== title ===` (or `### title ###`) section of a prompt, "" if absent."""
+    match = re.search(r"(?:===|###) %s (?:===|###)\n(.*?)(?=\n(?:===|###) |\Z)" % re.escape(title), prompt, re.S)
+    return match.group(1).strip() if match else ""
+
+
+def answer(reasoning, payload):
+    return "<Reasoning>\n%s\n\n<Answer>\n```json\n%s\n```" % (
+        reasoning, json.dumps(payload, indent=4, ensure_ascii=False)
+    )
+
+
+def choose_action(prompt):
+    """An action of the action space: the one matching the current subtask if any, else a
+    hash-chosen move so different states explore different actions."""
+    space = prompt.split(ACTION_SPACE_MARKER, 1)[1].split("### Response format ###", 1)[0]
+    actions = [line.strip() for line in space.splitlines() if line.strip()]
+    if not actions:
+        return "[wait]"
+    subtask = section(prompt, "Current Subtask").lower()
+    targets = re.findall(r"<([^>]+)>", subtask)
+    for target in targets:
+        for action in actions:
+            if "<%s>" % target in action.lower():
+                return action
+    moves = [a for a in actions if not a.startswith(("[wait]", "[exit]", "[stop]"))] or actions
+    return moves[stable_hash(prompt) % len(moves)]
+
+
+def rule_action(prompt):
+    action = choose_action(prompt)
+    return answer("Following the current subtask.", {"action": action})
+
+
+def rule_misplaced_detect(prompt):
+    misplaced = []
+    for line in section(prompt, "Object You Need to Analyze").splitlines():
+        if " - " not in line:
+            continue
+        name, description = line.split(" - ", 1)
+        if "floor" in description.lower():
+            misplaced.append(name.strip())
+    return answer("Objects on the floor are misplaced.", {"misplaced_object": misplaced or "None"})
+
+
+def rule_container_reason(prompt):
+    try:
+        known = json.loads(section(prompt, "Known Object and Container"))
+    except ValueError:
+        known = {}
+    try:
+        containers = list(ast.literal_eval(section(prompt, "Known Container")))
+    except (ValueError, SyntaxError):
+        containers = []
+    updated = {}
+    for obj, current in known.items():
+        new = [containers[stable_hash(obj) % len(containers)]] if containers else []
+        updated[obj] = list(current) + [c for c in new if c not in current]
+    return answer("Place every object on a known container.", {"updated_obj_and_container": updated})
+
+
+def rule_success_reflection(prompt):
+    return answer("The action succeeded.", {"thoughts": "The action succeeded.", "comm_flag": "No", "comm_goal": "None"})
+
+
+def rule_failed_reflection(prompt):
+    action = section(prompt, "Current Failed Action").splitlines()
+    action = action[0].replace("Failed Action:", "").strip() if action else ""
+    need_help = "pull" in action and "strength" in prompt.lower()
+    return answer(
+        "The action failed.",
+        {
+            "thoughts": "The action failed.",
+            "reflection": "%s failed." % action,
+            "solution": "Ask teammates to help." if need_help else "Retry or choose another action.",
+            "comm_flag": "Yes" if need_help else "No",
+        },
+    )
+
+
+def rule_dispatch(prompt):
+    robots = re.findall(r"name:\s*(Robot_\d+)", section(prompt, "Robot Pool"), re.I)
+    return answer("Dispatch the first robot of the pool.", {"robot_list": robots[:1] or ["None"]})
+
+
+def rule_pull_purpose(prompt):
+    objects = [line.strip() for line in section(prompt, "Possible Object").splitlines() if line.strip()]
+    target = objects[stable_hash(prompt) % len(objects)] if objects else "None"
+    return answer("Clear the way to the misplaced object.", {"target_object": target})
+
+
+def rule_task_evaluation(prompt):
+    history = [line for line in section(prompt, "Action History").splitlines() if "[" in line]
+    subtask = history[-1].strip() if history else "[explore] <None>"
+    return answer(
+        "Keep the current subtask.",
+        {
+            "current_subtask": subtask,
+            "other_robot_subtask": [],
+            "collaboration_members": [],
+            "next_confirmed_subtasks": [],
+        },
+    )
+
+
+def rule_communication(prompt):
+    return answer(
+        "Nothing to share.",
+        {"necessity": "No new information.", "contents": [{"receiver": ["None"], "message": "None"}]},
+    )
+
+
+def rule_communication_plan(prompt):
+    return answer(
+        "Synchronize the task progress.",
+        {"facts": ["No new facts."], "plan": [["information synchronization", "Share the task progress."]]},
+    )
+
+
+def rule_communication_goal_update(prompt):
+    return answer(
+        "The plan is complete.",
+        {
+            "facts": ["No new facts."],
+            "plan": [["Information Synchronization", "Complete", "Share the task progress."]],
+        },
+    )
+
+
+# (marker in the prompt, rule), the first match wins
+RULES = [
+    (ACTION_SPACE_MARKER, rule_action),
+    ("Only detect misplaced things", rule_misplaced_detect),
+    ('"updated_obj_and_container"', rule_container_reason),
+    ('"target_object"', rule_pull_purpose),
+    ('"robot_list"', rule_dispatch),
+    ('"reflection"', rule_failed_reflection),
+    ('"comm_goal"', rule_success_reflection),
+    ('"next_confirmed_subtasks"', rule_task_evaluation),
+    ('"contents"', rule_communication),
+    ("update communication plan", rule_communication_goal_update),
+    ('"plan"', rule_communication_plan),
+]
+
+
+def rule_response(messages):
+    """Rule-based answer to a chat, the rule is picked from the first user message (the
+    prompt) and retries get the same answer."""
+    prompts = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+    prompt = prompts[0] if prompts else ""
+    if isinstance(prompt, list):  # content parts
+        prompt = "".join(part.get("text", "") for part in prompt if isinstance(part, dict))
+    for marker, rule in RULES:
+        if marker in prompt:
+            return rule(prompt)
+    return answer("Unknown prompt.", {})
+
+
+class MockLLM:
+    """
+    Args:
+        replay (LLMCache): Recorded responses, None for rule-based answers only.
+        strict (bool): In replay, fail a request missing from the recording instead of
+            answering it with the rules.
+        latency (float): Base delay of every response in seconds.
+        jitter (float): Max extra delay, drawn deterministically per request.
+        token_latency (float): Extra delay per output token.
+    """
+
+    def __init__(self, replay=None, strict=False, latency=0.0, jitter=0.0, token_latency=0.0):
+        self.replay = replay
+        self.strict = strict
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "rules": 0, "missing": 0}
+
+    def respond(self, body):
+        """(status, OpenAI chat.completion dict) of a request body."""
+        model = body.get("model", "mock")
+        messages = body.get("messages", [])
+        temperature = body.get("temperature", 0.7)
+        key = cache_key(model, temperature, messages)
+        content, source = None, "rules"
+        if self.replay is not None:
+            cached = self.replay.get(key)
+            if cached is not None:
+                content, source = cached["response"], "replayed"
+            elif self.strict:
+                with self.lock:
+                    self.stats["requests"] += 1
+                    self.stats["missing"] += 1
+                return 404, {"error": {"message": "No recorded response for request %s." % key, "type": "not_found"}}
+        if content is None:
+            content = rule_response(messages)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats[source] += 1
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        delay = self.latency + self.token_latency * completion_tokens
+        if self.jitter:
+            delay += random.Random(key).uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return 200, {
+            "id": "chatcmpl-mock-%s" % key[:24],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def create_app(mock):
+    app = Flask(__name__)
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        status, body = mock.respond(request.get_json(force=True))
+        return jsonify(body), status
+
+    @app.route("/v1/models", methods=["GET"])
+    def models():
+        return jsonify({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        with mock.lock:
+            return jsonify(dict(mock.stats))
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--replay", default=None, help="LLM cache database to replay (llm_cache.py)")
+    parser.add_argument("--strict", action="store_true", help="404 on requests missing from --replay")
+    parser.add_argument("--latency", type=float, default=0.0, help="base delay of a response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max extra delay in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="extra delay per output token")
+    args = parser.parse_args()
+
+    replay = LLMCache(args.replay, mode="read_through") if args.replay else None
+    mock = MockLLM(replay, args.strict, args.latency, args.jitter, args.token_latency)
+    print("Mock LLM on http://%s:%d/v1/ (%s)" % (args.host, args.port, "replay" if replay else "rules"))
+    create_app(mock).run(host=args.host, port=args.port, threaded=True)
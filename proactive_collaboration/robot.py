@@ -20,11 +20,13 @@ class Robot:
         room_list,
         manipulation_capacity,
         comm_mode="Plan_then_Act",
+        llm=None,
     ):
         """
         初始化机器人状态
         :param name: 机器人名称
         :param capacity: 机器人能力（如负载能力、处理能力等）
+        :param llm: 机器人所有 agent 使用的 AsyncLLMClient，None 时使用进程默认客户端
         """
         # self.name = f"Robot_{Robot.instance_count}"
         # Robot.instance_count += 1
@@ -54,11 +56,12 @@ class Robot:
         self.explored_rooms = []
         self.unexplored_rooms = room_list
         # Agents
-        self.communication_agent = CommunicationAgent(self.name, room_list, comm_mode)
-        self.action_agent = ActionAgent(self.name)
-        self.observation_agent = ObservationAgent(self.name)
-        self.reflection_agent = RelfectionAgent(self.name)
-        self.progress_agent = ProgressAgent(self.name)
+        self.llm = llm
+        self.communication_agent = CommunicationAgent(self.name, room_list, comm_mode, llm=llm)
+        self.action_agent = ActionAgent(self.name, llm=llm)
+        self.observation_agent = ObservationAgent(self.name, llm=llm)
+        self.reflection_agent = RelfectionAgent(self.name, llm=llm)
+        self.progress_agent = ProgressAgent(self.name, llm=llm)
         # action_hostory
         self.action_history = [
             "Step_0 - [Join the team] - Entreing house from the main door."
@@ -4,6 +4,7 @@ import time
 from collections import deque
 
 #from oracle import Oracle
+from scene_cache import get_object_meta
 from ultilities import get_2d_distance, parse_coordinates_from_string, turn_to_target
 from unity.ue_api import (
     get_object_info,
@@ -23,7 +24,7 @@ from unity.ue_api import (
 # from ultilities import get_2d_distance
 
 
-def robot_go_to_point(robotName, robot_current_position, robot_current_rotation, target_position):# in list form
+def robot_go_to_point(robotName, robot_current_position, robot_current_rotation, target_position, client=None):# in list form
     """robot action GoToPoint
 
         Args:
@@ -34,7 +35,7 @@ def robot_go_to_point(robotName, robot_current_position, robot_current_rotation,
     turn_to_target_input = turn_to_target(robotName, robot_current_position, robot_current_rotation, target_position)
     next_location = target_position
     next_rotation = turn_to_target_input[robotName]['rotation']
-    robot_teleport(turn_to_target_input)
+    robot_teleport(turn_to_target_input, client=client)
     go  = {
             robotName:
             {
@@ -42,10 +43,46 @@ def robot_go_to_point(robotName, robot_current_position, robot_current_rotation,
                 "rotation": next_rotation
             }
         }
-    robot_teleport(go)
+    robot_teleport(go, client=client)
     return next_location, next_rotation
 
-def robot_pick_obj(robot_name, object_name): 
+def robot_follow_trajectory(
+    robotName, robot_current_position, robot_current_rotation, key_points, sample=None, observe=None, client=None
+):
+    """robot action: GoToPoint along a list of key points
+
+    The poses of all key points (facing each key point from the previous one, as
+    robot_go_to_point) are computed locally. The robot is only teleported, in one call
+    with the location and rotation, where it has to be in the simulator: at the sampled
+    key points, to observe there, and at the last key point. Without sampling this is one
+    robot_teleport call instead of two per key point.
+
+        Args:
+            key_points (list): [[x, y, z], ...] in order.
+            sample (callable): sample(index, location, rotation) -> bool, whether to stop at
+                key point `index` and observe. Called for every key point in order.
+            observe (callable): observe(index, location, rotation) -> observation, called at
+                every sampled key point once the robot is there.
+        Returns:
+           next_location, next_rotation, observations [(index, observation), ...]
+    """
+    location, rotation = robot_current_position, robot_current_rotation
+    observations = []
+    teleported = True
+    for index, target_position in enumerate(key_points):
+        rotation = turn_to_target(robotName, location, rotation, target_position)[robotName]["rotation"]
+        location = target_position
+        teleported = False
+        if sample is not None and sample(index, location, rotation):
+            robot_teleport({robotName: {"location": location, "rotation": rotation}}, client=client)
+            teleported = True
+            if observe is not None:
+                observations.append((index, observe(index, location, rotation)))
+    if not teleported:
+        robot_teleport({robotName: {"location": location, "rotation": rotation}}, client=client)
+    return location, rotation, observations
+
+def robot_pick_obj(robot_name, object_name, client=None): 
     """
     Attempts to pick up an object by checking several conditions:
     1. If the object is pickable.
@@ -63,12 +100,12 @@ def robot_pick_obj(robot_name, object_name):
     """
 
     # Check if the object is pickable (must be "PickUpableObjects")
-    object_type = get_object_type({"object_list": [object_name]})['data'].get(object_name)
+    object_type = get_object_meta([object_name], client=client)[object_name].type
     if object_type != "PickUpableObjects":
         return False, "Object can't be picked up"  # Failure if object is not pickable
     
     # Retrieve robot status to check hand availability and whether it's holding an object
-    robot_status = get_robot_status({"robot_list": [robot_name]})
+    robot_status = get_robot_status({"robot_list": [robot_name]}, client=client)
     robot_hand_status = robot_status[robot_name].get('hand')  
     robot_is_holding = robot_status[robot_name].get('isHold')  
 
@@ -84,7 +121,7 @@ def robot_pick_obj(robot_name, object_name):
         return False, "Robot is holding an item"
 
     # Check if the object is within the robot's arm reach (2D distance)
-    robot_and_object_info = get_object_info({"object_list": [object_name, robot_name]})
+    robot_and_object_info = get_object_info({"object_list": [object_name, robot_name]}, client=client)
     object_location = robot_and_object_info[object_name].get('location')  
     robot_location = robot_and_object_info[robot_name].get('location')  
     if get_2d_distance(object_location, robot_location) > arm_length:  
@@ -98,11 +135,11 @@ def robot_pick_obj(robot_name, object_name):
 
     # Simulate the robot picking up the object
     robot_pickup = {robot_name: {"object_name": object_name}}  
-    pick_up(robot_pickup)  # Simulate the pickup action
+    pick_up(robot_pickup, client=client)  # Simulate the pickup action
     
     return True, "None"  # Success if all conditions are met
 
-def robot_place_obj(robot_name, target_receiver):
+def robot_place_obj(robot_name, target_receiver, client=None):
     """
     Attempts to place an object in a specified location by checking several conditions:
     1. If the robot has a hand and is holding an object.
@@ -120,7 +157,7 @@ def robot_place_obj(robot_name, target_receiver):
     """
     
     # Retrieve robot status to check hand availability and whether it's holding an object
-    robot_status = get_robot_status({"robot_list": [robot_name]})
+    robot_status = get_robot_status({"robot_list": [robot_name]}, client=client)
     robot_hand_status = robot_status[robot_name].get('hand')  
     robot_is_holding = robot_status[robot_name].get('isHold')  
 
@@ -134,16 +171,16 @@ def robot_place_obj(robot_name, target_receiver):
         return False, "Robot is not holding an item"
 
     # Check if the target receiver is placeable (receptacle)
-    data = get_object_type({"object_list": [target_receiver]})['data']
-    if data.get(target_receiver + "Placeable") != "True":  
+    meta = get_object_meta([target_receiver], client=client)[target_receiver]
+    if meta.placeable != "True":  
         return False, "Target receiver is not receptacle"
 
     # Get available placement points for the object in the target receiver
-    edge_points_list = parse_coordinates_from_string(data.get(target_receiver + "EdgePoints"))
-    place_points_list = parse_coordinates_from_string(data.get(target_receiver + "PutPoints"))
+    edge_points_list = meta.edge_points
+    place_points_list = meta.put_points
 
     # Check if the object is within the robot's arm reach (2D distance)
-    robot_location = get_object_info({"object_list": [robot_name]})[robot_name].get('location')  
+    robot_location = get_object_info({"object_list": [robot_name]}, client=client)[robot_name].get('location')  
     target_location = next((point for point in edge_points_list if get_2d_distance(point, robot_location) < 2 * arm_length), robot_location)  
 
     # If no valid placement location is found, return failure
@@ -157,11 +194,11 @@ def robot_place_obj(robot_name, target_receiver):
     # print("#############")
     # Simulate placing the object
     robot_place = {robot_name: {"object_name": robot_status[robot_name].get('Holding'), "target_location": target_put_location, "target_rotation": [0, 0, 0]}}
-    place_object(robot_place)
+    place_object(robot_place, client=client)
 
     return True, "None"  # Success
 
-def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, direction):
+def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, direction, client=None):
     """
     Attempts to pull a moveable object by checking several conditions:
     1. If the object is moveable (of type "MoveableObjects").
@@ -186,8 +223,8 @@ def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, directio
     reason_details = {}
 
     # Step 1: Check if the object is moveable (must be "MoveableObjects")
-    data = get_object_type({"object_list": [moveable_object_name]})['data']
-    object_type = data.get(moveable_object_name)
+    meta = get_object_meta([moveable_object_name], client=client)[moveable_object_name]
+    object_type = meta.type
     if object_type != "MoveableObjects":
         return result, "Object can't be moved", reason_details  # Failure if not moveable
 
@@ -195,7 +232,7 @@ def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, directio
     joint_force = 0
     for robot_name in robot_name_list:
         # Retrieve robot status (hand availability, holding status, strength)
-        robot_status = get_robot_status({"robot_list": [robot_name]})
+        robot_status = get_robot_status({"robot_list": [robot_name]}, client=client)
         robot_hand_status = robot_status[robot_name].get('hand')  
         robot_is_holding = robot_status[robot_name].get('isHold')  
         robot_strength = float(robot_status[robot_name].get('strength'))
@@ -209,8 +246,8 @@ def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, directio
             continue
 
         # Get available edge points and check if the object is within arm reach
-        edge_points_list = parse_coordinates_from_string(data.get(moveable_object_name + "EdgePoints"))
-        robot_location = get_object_info({"object_list": [robot_name]})[robot_name].get('location')
+        edge_points_list = meta.edge_points
+        robot_location = get_object_info({"object_list": [robot_name]}, client=client)[robot_name].get('location')
         target_location = next((point for point in edge_points_list if get_2d_distance(point, robot_location) < 2 * float(robot_status[robot_name].get('armLength'))), robot_location)
 
         if target_location == robot_location:
@@ -231,7 +268,7 @@ def robot_pull_obj(robot_name_list, moveable_object_name, needed_force, directio
         "object_name": moveable_object_name,
         "direction": direction
     }
-    reason = pull_object(pullInfos)['result']
+    reason = pull_object(pullInfos, client=client)['result']
     if reason != 'Success':
         return False, reason, reason_details  # Failure if pull fails
 
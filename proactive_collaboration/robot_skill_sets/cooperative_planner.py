@@ -0,0 +1,244 @@
+"""
+Cooperative path planning for the robots moving in the same co_act tick.
+
+Robots are planned one after the other (prioritized planning) with a windowed
+space-time A*: one time step is one step of Env.goto_point, i.e. a move to any cell
+within `step_size` or a wait. Every planned path is stored in a reservation table and
+the robots planned later avoid it (vertex conflicts within `clearance` and swaps)
+for the first `window` steps. After its last step a robot stays at its goal, so goals
+are reserved too.
+
+Every path is reserved from the time step it starts at (the robot's clock in Env, 0 in a
+co_act tick), so with asynchronous actions a robot planned later meets the others where
+their earlier started paths have brought them by then.
+"""
+import heapq
+import math
+import threading
+
+import numpy as np
+from oracle import Oracle
+
+
+class ReservationTable:
+    """
+    Space-time paths of the robots planned in the current tick. Times t of the queries are
+    relative to `now`, the time step the path being planned starts at.
+    """
+
+    def __init__(self):
+        # {robot_name: (start time step, [(ix, iz) at start, start + 1, ...])}, at path[0]
+        # before the start and parked at path[-1] after the end
+        self.paths = {}
+        self.now = 0
+
+    def clear(self):
+        self.paths.clear()
+
+    def reserve(self, robot_name, path, start=0):
+        self.paths[robot_name] = (start, path)
+
+    def is_free(self, robot_name, cell, t, clearance2):
+        """No other robot is closer than the clearance (squared, in cells) to `cell` at time t."""
+        for other, (start, path) in self.paths.items():
+            if other == robot_name:
+                continue
+            ox, oz = path[min(max(t + self.now - start, 0), len(path) - 1)]
+            if (ox - cell[0]) ** 2 + (oz - cell[1]) ** 2 < clearance2:
+                return False
+        return True
+
+    def is_edge_free(self, robot_name, from_cell, to_cell, t):
+        """No other robot moves from `to_cell` to `from_cell` between t - 1 and t."""
+        for other, (start, path) in self.paths.items():
+            k = t + self.now - start
+            if other == robot_name or k < 1 or k >= len(path):
+                continue
+            if path[k - 1] == to_cell and path[k] == from_cell:
+                return False
+        return True
+
+    def is_goal_free(self, robot_name, cell, t, until, clearance2):
+        """`cell` stays free from time t to `until`, so a robot can park there."""
+        return all(self.is_free(robot_name, cell, k, clearance2) for k in range(t, until + 1))
+
+
+class CooperativePlanner:
+    """
+    Args:
+        step_size (float): Max distance of one step, as in Oracle.
+        clearance (float): Min distance in meters between two robots at the same time step.
+        window (int): Number of time steps in which conflicts are resolved.
+        max_expansions (int): Search budget of one robot. When it is exhausted, or no
+            conflict-free path exists, the robot gets its shortest path ignoring the others.
+    """
+
+    def __init__(self, step_size=0.2, clearance=0.3, window=32, max_expansions=50000):
+        self.step_size = step_size
+        self.clearance = clearance
+        self.window = window
+        self.max_expansions = max_expansions
+        self.lock = threading.Lock()
+        self.table = ReservationTable()
+        self.goals = {}  # {robot_name: [x, y, z]} goal of each robot planned in the tick
+        self.stats = {"planned": 0, "fallback": 0, "waits": 0}
+        self._moves = None  # (grid uid, move table, max cells crossed in one step)
+
+    def reset(self):
+        """Start a new tick: forget every reservation."""
+        with self.lock:
+            self.table.clear()
+            self.goals.clear()
+
+    def reserved_goals(self, exclude=None):
+        with self.lock:
+            return [list(goal) for robot, goal in self.goals.items() if robot != exclude]
+
+    def move_table(self, grid):
+        """
+        Cells reachable in one step from every cell: all cells within step_size that are
+        connected to it by an L-shaped run of reachable cells, then the cell itself (wait).
+
+        Returns:
+            tuple: (table, reach) with table[i] the next cell ids of cell i and reach the
+                largest Manhattan distance, in cells, covered by one step.
+        """
+        if self._moves is not None and self._moves[0] == grid.uid:
+            return self._moves[1], self._moves[2]
+        reach = int(self.step_size / grid.grid_size + 1e-9)
+        offsets = sorted(
+            (
+                (dx, dz)
+                for dx in range(-reach, reach + 1)
+                for dz in range(-reach, reach + 1)
+                if (dx, dz) != (0, 0) and math.hypot(dx, dz) * grid.grid_size <= self.step_size + 1e-9
+            ),
+            key=lambda offset: (offset[0] ** 2 + offset[1] ** 2, -offset[0], -offset[1]),
+        )
+        cells = grid.cells
+        columns = []
+        for dx, dz in offsets:
+            ids = grid.cell_ids(cells + (dx, dz))
+            runs = []
+            for first, second in (((dx, 0), (0, dz)), ((0, dz), (dx, 0))):
+                ok = np.ones(len(cells), dtype=bool)
+                corner = np.zeros(2, dtype=np.int64)
+                for leg in (first, second):
+                    axis = 0 if leg[0] != 0 else 1
+                    length = leg[axis]
+                    for k in range(1, abs(length) + 1):
+                        step = corner.copy()
+                        step[axis] += k * (1 if length > 0 else -1)
+                        ok &= grid.cell_ids(cells + step) >= 0
+                    corner[axis] += length
+                runs.append(ok)
+            ids[~(runs[0] | runs[1])] = -1
+            columns.append(ids)
+        table = [
+            [next_id for next_id in row if next_id >= 0] + [cell_id]
+            for cell_id, row in enumerate(np.stack(columns, axis=1).tolist())
+        ]
+        reach = max(abs(dx) + abs(dz) for dx, dz in offsets)
+        self._moves = (grid.uid, table, reach)
+        return table, reach
+
+    def plan(self, robot_name, position, target_loc, grid, start=0):
+        """
+        Plan `robot_name` from `position` to `target_loc` against the robots already
+        planned in this tick and reserve the result. `start` is the time step the route
+        starts at.
+
+        Returns:
+            list: Route in the robot_go_to_point_path format: the regularized start, one
+                [x, y, z] waypoint per step (repeated for a wait), then the target.
+        """
+        oracle = Oracle(grid, grid.grid_size, self.step_size, path_cache=None)
+        reg_position = oracle.get_regularized_pos(position[:3])
+        reg_target = oracle.get_regularized_pos(target_loc[:3])
+        agent_x, agent_y, agent_z = reg_position
+        target_xz = oracle.get_nearest_connected_reachable_point(
+            (reg_target[0], reg_target[2]), (agent_x, agent_z)
+        )
+        if target_xz is None:
+            return [reg_position]
+        start_id = grid.spatial_index().nearest((agent_x, agent_z))
+        goal_id = grid.cell_id(grid.to_cell(target_xz))
+
+        with self.lock:
+            self.table.now = start
+            path = self._search(robot_name, start_id, goal_id, grid, use_table=True)
+            if path is None:
+                self.stats["fallback"] += 1
+                path = self._search(robot_name, start_id, goal_id, grid, use_table=False) or [start_id]
+            self.stats["planned"] += 1
+            self.stats["waits"] += sum(1 for a, b in zip(path, path[1:]) if a == b)
+            self.table.reserve(robot_name, [tuple(grid.cells[cell_id].tolist()) for cell_id in path], start)
+            self.goals[robot_name] = [target_xz[0], agent_y, target_xz[1]]
+
+        coords = grid.coords
+        return (
+            [reg_position]
+            + [[float(coords[cell_id, 0]), agent_y, float(coords[cell_id, 1])] for cell_id in path[1:]]
+            + [[target_xz[0], agent_y, target_xz[1]]]
+        )
+
+    def _search(self, robot_name, start_id, goal_id, grid, use_table):
+        """
+        Space-time A* over (cell, t). Beyond the window the reservations are ignored and
+        t is collapsed, so the search degrades to a plain spatial A*.
+
+        Returns:
+            list: Cell id at every time step, from start_id to goal_id, None if not found.
+        """
+        moves, reach = self.move_table(grid)
+        cells = grid.cells.tolist()
+        goal = cells[goal_id]
+        window = self.window if use_table else 0
+        clearance2 = (self.clearance / grid.grid_size) ** 2
+        table = self.table
+
+        def heuristic(cell_id):
+            cell = cells[cell_id]
+            return math.ceil((abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])) / reach)
+
+        start_key = (start_id, 0)
+        parent = {start_key: None}
+        best = {start_key: 0}
+        heap = [(heuristic(start_id), 0, 0, start_key)]
+        closed = set()
+        counter = 1
+        while heap:
+            _, neg_t, _, key = heapq.heappop(heap)
+            if key in closed:
+                continue
+            closed.add(key)
+            if len(closed) > self.max_expansions:
+                return None
+            cell_id, t = key[0], -neg_t
+            if cell_id == goal_id and (
+                not use_table or table.is_goal_free(robot_name, cells[goal_id], t, window, clearance2)
+            ):
+                path = []
+                while key is not None:
+                    path.append(key[0])
+                    key = parent[key]
+                path.reverse()
+                return path
+            next_t = t + 1
+            for next_id in moves[cell_id]:
+                if next_id == cell_id and t >= window:
+                    continue  # waiting only helps while there are reservations
+                if next_t <= window:
+                    if not table.is_free(robot_name, cells[next_id], next_t, clearance2):
+                        continue
+                    if not table.is_edge_free(robot_name, tuple(cells[cell_id]), tuple(cells[next_id]), next_t):
+                        continue
+                next_key = (next_id, min(next_t, window + 1))
+                if next_key in closed or next_t >= best.get(next_key, math.inf):
+                    continue
+                best[next_key] = next_t
+                parent[next_key] = key
+                # ties on f go to the later (deeper) state
+                heapq.heappush(heap, (next_t + heuristic(next_id), -next_t, counter, next_key))
+                counter += 1
+        return None
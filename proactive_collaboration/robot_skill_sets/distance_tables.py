@@ -0,0 +1,180 @@
+"""
+Precomputed path distances between the exploration points and rooms of a scene.
+
+For every point of EXPLOREPOINTS the BFS distance to every reachable cell is computed
+offline and saved with the point-to-point and room-to-room matrices in
+cfg/distance_tables/scene_<id>.npz. Env loads the file at init_scene, so choosing an
+explore point by path length is an array lookup instead of a simulator round trip.
+
+The tables are built on the initial reachable grid of the scene: after a joint_pull
+they are an estimate, the actual navigation still plans on the live grid.
+
+Precompute (from proactive_collaboration/, with the simulator running):
+    python robot_skill_sets/distance_tables.py
+    python robot_skill_sets/distance_tables.py --grids grids/   # saved reachable points
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+from reachable_grid import ReachableGrid
+
+GRID_SIZE = 0.1
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONSTANTS_PATH = os.path.join(REPO_DIR, "cfg", "constants.json")
+DISTANCE_TABLE_DIR = os.path.join(REPO_DIR, "cfg", "distance_tables")
+
+
+def distance_field(grid, source_id):
+    """BFS path length in meters from cell `source_id` to every cell, inf if unreachable."""
+    neighbors = grid.neighbor_table(4)
+    hops = [-1] * len(grid)
+    hops[source_id] = 0
+    queue = deque([source_id])
+    while queue:
+        cell_id = queue.popleft()
+        for next_id in neighbors[cell_id]:
+            if next_id >= 0 and hops[next_id] < 0:
+                hops[next_id] = hops[cell_id] + 1
+                queue.append(next_id)
+    field = np.array(hops, dtype=np.float32) * grid.grid_size
+    field[np.array(hops) < 0] = np.inf
+    return field
+
+
+def compute_distance_tables(grid, explore_points):
+    """
+    Args:
+        grid (ReachableGrid): The reachable grid of the scene.
+        explore_points (dict): {room_name: [[x, y, z], ...]}, EXPLOREPOINTS of the scene.
+
+    Returns:
+        dict: Arrays to save with np.savez_compressed.
+    """
+    rooms = list(explore_points)
+    points = [point for room in rooms for point in explore_points[room]]
+    point_rooms = [room for room in rooms for _ in explore_points[room]]
+    index = grid.spatial_index()
+    source_ids = [index.nearest(point) for point in points]
+    fields = np.stack([distance_field(grid, source_id) for source_id in source_ids])
+    point_matrix = fields[:, source_ids]
+
+    room_matrix = np.full((len(rooms), len(rooms)), np.inf, dtype=np.float32)
+    room_of_point = np.array([rooms.index(room) for room in point_rooms])
+    for i in range(len(rooms)):
+        for j in range(len(rooms)):
+            block = point_matrix[np.ix_(room_of_point == i, room_of_point == j)]
+            if block.size:
+                room_matrix[i, j] = block.min()
+    np.fill_diagonal(room_matrix, 0)
+
+    return {
+        "grid_size": np.float64(grid.grid_size),
+        "grid_points": np.insert(grid.coords, 1, 0.0, axis=1),
+        "rooms": np.array(rooms),
+        "points": np.array(points, dtype=float),
+        "point_rooms": np.array(point_rooms),
+        "fields": fields,
+        "point_matrix": point_matrix,
+        "room_matrix": room_matrix,
+    }
+
+
+class DistanceTables:
+    """Loaded distance tables of one scene."""
+
+    def __init__(self, data):
+        self.grid_size = float(data["grid_size"])
+        self.grid = ReachableGrid(data["grid_points"], self.grid_size)
+        self.rooms = [str(room) for room in data["rooms"]]
+        self.points = data["points"]
+        self.point_rooms = [str(room) for room in data["point_rooms"]]
+        self.fields = data["fields"]
+        self.point_matrix = data["point_matrix"]
+        self.room_matrix = data["room_matrix"]
+        self._point_ids = {
+            self._point_key(point): i for i, point in enumerate(self.points.tolist())
+        }
+
+    @staticmethod
+    def _point_key(point):
+        return (round(float(point[0]), 3), round(float(point[-1]), 3))
+
+    def point_index(self, point):
+        """Row of the explore point [x, y, z] in the tables, None if it is not an explore point."""
+        return self._point_ids.get(self._point_key(point))
+
+    def path_distance(self, point, location):
+        """
+        Path distance in meters between the explore point `point` and any [x, y, z] `location`
+        (snapped to its nearest reachable cell), None if `point` is not in the tables.
+        """
+        i = self.point_index(point)
+        if i is None:
+            return None
+        cell_id = self.grid.spatial_index().nearest(location)
+        if cell_id < 0:
+            return None
+        return float(self.fields[i, cell_id])
+
+    def point_distance(self, point_a, point_b):
+        i, j = self.point_index(point_a), self.point_index(point_b)
+        if i is None or j is None:
+            return None
+        return float(self.point_matrix[i, j])
+
+    def room_distance(self, room_a, room_b):
+        """Shortest path distance between the explore points of two rooms, None if unknown."""
+        if room_a not in self.rooms or room_b not in self.rooms:
+            return None
+        return float(self.room_matrix[self.rooms.index(room_a), self.rooms.index(room_b)])
+
+
+def table_path(scene_index, directory=DISTANCE_TABLE_DIR):
+    return os.path.join(directory, "scene_%s.npz" % scene_index)
+
+
+def save_distance_tables(scene_index, tables, directory=DISTANCE_TABLE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(table_path(scene_index, directory), **tables)
+
+
+def load_distance_tables(scene_index, directory=DISTANCE_TABLE_DIR):
+    """DistanceTables of the scene, None if they have not been precomputed."""
+    path = table_path(scene_index, directory)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return DistanceTables(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", nargs="*", default=None, help="default: every scene of EXPLOREPOINTS")
+    parser.add_argument("--grids", default=None, help="directory of scene_<id>.json reachable points")
+    parser.add_argument("--out", default=DISTANCE_TABLE_DIR)
+    args = parser.parse_args()
+
+    with open(CONSTANTS_PATH, "r") as f:
+        explore_points = json.load(f)["EXPLOREPOINTS"]
+
+    for scene in args.scenes or list(explore_points):
+        if args.grids is not None:
+            with open(os.path.join(args.grids, "scene_%s.json" % scene), "r") as f:
+                raw_points = json.load(f)
+        else:
+            from unity.ue_api import get_reachable_points, select_scene
+
+            select_scene(scene)
+            time.sleep(2)
+            raw_points = get_reachable_points({"step_size": GRID_SIZE})["reachable_point"]
+        start_time = time.time()
+        tables = compute_distance_tables(ReachableGrid(raw_points, GRID_SIZE), explore_points[scene])
+        save_distance_tables(scene, tables, args.out)
+        print(
+            "scene %s: %d points, %d cells, %.2fs -> %s"
+            % (scene, len(tables["points"]), len(tables["grid_points"]), time.time() - start_time, table_path(scene, args.out))
+        )
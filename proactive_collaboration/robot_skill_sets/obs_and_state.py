@@ -1,11 +1,12 @@
 import math
 import pprint
+import threading
 import time
 from collections import deque
 
 # import keyboard
 import numpy as np
-from ultilities import parse_reachable_points
+from scene_cache import get_reachable_grid
 from unity.ue_api import (
     get_object_info,
     get_object_neighbors,
@@ -21,7 +22,7 @@ from unity.ue_api import (
 )
 
 
-def single_robot_observation(robot_name):
+def single_robot_observation(robot_name, client=None):
     """
     Gather observation data for a single robot, including the list of objects it observes, 
     detailed information about those objects, and the neighbors of those objects.
@@ -39,7 +40,7 @@ def single_robot_observation(robot_name):
     robot_input = {"robot_list": [robot_name]}
 
     # Get the list of objects observed by the robot
-    obs = get_robot_obs(robot_input)
+    obs = get_robot_obs(robot_input, client=client)
     observed_objects = obs.get(robot_name)
 
     # Create input for fetching object details using the observed objects
@@ -48,16 +49,164 @@ def single_robot_observation(robot_name):
         object_input = {"object_list": observed_objects}
 
         # Fetch detailed information about the observed objects
-        object_infos = get_object_info(object_input)
+        object_infos = get_object_info(object_input, client=client)
 
         # Fetch the neighbors of the observed objects
-        object_neighbors = get_object_neighbors(object_input)
+        object_neighbors = get_object_neighbors(object_input, client=client)
     else:
          object_infos = {}
          object_neighbors = {}
     return observed_objects, object_infos, object_neighbors
 
-def single_robot_state(robot_name, step_size=0.2):
+def multi_robot_observation(robot_names, client=None):
+    """
+    Batched version of `single_robot_observation` for a list of robots.
+
+    The seen-object lists of all robots are fetched with one get_robot_obs call, then the
+    object details and neighbors are fetched once for the union of seen objects, so a team
+    of N robots costs 3 calls instead of 3N.
+
+    Args:
+    robot_names (list): The names of the robots for which observations are being gathered.
+
+    Returns:
+    tuple: A tuple containing:
+        - seen_objects (dict): {robot_name: list of objects observed by that robot, or None}.
+        - obj_infos (dict): Information about every object in the union of seen objects.
+        - objs_neighbors (dict): The neighbors of every object in the union of seen objects.
+    """
+    obs = get_robot_obs({"robot_list": list(robot_names)}, client=client)
+
+    seen_objects = {}
+    union = set()
+    for robot_name in robot_names:
+        observed_objects = obs.get(robot_name)
+        if observed_objects is not None:
+            observed_objects = list(set(observed_objects))
+            union.update(observed_objects)
+        seen_objects[robot_name] = observed_objects
+
+    if union:
+        object_input = {"object_list": sorted(union)}
+        object_infos = get_object_info(object_input, client=client)
+        object_neighbors = get_object_neighbors(object_input, client=client)
+    else:
+        object_infos = {}
+        object_neighbors = {}
+    return seen_objects, object_infos, object_neighbors
+
+PANORAMA_HEADINGS = [0, 45, 90, 135, 180, -45, -90, -135]
+
+
+def panoramic_observation(robot_name, location, rotation, headings=PANORAMA_HEADINGS, executor=None, client=None):
+    """
+    Look around from `location`: for every heading (yaw in degrees, in order) the robot is
+    turned with one robot_teleport call and its seen objects are fetched with get_robot_obs,
+    back to back without resolving anything in between. Object info and neighbors are then
+    fetched once for the union of the objects seen at all headings (in parallel on
+    `executor` if given). The robot is left facing the last heading.
+
+    Args:
+    robot_name (str): The robot looking around.
+    location (list): [x, y, z] where it stands.
+    rotation (list): Its rotation, only the yaw is changed.
+    headings (list): Yaws to look at.
+    executor (Executor): Runs the info and neighbors calls concurrently, sequential if None.
+
+    Returns:
+    tuple: A tuple containing:
+        - seen_by_heading (list): [(yaw, list of objects seen or None), ...] in heading order.
+        - obj_infos (dict): Information about every object in the union of seen objects.
+        - objs_neighbors (dict): The neighbors of every object in the union of seen objects.
+        - timings (dict): Seconds spent in "turn", "obs", "info", "neighbors" and "total", and
+          the number of simulator "calls".
+    """
+    start = time.perf_counter()
+    timings = {"turn": 0.0, "obs": 0.0, "info": 0.0, "neighbors": 0.0, "total": 0.0, "calls": 0}
+    seen_by_heading = []
+    union = set()
+    for yaw in headings:
+        t = time.perf_counter()
+        robot_teleport(
+            {robot_name: {"location": location, "rotation": [rotation[0], yaw, rotation[2]]}}, client=client
+        )
+        timings["turn"] += time.perf_counter() - t
+        t = time.perf_counter()
+        observed_objects = get_robot_obs({"robot_list": [robot_name]}, client=client).get(robot_name)
+        timings["obs"] += time.perf_counter() - t
+        timings["calls"] += 2
+        if observed_objects is not None:
+            observed_objects = list(set(observed_objects))
+            union.update(observed_objects)
+        seen_by_heading.append((yaw, observed_objects))
+
+    def timed(key, function, object_input):
+        t = time.perf_counter()
+        result = function(object_input, client=client)
+        timings[key] = time.perf_counter() - t
+        return result
+
+    object_infos, object_neighbors = {}, {}
+    if union:
+        object_input = {"object_list": sorted(union)}
+        if executor is not None:
+            info_future = executor.submit(timed, "info", get_object_info, object_input)
+            object_neighbors = timed("neighbors", get_object_neighbors, object_input)
+            object_infos = info_future.result()
+        else:
+            object_infos = timed("info", get_object_info, object_input)
+            object_neighbors = timed("neighbors", get_object_neighbors, object_input)
+        timings["calls"] += 2
+    timings["total"] = time.perf_counter() - start
+    return seen_by_heading, object_infos, object_neighbors, timings
+
+class ObservationBatcher:
+    """
+    Coalesces concurrent observation requests into batched calls (group commit).
+
+    The first thread to ask becomes the leader and fetches everything pending at that
+    moment with one call to `fetch(robot_names) -> {robot_name: observation}`; threads
+    arriving while that call is in flight queue up and are served together by the next
+    leader. With N robots navigating in parallel this turns N sets of observation calls
+    per step into one.
+    """
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._fetching = False
+
+    def observe(self, robot_name):
+        request = {"robot": robot_name, "done": False, "result": None, "error": None}
+        with self._cond:
+            self._pending.append(request)
+            while not request["done"]:
+                if self._fetching:
+                    self._cond.wait()
+                    continue
+                # become the leader for everything queued so far
+                self._fetching = True
+                batch, self._pending = self._pending, []
+                self._cond.release()
+                try:
+                    results = self.fetch(list(dict.fromkeys(r["robot"] for r in batch)))
+                    error = None
+                except Exception as e:
+                    results, error = {}, e
+                finally:
+                    self._cond.acquire()
+                for r in batch:
+                    r["result"] = results.get(r["robot"], {})
+                    r["error"] = error
+                    r["done"] = True
+                self._fetching = False
+                self._cond.notify_all()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+def single_robot_state(robot_name, step_size=0.2, client=None):
     """
     Retrieve the current state of a robot, including its location, possible next movement points,
     and whether it is holding an object.
@@ -74,26 +223,22 @@ def single_robot_state(robot_name, step_size=0.2):
     """
     # Fetch the current state of the robot (e.g., its location)
     state_input = {"object_list": [robot_name]}
-    robot_state = get_object_info(state_input)
+    robot_state = get_object_info(state_input, client=client)
 
     # Extract the 2D location (x, z) of the robot
     robot_location_2d = (robot_state[robot_name]['location'][0], robot_state[robot_name]['location'][2])
 
-    # Retrieve the set of reachable points for the robot
-    reachable_points_gt = get_reachable_points()["reachable_point"]
-    reachable_points_2d = parse_reachable_points(reachable_points_gt)
-
-    # Initialize a set to store the potential next points for the robot
-    next_points = set()
+    # Retrieve the reachable grid of the scene
+    grid = get_reachable_grid(0.1, client=client)
 
     # Identify the next points that the robot can potentially move to based on the step size
-    for point in reachable_points_2d:
-        if np.linalg.norm(np.array(point) - np.array(robot_location_2d)) < step_size:
-            next_points.add((point[0], robot_state[robot_name]['location'][1], point[1]))
+    robot_y = robot_state[robot_name]['location'][1]
+    next_ids = grid.spatial_index().within_radius(robot_location_2d, step_size)
+    next_points = set((x, robot_y, z) for x, z in grid.coords[next_ids].tolist())
 
     # Fetch the robot's holding status (whether it is currently holding an object)
     robot_status_input = {"robot_list": [robot_name]}
-    robot_status = get_robot_status(robot_status_input)
+    robot_status = get_robot_status(robot_status_input, client=client)
 
     return robot_state, next_points, robot_status
 
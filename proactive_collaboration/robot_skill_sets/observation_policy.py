@@ -0,0 +1,135 @@
+"""
+When Env.goto_point observes while walking a route.
+
+Every observation is a get_robot_obs / get_object_info / get_object_neighbors /
+get_object_type round trip, and consecutive waypoints 0.2 m apart see almost the same
+objects. An ObservationPolicy observes every `every`-th waypoint, when the robot enters
+another room, when its heading turned more than `heading_change` degrees since the last
+observation, and at the end of the walk. The default (every=1) observes at every waypoint
+as before.
+
+With `audit` the skipped waypoints are still observed (as often as the per-step
+baseline, so only to measure) and the policy reports the recall of the sampled
+observations: the share of the objects seen by the per-step baseline of a walk that
+the sampled waypoints saw too.
+"""
+import threading
+
+
+class ObservationPolicy:
+    """
+    Args:
+        every (int): Observe every `every`-th waypoint, 1 for every waypoint.
+        room_change (bool): Also observe at the first waypoint in another room.
+        heading_change (float): Also observe when the yaw turned more than this many degrees
+            since the last observation, None to ignore the heading.
+        audit (bool): Observe the skipped waypoints too to measure the recall.
+    """
+
+    REASONS = ("every", "room", "heading", "end")
+
+    def __init__(self, every=1, room_change=True, heading_change=None, audit=False):
+        self.every = max(1, int(every))
+        self.room_change = room_change
+        self.heading_change = heading_change
+        self.audit = audit
+        self._lock = threading.Lock()
+        self.stats = {
+            "walks": 0,
+            "waypoints": 0,
+            "observations": 0,
+            "reasons": {reason: 0 for reason in self.REASONS},
+            "audited_walks": 0,
+            "baseline_objects": 0,
+            "recalled_objects": 0,
+        }
+
+    @property
+    def dense(self):
+        """Observes at every waypoint."""
+        return self.every == 1
+
+    def start(self, location, rotation, room_of):
+        """
+        State of a walk starting at `location` / `rotation`, `room_of(location)` gives the
+        room of a point (Env.room_index.room_of).
+        """
+        with self._lock:
+            self.stats["walks"] += 1
+        return {
+            "since": 0,
+            "room": room_of(location) if self.room_change and not self.dense else None,
+            "yaw": rotation[1] if rotation else None,
+            "room_of": room_of,
+            "baseline": set(),
+            "sampled": set(),
+        }
+
+    def due(self, walk, location, rotation, last=False):
+        """
+        Whether to observe at the waypoint the robot just reached (`last`: the walk ends
+        there). Updates the walk state.
+        """
+        walk["since"] += 1
+        reason = None
+        if last:
+            reason = "end"
+        elif walk["since"] >= self.every:
+            reason = "every"
+        elif self.room_change:
+            room = walk["room_of"](location)
+            if room != walk["room"]:
+                reason = "room"
+        if reason is None and self.heading_change is not None and walk["yaw"] is not None:
+            turned = abs((rotation[1] - walk["yaw"] + 180) % 360 - 180)
+            if turned > self.heading_change:
+                reason = "heading"
+        with self._lock:
+            self.stats["waypoints"] += 1
+            if reason is not None:
+                self.stats["observations"] += 1
+                self.stats["reasons"][reason] += 1
+        if reason is not None:
+            walk["since"] = 0
+            walk["yaw"] = rotation[1] if rotation else walk["yaw"]
+            if self.room_change and not self.dense:
+                walk["room"] = walk["room_of"](location)
+        return reason is not None
+
+    def seen(self, walk, observation, sampled):
+        """Objects of an observation of the walk, `sampled`: it is kept in the walk's messages."""
+        walk["baseline"].update(observation)
+        if sampled:
+            walk["sampled"].update(observation)
+
+    def finish(self, walk):
+        """Adds the recall of an audited walk to the stats."""
+        if not self.audit:
+            return
+        with self._lock:
+            self.stats["audited_walks"] += 1
+            self.stats["baseline_objects"] += len(walk["baseline"])
+            self.stats["recalled_objects"] += len(walk["baseline"] & walk["sampled"])
+
+    def summary(self):
+        """
+        Returns:
+            dict: The stats, with "observation_rate" (observations per waypoint) and, with
+                audit, "recall" (recalled / baseline objects over all audited walks).
+        """
+        with self._lock:
+            summary = dict(self.stats, reasons=dict(self.stats["reasons"]))
+        summary["observation_rate"] = (
+            summary["observations"] / summary["waypoints"] if summary["waypoints"] else None
+        )
+        if self.audit:
+            summary["recall"] = (
+                summary["recalled_objects"] / summary["baseline_objects"] if summary["baseline_objects"] else None
+            )
+        return summary
+
+    def __repr__(self):
+        return (
+            f"ObservationPolicy(every={self.every}, room_change={self.room_change}, "
+            f"heading_change={self.heading_change}, audit={self.audit})"
+        )
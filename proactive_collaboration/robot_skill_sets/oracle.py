@@ -6,9 +6,12 @@
 # @Software: PyCharm
 import math
 import pprint
-from collections import deque
+import threading
+from collections import OrderedDict, deque
 
 import numpy as np
+from planner import PLANNERS, GridPlanner
+from reachable_grid import ReachableGrid
 from unity.ue_api import (
     get_object_info,
     get_reachable_points,
@@ -25,25 +28,103 @@ from unity.ue_api import (
 )
 
 
+class PathCache:
+    """
+    Thread-safe LRU cache of Oracle.get_path results.
+
+    Keys hold the grid (endpoint, version, uid), the planner settings and the regularized
+    start / goal, so a grid rebuilt after robot_setup / joint_pull never hits old entries.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self, since=None):
+        """
+        Hit / miss counters, counted from the `since` snapshot (an earlier stats()) if given.
+        """
+        with self.lock:
+            hits, misses, size = self.hits, self.misses, len(self.entries)
+        if since is not None:
+            hits -= since["hits"]
+            misses -= since["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": size,
+        }
+
+
+# shared by every Oracle of the process
+PATH_CACHE = PathCache()
+
+
 class Oracle:
-    def __init__(self, reachable_points, grid_size=0.1, step_size=0.2):
-        self.raw_reachable_points = reachable_points
+    def __init__(self, reachable_points, grid_size=0.1, step_size=0.2, planner="bfs", connectivity=4,
+                 path_cache=PATH_CACHE):
+        # reachable_points: a ReachableGrid (shared, see scene_cache.get_reachable_grid)
+        # or the raw "reachable_point" list of get_reachable_points
+        # planner: "bfs" (integer grid BFS, same paths as float_bfs), "astar" (same path
+        # lengths, fewer expanded cells) or "float_bfs" (the original implementation)
+        if isinstance(reachable_points, ReachableGrid):
+            self.grid = reachable_points
+            self.raw_reachable_points = None
+        else:
+            self.grid = ReachableGrid(reachable_points, grid_size)
+            self.raw_reachable_points = reachable_points
         self.grid_size = grid_size
         self.step_size = step_size
         assert self.step_size > self.grid_size, "step_size should be larger than grid_size"
+        assert self.grid.grid_size == self.grid_size, "grid_size does not match the reachable grid"
         self.reachable_points = self.parse_reachable_points()
         self.path_record = []
+        self.path_cache = path_cache  # None disables caching
+        self.connectivity = connectivity
+        assert planner in PLANNERS + ("float_bfs",), "unknown planner: %s" % planner
+        self.planner = planner
+        if planner == "float_bfs":
+            assert connectivity == 4, "float_bfs only supports 4-connectivity"
+            self.grid_planner = None
+        else:
+            self.grid_planner = GridPlanner(self.grid, connectivity)
 
     def parse_reachable_points(self):
-        reachable_points = set()
-        for point in self.raw_reachable_points:
-            point = eval(point) # (x, y, z)
-            x, y, z = point
-            reachable_points.add((x, z))
-            # reachable_points.add(point)
-        return reachable_points
+        # (x, z) set, built once per grid and shared by all the Oracles of the scene
+        return self.grid.points
 
     def shortest_path(self, start, end):
+        if self.grid_planner is not None:
+            return self.grid_planner.shortest_path(start, end, self.planner)
+        return self.float_bfs_shortest_path(start, end)
+
+    def float_bfs_shortest_path(self, start, end):
         start = tuple(start)
         # grid = self.reachable_points
         # 定义四个方向的移动
@@ -85,26 +166,49 @@ class Oracle:
         r_pos = [np.round(np.round(a / self.grid_size) * self.grid_size, 3) for a in position]
         return r_pos
 
-    def get_nearest_reachable_point(self, position):
-        approx_target = None
+    def nearest_point_id(self, position, mask=None):
+        """
+        Id of the reachable cell nearest to the (x, z) `position` (only cells where `mask` is
+        True), -1 if there is none. Of equally near cells, the one the original scan over
+        `reachable_points` met first wins, so the chosen cell is the same as before.
+        """
+        index = self.grid.spatial_index()
+        point_id = index.nearest(position, mask)
+        if point_id < 0:
+            return -1
+        best = np.linalg.norm(self.grid.coords[point_id] - np.asarray(position, dtype=float))
+        candidates = index.within_radius(position, best + 1e-9)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if len(candidates) < 2:
+            return point_id
+        # the `dist < least_dist` scan of the original, in its order
+        scan_order = self.grid.scan_order()
         least_dist = 1e10
-        for p in self.reachable_points:
-            dist = np.linalg.norm(np.array(p) - np.array(position))
+        for candidate in candidates[np.argsort(scan_order[candidates], kind="stable")].tolist():
+            dist = np.linalg.norm(np.array(self.grid.coords[candidate]) - np.array(position))
             if dist < least_dist:
                 least_dist = dist
-                approx_target = p
-        return approx_target
-    
+                point_id = candidate
+        return point_id
+
+    def get_nearest_reachable_point(self, position):
+        point_id = self.nearest_point_id(position)
+        if point_id < 0:
+            return None
+        x, z = self.grid.coords[point_id]
+        return (float(x), float(z))
+
     def get_nearest_connected_reachable_point(self, position, start):
-        start = self.get_nearest_reachable_point(start)
-        approx_target = None
-        least_dist = 1e10
-        for p in self.reachable_points:
-            dist = np.linalg.norm(np.array(p) - np.array(position))
-            if dist < least_dist and self.shortest_path(start, p) != [] :
-                least_dist = dist
-                approx_target = p
-        return approx_target
+        # candidates are the cells of the component of start's nearest reachable point,
+        # i.e. exactly the points shortest_path can reach from it
+        start_id = self.nearest_point_id(start)
+        if start_id < 0:
+            return None
+        labels, _ = self.grid.components()
+        point_id = self.nearest_point_id(position, labels == labels[start_id])
+        x, z = self.grid.coords[point_id]
+        return (float(x), float(z))
 
     def get_key_points(self, path, start_point, end_point):
         key_points = []
@@ -124,6 +228,32 @@ class Oracle:
         reg_agent_position = self.get_regularized_pos(position[:3])
         reg_target_loc = self.get_regularized_pos(target_loc[:3])
 
+        if self.path_cache is not None:
+            key = (
+                self.grid.source, self.grid.version, self.grid.uid,
+                self.planner, self.connectivity, self.step_size,
+                tuple(reg_agent_position), reg_target_loc[0], reg_target_loc[2],
+            )
+            cached = self.path_cache.get(key)
+            if cached is not None:
+                path, key_points = cached
+                self.path_record = [list(point) for point in path]
+                return [list(point) for point in key_points]
+
+        key_points = self._get_path(reg_agent_position, reg_target_loc)
+
+        if self.path_cache is not None:
+            self.path_cache.put(
+                key,
+                (
+                    tuple(tuple(point) for point in self.path_record),
+                    tuple(tuple(point) for point in key_points),
+                ),
+            )
+        return key_points
+
+    def _get_path(self, reg_agent_position, reg_target_loc):
+
         agent_x, agent_y, agent_z = reg_agent_position
         target_x, target_y, target_z = reg_target_loc
 
@@ -0,0 +1,176 @@
+"""
+Shortest paths on the integer cells of a ReachableGrid.
+
+Replaces the float-tuple BFS of Oracle.shortest_path: cells are ids into
+ReachableGrid.cells and neighbours come from the grid's precomputed neighbour table,
+so a search never rounds floats or hashes tuples.
+"""
+import heapq
+import math
+from collections import deque
+
+from reachable_grid import NEIGHBOR_OFFSETS
+
+PLANNERS = ("astar", "bfs")
+
+
+class GridPlanner:
+    """
+    A* / BFS over the cells of one ReachableGrid.
+
+    Args:
+        grid (ReachableGrid): The grid to plan on.
+        connectivity (int): 4 (axis moves, like the original Oracle) or 8 (diagonal moves
+            allowed when they do not cut a corner).
+    """
+
+    def __init__(self, grid, connectivity=4):
+        assert connectivity in NEIGHBOR_OFFSETS, "connectivity should be 4 or 8"
+        self.grid = grid
+        self.connectivity = connectivity
+        self.offsets = NEIGHBOR_OFFSETS[connectivity]
+        self.costs = [math.hypot(dx, dz) for dx, dz in self.offsets]
+        self.neighbors = grid.neighbor_table(connectivity)
+        self.cells = grid.cells.tolist()
+        self.expanded = 0  # cells expanded by the last search
+
+    def heuristic(self, cell, goal):
+        dx = abs(cell[0] - goal[0])
+        dz = abs(cell[1] - goal[1])
+        if self.connectivity == 4:
+            return dx + dz
+        # octile distance
+        return dx + dz + (math.sqrt(2) - 2) * min(dx, dz)
+
+    def _start_ids(self, start_cell):
+        """
+        [(cell_id, cost)] to seed a search from `start_cell`. A start outside the grid (the
+        robot stands next to the reachable area) is seeded with its reachable neighbours,
+        as the original BFS did.
+        """
+        start_id = self.grid.cell_id(start_cell)
+        if start_id >= 0:
+            return [(start_id, 0.0)]
+        seeds = []
+        for (dx, dz), cost in zip(self.offsets, self.costs):
+            if dx != 0 and dz != 0 and not (
+                self.grid.contains((start_cell[0] + dx, start_cell[1]))
+                and self.grid.contains((start_cell[0], start_cell[1] + dz))
+            ):
+                continue
+            cell_id = self.grid.cell_id((start_cell[0] + dx, start_cell[1] + dz))
+            if cell_id >= 0:
+                seeds.append((cell_id, cost))
+        return seeds
+
+    def search(self, start_cell, goal_cell, method="astar"):
+        """
+        Find a shortest path between two cells.
+
+        Args:
+            start_cell (tuple): (ix, iz) of the start, may be outside the grid.
+            goal_cell (tuple): (ix, iz) of the goal.
+            method (str): "astar" or "bfs". BFS expands neighbours in the original Oracle
+                order, so it returns exactly the path of the original float BFS.
+
+        Returns:
+            list: Cell ids from the first cell after the start to the goal,
+                None if the goal cannot be reached.
+        """
+        self.expanded = 0
+        goal_id = self.grid.cell_id(goal_cell)
+        if goal_id < 0:
+            return None
+        if tuple(start_cell) == tuple(goal_cell):
+            return []
+        seeds = self._start_ids(start_cell)
+        parent = {cell_id: -1 for cell_id, _ in seeds}
+        start_id = self.grid.cell_id(start_cell)
+        if start_id >= 0:
+            parent[start_id] = -1
+        if method == "bfs":
+            found = self._bfs(seeds, goal_id, parent)
+        elif method == "astar":
+            found = self._astar(seeds, goal_id, goal_cell, parent)
+        else:
+            raise ValueError("unknown planner: %s" % method)
+        if not found:
+            return None
+        path = []
+        cell_id = goal_id
+        while cell_id != -1 and cell_id != start_id:
+            path.append(cell_id)
+            cell_id = parent[cell_id]
+        path.reverse()
+        return path
+
+    def _bfs(self, seeds, goal_id, parent):
+        queue = deque(cell_id for cell_id, _ in seeds)
+        neighbors = self.neighbors
+        while queue:
+            cell_id = queue.popleft()
+            self.expanded += 1
+            if cell_id == goal_id:
+                return True
+            for next_id in neighbors[cell_id]:
+                if next_id >= 0 and next_id not in parent:
+                    parent[next_id] = cell_id
+                    queue.append(next_id)
+        return False
+
+    def _astar(self, seeds, goal_id, goal_cell, parent):
+        neighbors, costs, cells = self.neighbors, self.costs, self.cells
+        g_score = {}
+        heap = []
+        counter = 0
+        for cell_id, cost in seeds:
+            g_score[cell_id] = cost
+            # ties on f go to the deeper node, then to the insertion order
+            heapq.heappush(
+                heap, (cost + self.heuristic(cells[cell_id], goal_cell), -cost, counter, cell_id)
+            )
+            counter += 1
+        closed = set()
+        while heap:
+            _, neg_g, _, cell_id = heapq.heappop(heap)
+            if cell_id in closed:
+                continue
+            closed.add(cell_id)
+            self.expanded += 1
+            if cell_id == goal_id:
+                return True
+            g = -neg_g
+            for next_id, cost in zip(neighbors[cell_id], costs):
+                if next_id < 0 or next_id in closed:
+                    continue
+                new_g = g + cost
+                if new_g < g_score.get(next_id, math.inf) - 1e-9:
+                    g_score[next_id] = new_g
+                    parent[next_id] = cell_id
+                    heapq.heappush(
+                        heap,
+                        (new_g + self.heuristic(cells[next_id], goal_cell), -new_g, counter, next_id),
+                    )
+                    counter += 1
+        return False
+
+    def shortest_path(self, start, end, method="astar"):
+        """
+        Same contract as the original Oracle.shortest_path.
+
+        Args:
+            start (tuple): Regularized (x, z) of the start.
+            end (tuple): Reachable (x, z) of the goal.
+            method (str): "astar" or "bfs".
+
+        Returns:
+            list: (x, z) points from `start` to `end` (both included), [] if unreachable.
+        """
+        start = tuple(start)
+        path = self.search(self.grid.to_cell(start), self.grid.to_cell(end), method)
+        if path is None:
+            return []
+        coords = self.grid.coords
+        return [(start[0], start[1])] + [
+            (float(coords[cell_id, 0]), float(coords[cell_id, 1])) for cell_id in path
+        ]
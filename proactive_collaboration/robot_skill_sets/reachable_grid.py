@@ -0,0 +1,212 @@
+"""
+Integer-indexed occupancy grid of the reachable points returned by
+v1/info/get_reachable_points, shared by every Oracle of a scene.
+"""
+import itertools
+import re
+
+import numpy as np
+from spatial_index import SpatialIndex
+
+NUMBER_PATTERN = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+# neighbour offsets in (ix, iz); the 4-connected order is the order of the original
+# Oracle BFS (x+, x-, z+, z-) so that BFS on the integer grid returns the same paths
+NEIGHBOR_OFFSETS = {
+    4: ((1, 0), (-1, 0), (0, 1), (0, -1)),
+    8: ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)),
+}
+
+_grid_ids = itertools.count()
+
+
+def parse_point_strings(raw_points):
+    """
+    Parse reachable points given as "(x, y, z)" strings without eval.
+
+    Args:
+        raw_points (list): Points as "(x, y, z)" strings (or already as [x, y, z] lists).
+
+    Returns:
+        np.ndarray: (N, 3) float array.
+    """
+    if len(raw_points) == 0:
+        return np.zeros((0, 3), dtype=float)
+    if not isinstance(raw_points[0], str):
+        return np.asarray(raw_points, dtype=float).reshape(-1, 3)
+    values = NUMBER_PATTERN.findall(";".join(raw_points))
+    if len(values) != 3 * len(raw_points):
+        raise ValueError("reachable points must be '(x, y, z)' strings")
+    return np.array(values, dtype=float).reshape(-1, 3)
+
+
+class ReachableGrid:
+    """
+    Reachable (x, z) points snapped to integer cells of `grid_size`.
+
+    Cell (ix, iz) is the world point (ix * grid_size, iz * grid_size). `index` is a dense
+    2D array over the bounding box of the cells holding the id of each reachable cell
+    (-1 where blocked), so membership and id lookups are O(1) array reads.
+    """
+
+    def __init__(self, raw_points, grid_size=0.1):
+        self.grid_size = grid_size
+        xyz = parse_point_strings(raw_points)
+        self.cells = np.unique(
+            np.rint(xyz[:, [0, 2]] / grid_size).astype(np.int64), axis=0
+        ).reshape(-1, 2)
+        if len(self.cells):
+            self.origin = self.cells.min(axis=0)
+            shape = self.cells.max(axis=0) - self.origin + 1
+        else:
+            self.origin = np.zeros(2, dtype=np.int64)
+            shape = (0, 0)
+        self.index = np.full(tuple(shape), -1, dtype=np.int32)
+        local = self.cells - self.origin
+        self.index[local[:, 0], local[:, 1]] = np.arange(len(self.cells), dtype=np.int32)
+        self.occupancy = self.index >= 0
+        # world (x, z) of every cell, rounded like Oracle.get_regularized_pos
+        self.coords = np.round(self.cells * grid_size, 3)
+        # (x, z) of the raw points in the order of the simulator's list, for `scan_order`
+        self._raw_xz = xyz[:, [0, 2]]
+        self._scan_order = None
+        # simulator endpoint and scene_cache grid version this grid was fetched at
+        self.source = None
+        self.version = 0
+        # unique per grid object, tells apart grids built from the same source and version
+        self.uid = next(_grid_ids)
+        self._points = None
+        self._neighbor_tables = {}
+        self._components = None
+        self._spatial_index = None
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def points(self):
+        """Set of reachable (x, z) tuples, built once and shared."""
+        if self._points is None:
+            self._points = set(map(tuple, self.coords.tolist()))
+        return self._points
+
+    def to_cell(self, position):
+        """(x, z) -> (ix, iz)"""
+        return (
+            int(round(position[0] / self.grid_size)),
+            int(round(position[1] / self.grid_size)),
+        )
+
+    def to_world(self, cell):
+        """(ix, iz) -> (x, z)"""
+        return (
+            float(np.round(cell[0] * self.grid_size, 3)),
+            float(np.round(cell[1] * self.grid_size, 3)),
+        )
+
+    def cell_id(self, cell):
+        """Id of cell (ix, iz) in `cells`, -1 if the cell is not reachable."""
+        lx = cell[0] - self.origin[0]
+        lz = cell[1] - self.origin[1]
+        if 0 <= lx < self.index.shape[0] and 0 <= lz < self.index.shape[1]:
+            return int(self.index[lx, lz])
+        return -1
+
+    def contains(self, cell):
+        return self.cell_id(cell) >= 0
+
+    def cell_ids(self, cells):
+        """Vectorized cell_id for an (M, 2) array of cells."""
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        return self._local_ids(cells[:, 0] - self.origin[0], cells[:, 1] - self.origin[1])
+
+    def scan_order(self):
+        """
+        Rank of every cell in the iteration order of the set of raw (x, z) tuples that the
+        original Oracle scanned, where the first of several equally near points won.
+        Built once and shared.
+        """
+        if self._scan_order is None:
+            raw_points = set()
+            for point in map(tuple, self._raw_xz.tolist()):
+                raw_points.add(point)
+            order = np.full(len(self.cells), len(self.cells), dtype=np.int64)
+            if raw_points:
+                scanned = np.array(list(raw_points), dtype=float)
+                ids = self.cell_ids(np.rint(scanned / self.grid_size))
+                # the first raw point of a cell gives its rank
+                for rank, cell_id in reversed(list(enumerate(ids.tolist()))):
+                    if cell_id >= 0:
+                        order[cell_id] = rank
+            self._scan_order = order
+        return self._scan_order
+
+    def spatial_index(self):
+        """SpatialIndex over `coords` (ids are cell ids), built once and shared."""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.coords)
+        return self._spatial_index
+
+    def neighbor_table(self, connectivity=4):
+        """
+        Precomputed neighbour ids, built once per grid and connectivity.
+
+        Returns:
+            list: row i lists, in NEIGHBOR_OFFSETS order, the id of each neighbour of
+                cell i (-1 if blocked). Diagonal moves need both side cells free, so paths
+                never cut a corner.
+        """
+        table = self._neighbor_tables.get(connectivity)
+        if table is not None:
+            return table
+        local = self.cells - self.origin
+        ids = np.full((len(self.cells), len(NEIGHBOR_OFFSETS[connectivity])), -1, dtype=np.int32)
+        for k, (dx, dz) in enumerate(NEIGHBOR_OFFSETS[connectivity]):
+            ids[:, k] = self._local_ids(local[:, 0] + dx, local[:, 1] + dz)
+            if dx != 0 and dz != 0:
+                corner_free = (self._local_ids(local[:, 0] + dx, local[:, 1]) >= 0) & (
+                    self._local_ids(local[:, 0], local[:, 1] + dz) >= 0
+                )
+                ids[~corner_free, k] = -1
+        table = ids.tolist()
+        self._neighbor_tables[connectivity] = table
+        return table
+
+    def _local_ids(self, lx, lz):
+        ids = np.full(len(lx), -1, dtype=np.int32)
+        inside = (
+            (lx >= 0) & (lx < self.index.shape[0]) & (lz >= 0) & (lz < self.index.shape[1])
+        )
+        ids[inside] = self.index[lx[inside], lz[inside]]
+        return ids
+
+    def components(self):
+        """
+        Connected components of the grid, labeled once and shared.
+
+        Diagonal moves never cut a corner, so 4- and 8-connectivity give the same components.
+
+        Returns:
+            tuple: (labels, members) where labels[i] is the component of cell i and
+                members[label] is the array of cell ids of that component.
+        """
+        if self._components is None:
+            neighbors = self.neighbor_table(4)
+            labels = [-1] * len(self.cells)
+            members = []
+            for seed in range(len(self.cells)):
+                if labels[seed] >= 0:
+                    continue
+                label = len(members)
+                labels[seed] = label
+                stack = [seed]
+                component = [seed]
+                while stack:
+                    for next_id in neighbors[stack.pop()]:
+                        if next_id >= 0 and labels[next_id] < 0:
+                            labels[next_id] = label
+                            stack.append(next_id)
+                            component.append(next_id)
+                members.append(np.sort(np.array(component, dtype=np.int64)))
+            self._components = (np.array(labels, dtype=np.int32), members)
+        return self._components
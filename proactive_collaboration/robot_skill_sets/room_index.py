@@ -0,0 +1,108 @@
+"""
+Room classification of (x, z) points against the room polygons of a scene (EDGES).
+
+RoomIndex keeps the edges of every room polygon in flat arrays and classifies a batch
+of points against all rooms at once with the even-odd crossing test of matplotlib's
+Path.contains_point used by `ultilities.is_point_in_quadrilateral`, including its rule
+for points on an edge (benchmarks/bench_rooms.py checks the parity). Rooms are tried in
+EDGES order and the first match wins, points in no room are in the default room
+("hallway").
+
+Optionally the rooms of the cells of a ReachableGrid are baked into a raster, then a
+point in a cell lying entirely in one room is classified with an array lookup.
+"""
+import numpy as np
+from spatial_index import planar
+
+
+class RoomIndex:
+    """
+    Args:
+        rooms (dict): {room_name: [[x, z], ...]} polygons of the scene, EDGES[scene].
+        default (str): Room of the points outside every polygon.
+    """
+
+    def __init__(self, rooms, default="hallway"):
+        self.names = list(rooms or {})
+        self.default = default
+        x1, z1, x2, z2, edge_room = [], [], [], [], []
+        for room_id, name in enumerate(self.names):
+            polygon = np.asarray(rooms[name], dtype=float).reshape(-1, 2)
+            following = np.roll(polygon, -1, axis=0)
+            x1.extend(polygon[:, 0])
+            z1.extend(polygon[:, 1])
+            x2.extend(following[:, 0])
+            z2.extend(following[:, 1])
+            edge_room.extend([room_id] * len(polygon))
+        self.x1 = np.asarray(x1, dtype=float)
+        self.z1 = np.asarray(z1, dtype=float)
+        self.x2 = np.asarray(x2, dtype=float)
+        self.z2 = np.asarray(z2, dtype=float)
+        self.edge_room = np.asarray(edge_room, dtype=np.int64)
+        # (E, R) one-hot of the room of every edge, sums the crossings per room
+        self.edge_room_matrix = np.zeros((len(self.edge_room), len(self.names)), dtype=np.int64)
+        self.edge_room_matrix[np.arange(len(self.edge_room)), self.edge_room] = 1
+        # baked raster (see `bake`)
+        self.grid = None
+        self.cell_rooms = None
+
+    def _classify(self, xz):
+        """Room ids (-1: default room) of an (M, 2) array of (x, z) points."""
+        if len(xz) == 0 or len(self.names) == 0:
+            return np.full(len(xz), -1, dtype=np.int64)
+        px = xz[:, 0:1]
+        pz = xz[:, 1:2]
+        # edge (x1, z1) -> (x2, z2) crosses the ray from the point, with the comparisons and
+        # arithmetic of matplotlib's point_in_path_impl (_path.h), so points on an edge or a
+        # vertex (e.g. the 0.1 m lattice robots stand on) get the same room as Path.contains_point
+        z1_above = self.z1 >= pz
+        z2_above = self.z2 >= pz
+        side = (self.z2 - pz) * (self.x1 - self.x2) >= (self.x2 - px) * (self.z1 - self.z2)
+        crosses = (z1_above != z2_above) & (side == z2_above)
+        crossings = crosses.astype(np.int64) @ self.edge_room_matrix
+        inside = (crossings % 2) == 1
+        return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+    def room_ids(self, points):
+        """
+        Room ids (index in `names`, -1 for the default room) of (x, z) or (x, y, z) points.
+        Points in a uniform cell of the baked raster are looked up, the others are tested.
+        """
+        xz = planar(points)
+        if self.grid is None or len(xz) == 0:
+            return self._classify(xz)
+        ids = self.grid.cell_ids(np.rint(xz / self.grid.grid_size))
+        rooms = np.where(ids >= 0, self.cell_rooms[np.maximum(ids, 0)], -2)
+        missing = rooms == -2
+        if missing.any():
+            rooms[missing] = self._classify(xz[missing])
+        return rooms
+
+    def rooms_of(self, points):
+        """Room names of a list of (x, z) or (x, y, z) points."""
+        return [self.names[i] if i >= 0 else self.default for i in self.room_ids(points).tolist()]
+
+    def room_of(self, point):
+        return self.rooms_of([point])[0]
+
+    def bake(self, grid):
+        """
+        Bake the rooms of the cells of `grid` (a ReachableGrid). A cell gets the room of its
+        center if no polygon edge comes closer to the center than the cell's half diagonal,
+        else -2 (tested on lookup), so the raster gives the same answers as the polygon test.
+        """
+        centers = grid.coords
+        rooms = self._classify(centers)
+        if len(centers) and len(self.x1):
+            # distance from every cell center to every edge segment
+            ex, ez = self.x2 - self.x1, self.z2 - self.z1
+            length2 = np.where(ex * ex + ez * ez == 0, 1.0, ex * ex + ez * ez)
+            t = ((centers[:, 0:1] - self.x1) * ex + (centers[:, 1:2] - self.z1) * ez) / length2
+            t = np.clip(t, 0.0, 1.0)
+            dx = self.x1 + t * ex - centers[:, 0:1]
+            dz = self.z1 + t * ez - centers[:, 1:2]
+            near_edge = (dx * dx + dz * dz).min(axis=1) <= (grid.grid_size * grid.grid_size) / 2
+            rooms = np.where(near_edge, -2, rooms)
+        self.cell_rooms = rooms
+        self.grid = grid
+        return self
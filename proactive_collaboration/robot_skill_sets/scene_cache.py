@@ -0,0 +1,184 @@
+"""
+Per-scene caches of simulator data that only changes when the scene changes:
+static object metadata and the reachable grid.
+
+Everything is cached per simulator endpoint and invalidated from the ue_api state
+listeners, so callers never see data from before a select_scene / move_object /
+robot_setup / joint_pull of the same simulator.
+"""
+import re
+import threading
+
+import numpy as np
+from reachable_grid import ReachableGrid
+from unity.ue_api import (
+    add_state_listener,
+    get_client,
+    get_object_type,
+    get_reachable_points,
+)
+
+COORDINATE_PATTERN = re.compile(
+    r"\((-?\d+\.\d+),\s*(-?\d+\.\d+),\s*(-?\d+\.\d+)\)"
+)
+
+
+def parse_points(points_str):
+    """
+    Parse an "(x, y, z);(x, y, z);..." string (EdgePoints / PutPoints) into a list of
+    [x, y, z] float lists, same output as ultilities.parse_coordinates_from_string.
+    """
+    if not points_str:
+        return []
+    return [
+        [float(x), float(y), float(z)]
+        for x, y, z in COORDINATE_PATTERN.findall(points_str)
+    ]
+
+
+class ObjectMeta:
+    """Static metadata of one object, as returned by v1/info/object_type."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.type = data.get(name)
+        self.placeable = data.get(name + "Placeable")
+        self.raw_edge_points = data.get(name + "EdgePoints")
+        self.raw_put_points = data.get(name + "PutPoints")
+        self.edge_points = parse_points(self.raw_edge_points)
+        self.put_points = parse_points(self.raw_put_points)
+        # (N, 3) arrays for vectorized distance queries
+        self.edge_array = np.array(self.edge_points, dtype=float).reshape(-1, 3)
+        self.put_array = np.array(self.put_points, dtype=float).reshape(-1, 3)
+
+    def type_data(self):
+        """The entries of this object in the `get_object_type(...)['data']` format."""
+        data = {}
+        for key, value in (
+            (self.name, self.type),
+            (self.name + "Placeable", self.placeable),
+            (self.name + "EdgePoints", self.raw_edge_points),
+            (self.name + "PutPoints", self.raw_put_points),
+        ):
+            if value is not None:
+                data[key] = value
+        return data
+
+
+class SceneCache:
+    """Cached scene data of one simulator endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.object_meta = {}
+        # bumped on every invalidation, fetches started before it are not stored
+        self.generation = 0
+        self.meta_hits = 0
+        self.meta_misses = 0
+        self.reachable_grids = {}  # {grid_size: ReachableGrid}
+        # bumped whenever the reachable grid may have changed
+        self.grid_version = 0
+
+    def invalidate_objects(self, object_names=None):
+        with self.lock:
+            self.generation += 1
+            if object_names is None:
+                self.object_meta.clear()
+            else:
+                for name in object_names:
+                    self.object_meta.pop(name, None)
+
+    def invalidate_grid(self):
+        with self.lock:
+            self.grid_version += 1
+            self.reachable_grids.clear()
+
+
+_scene_caches = {}
+_scene_caches_lock = threading.Lock()
+
+
+def get_scene_cache(client=None):
+    client = client or get_client()
+    cache = _scene_caches.get(client.remote_url)
+    if cache is None:
+        with _scene_caches_lock:
+            cache = _scene_caches.setdefault(client.remote_url, SceneCache())
+    return cache
+
+
+def get_object_meta(object_list, client=None):
+    """
+    Return {object_name: ObjectMeta} for `object_list`. Only the objects not cached yet are
+    fetched, with a single get_object_type call to `client` (default: the REMOTE_URL client).
+    """
+    client = client or get_client()
+    cache = get_scene_cache(client)
+    res = {}
+    missing = []
+    with cache.lock:
+        for name in object_list:
+            meta = cache.object_meta.get(name)
+            if meta is None:
+                missing.append(name)
+            else:
+                res[name] = meta
+        cache.meta_hits += len(object_list) - len(missing)
+        cache.meta_misses += len(missing)
+        generation = cache.generation
+    if missing:
+        missing = list(dict.fromkeys(missing))
+        data = get_object_type({"object_list": missing}, client=client).get("data", {})
+        with cache.lock:
+            for name in missing:
+                meta = ObjectMeta(name, data)
+                # unknown objects are not cached, the next call asks the simulator again
+                if meta.type is not None and generation == cache.generation:
+                    cache.object_meta[name] = meta
+                res[name] = meta
+    return res
+
+
+def get_object_type_data(object_list, client=None):
+    """Cached drop-in for `get_object_type({"object_list": object_list})['data']`."""
+    data = {}
+    for meta in get_object_meta(object_list, client).values():
+        data.update(meta.type_data())
+    return data
+
+
+def get_reachable_grid(grid_size=0.1, client=None):
+    """
+    Return the ReachableGrid of the current scene, fetched from the simulator once per scene
+    (and again after robot_setup / joint_pull) and shared by every Oracle.
+    """
+    client = client or get_client()
+    cache = get_scene_cache(client)
+    with cache.lock:
+        grid = cache.reachable_grids.get(grid_size)
+        grid_version = cache.grid_version
+    if grid is None:
+        raw_points = get_reachable_points({"step_size": grid_size}, client=client)["reachable_point"]
+        grid = ReachableGrid(raw_points, grid_size)
+        grid.source = client.remote_url
+        grid.version = grid_version
+        with cache.lock:
+            if grid_version == cache.grid_version:
+                grid = cache.reachable_grids.setdefault(grid_size, grid)
+    return grid
+
+
+def _on_state_change(event, client, payload):
+    cache = get_scene_cache(client)
+    if event in ("select_scene", "scene_reset", "robot_setup", "joint_pull"):
+        cache.invalidate_grid()
+    if event in ("select_scene", "scene_reset", "move_object", "joint_pull"):
+        cache.invalidate_objects()
+    elif event in ("pick", "place"):
+        # the carried object moves with the robot, its edge points are stale
+        cache.invalidate_objects(
+            [info.get("object_name") for info in payload.values() if isinstance(info, dict)]
+        )
+
+
+add_state_listener(_on_state_change)
@@ -0,0 +1,150 @@
+"""
+Nearest-point and within-radius queries on (x, z) points.
+
+SpatialIndex hashes the points into square buckets so a query only looks at the
+buckets around the query position; `nearest_point_index` is the vectorized linear
+scan used for short lists such as the edge points of one object.
+"""
+import math
+
+import numpy as np
+
+
+def planar(points):
+    """(N, 2) (x, z) float array of (x, z) or (x, y, z) points."""
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        points = points.reshape(1, -1)
+    if points.shape[-1] == 3:
+        return points[:, [0, 2]]
+    return points.reshape(-1, 2)
+
+
+def distances(points_xz, position):
+    """2D distances from every row of `points_xz` to the (x, z) `position`."""
+    dx = points_xz[:, 0] - position[0]
+    dz = points_xz[:, 1] - position[1]
+    return np.sqrt(dx * dx + dz * dz)
+
+
+def nearest_point_index(points, position, mask=None):
+    """
+    Index of the point nearest to `position` in the (x, z) plane, -1 if there is none.
+    Ties go to the first point, like a `dist < best` scan.
+
+    Args:
+        points: (N, 2) or (N, 3) points.
+        position: (x, z) or (x, y, z) position.
+        mask (np.ndarray): Optional bool array, only points where it is True are considered.
+    """
+    xz = planar(points)
+    position = planar(position)[0]
+    if len(xz) == 0:
+        return -1
+    dist = distances(xz, position)
+    if mask is not None:
+        if not mask.any():
+            return -1
+        dist = np.where(mask, dist, np.inf)
+    return int(np.argmin(dist))
+
+
+class SpatialIndex:
+    """
+    Hashed-bucket index over a fixed set of points.
+
+    Args:
+        points: (N, 2) (x, z) or (N, 3) (x, y, z) points.
+        bucket_size (float): Side of the square buckets in meters.
+    """
+
+    def __init__(self, points, bucket_size=0.5):
+        self.xz = planar(points)
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        if len(self.xz) == 0:
+            self.key_min = self.key_max = np.zeros(2, dtype=np.int64)
+            return
+        keys = np.floor(self.xz / bucket_size).astype(np.int64)
+        self.key_min = keys.min(axis=0)
+        self.key_max = keys.max(axis=0)
+        order = np.lexsort((np.arange(len(keys)), keys[:, 1], keys[:, 0]))
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.any(np.diff(sorted_keys, axis=0) != 0, axis=1)) + 1
+        for ids in np.split(order, bounds):
+            self.buckets[(int(keys[ids[0], 0]), int(keys[ids[0], 1]))] = ids
+
+    def __len__(self):
+        return len(self.xz)
+
+    def _key(self, position):
+        return (
+            int(math.floor(position[0] / self.bucket_size)),
+            int(math.floor(position[1] / self.bucket_size)),
+        )
+
+    def _gather(self, keys):
+        found = [self.buckets[key] for key in keys if key in self.buckets]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def within_radius(self, position, radius):
+        """
+        Sorted ids of the points strictly closer than `radius` to the (x, z) `position`.
+        """
+        position = planar(position)[0]
+        low = self._key(position - radius)
+        high = self._key(position + radius)
+        ids = self._gather(
+            (kx, kz)
+            for kx in range(max(low[0], self.key_min[0]), min(high[0], self.key_max[0]) + 1)
+            for kz in range(max(low[1], self.key_min[1]), min(high[1], self.key_max[1]) + 1)
+        )
+        ids = ids[distances(self.xz[ids], position) < radius]
+        return np.sort(ids)
+
+    def nearest(self, position, mask=None):
+        """
+        Id of the point nearest to the (x, z) `position`, -1 if there is none.
+        Ties go to the lowest id.
+
+        Args:
+            position: (x, z) or (x, y, z) position.
+            mask (np.ndarray): Optional bool array over the ids, only points where it is
+                True are considered.
+        """
+        position = planar(position)[0]
+        if len(self.xz) == 0 or (mask is not None and not mask.any()):
+            return -1
+        center = self._key(position)
+        # rings of buckets around the query bucket, until no farther ring can be closer
+        max_ring = int(
+            max(
+                np.abs(self.key_min - center).max(),
+                np.abs(self.key_max - center).max(),
+            )
+        )
+        best_id, best_dist = -1, np.inf
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                keys = [center]
+            else:
+                keys = [
+                    (center[0] + dx, center[1] + dz)
+                    for dx in range(-ring, ring + 1)
+                    for dz in range(-ring, ring + 1)
+                    if max(abs(dx), abs(dz)) == ring
+                ]
+            ids = self._gather(keys)
+            if mask is not None and len(ids):
+                ids = ids[mask[ids]]
+            if len(ids):
+                dist = distances(self.xz[ids], position)
+                i = np.lexsort((ids, dist))[0]
+                if dist[i] < best_dist or (dist[i] == best_dist and ids[i] < best_id):
+                    best_id, best_dist = int(ids[i]), dist[i]
+            # every point of ring + 1 is at least ring * bucket_size away
+            if best_id >= 0 and best_dist <= ring * self.bucket_size:
+                break
+        return best_id
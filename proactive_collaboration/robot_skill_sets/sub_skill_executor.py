@@ -4,6 +4,7 @@ import time
 from collections import deque
 
 from oracle import Oracle
+from scene_cache import get_reachable_grid
 from ultilities import (
     get_2d_distance,
     get_nearest_edge_point,
@@ -26,18 +27,16 @@ from unity.ue_api import (
 )
 
 
-def robot_go_to_obj_path(robotName, objectName):
-    rechable_json = get_reachable_points({"step_size": 0.1})
-    reachable_points = rechable_json["reachable_point"]
-    agent = Oracle(reachable_points, 0.1, 0.2)
+def robot_go_to_obj_path(robotName, objectName, client=None):
+    agent = Oracle(get_reachable_grid(0.1, client=client), 0.1, 0.2)
     InfoInput = {
     "object_list":[robotName, objectName]
     }
-    infos = get_object_info(InfoInput)
+    infos = get_object_info(InfoInput, client=client)
     robot_loc = infos[robotName]['location']
     # target_loc = infos[objectName]['location']
     # nearest for big objs
-    target_loc = get_nearest_edge_point(robot_loc, objectName)
+    target_loc = get_nearest_edge_point(robot_loc, objectName, client=client)
     track = [
         robot_loc,
         target_loc
@@ -48,14 +47,12 @@ def robot_go_to_obj_path(robotName, objectName):
     # pprint.pprint(path)
     return path
 
-def robot_go_to_point_path(robotName, point_loc):
-    rechable_json = get_reachable_points({"step_size": 0.1})
-    reachable_points = rechable_json["reachable_point"]
-    agent = Oracle(reachable_points, 0.1, 0.2)
+def robot_go_to_point_path(robotName, point_loc, client=None):
+    agent = Oracle(get_reachable_grid(0.1, client=client), 0.1, 0.2)
     InfoInput = {
     "object_list":[robotName]
     }
-    infos = get_object_info(InfoInput)
+    infos = get_object_info(InfoInput, client=client)
     robot_loc = infos[robotName]['location']
     # target_loc = infos[objectName]['location']
     # nearest for big objs
@@ -72,14 +69,12 @@ def robot_go_to_point_path(robotName, point_loc):
 
 # def robot_go_to_room(robotName, roomName)
 
-def explore_room(robotName, key_points, roomName = "Bedroom"):
-    rechable_json = get_reachable_points(0.1)
-    reachable_points = rechable_json["reachable_point"]
-    agent = Oracle(reachable_points, 0.1, 0.2)
+def explore_room(robotName, key_points, roomName = "Bedroom", client=None):
+    agent = Oracle(get_reachable_grid(0.1, client=client), 0.1, 0.2)
     InfoInput = {
     "object_list":[robotName]
     }
-    infos = get_object_info(InfoInput)
+    infos = get_object_info(InfoInput, client=client)
     robot_loc = infos[robotName]
     track = key_points
     path = agent.get_whole_path(robot_loc, track)
@@ -0,0 +1,167 @@
+"""
+Long-lived bounded worker pool of an Env, running the robot actions of each co_act tick.
+
+Env.co_act used to create a ThreadPoolExecutor per call, and joint_goto_object another
+one inside the [gopull] tasks. The TickScheduler keeps one executor for the whole episode
+and lets tasks wait on subtasks submitted to the same pool without deadlocking it: a
+subtask that has not started when its result is needed is taken back from the queue and
+run by the waiting thread.
+
+Optionally, the tasks running against one simulator endpoint are capped (shared by every
+scheduler of the process using that endpoint). A task waiting for a subtask gives its slot
+back while it waits.
+
+Every tick records when each task was queued, started and finished, the report names the
+task on the critical path (the one finishing last, after which the tick can end) and how
+long it waited in the queue.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 16
+
+_endpoint_slots = {}
+_endpoint_lock = threading.Lock()
+_local = threading.local()  # .slot: endpoint slot held by the task of this thread, .label
+
+
+def endpoint_slots(endpoint, limit):
+    """Semaphore capping the concurrent tasks of `endpoint`, shared process-wide (first limit wins)."""
+    with _endpoint_lock:
+        if endpoint not in _endpoint_slots:
+            _endpoint_slots[endpoint] = threading.BoundedSemaphore(limit)
+        return _endpoint_slots[endpoint]
+
+
+class ScheduledTask:
+    """A task submitted to a TickScheduler, `result()` waits for it (or runs it if still queued)."""
+
+    def __init__(self, scheduler, label, fn, args, kwargs):
+        self.scheduler = scheduler
+        parent = getattr(_local, "label", None)
+        self.label = f"{parent}/{label}" if parent else label
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.queued = time.perf_counter()
+        self.future = scheduler.executor.submit(self._run)
+
+    def _run(self, inline=False):
+        slots = self.scheduler.slots
+        previous_slot = getattr(_local, "slot", None)
+        previous_label = getattr(_local, "label", None)
+        # a subtask run by its waiting parent uses the parent's slot
+        acquire = slots is not None and not (inline and previous_slot is not None)
+        if acquire:
+            slots.acquire()
+        _local.slot = slots
+        _local.label = self.label
+        start = time.perf_counter()
+        try:
+            return self.fn(*self.args, **self.kwargs)
+        finally:
+            self.scheduler.record(self.label, self.queued, start, time.perf_counter())
+            _local.slot = previous_slot
+            _local.label = previous_label
+            if acquire:
+                slots.release()
+
+    def result(self):
+        if self.future.cancel():
+            return self._run(inline=True)
+        slot = getattr(_local, "slot", None)
+        if slot is not None:
+            slot.release()
+        try:
+            return self.future.result()
+        finally:
+            if slot is not None:
+                slot.acquire()
+
+
+class TickScheduler:
+    """
+    Args:
+        max_workers (int): Threads of the pool.
+        endpoint (str): Simulator endpoint of the tasks (remote url), for the cap.
+        endpoint_limit (int): Max concurrent tasks against `endpoint`, None for no cap.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, endpoint=None, endpoint_limit=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="env-tick")
+        self.slots = endpoint_slots(endpoint, endpoint_limit) if endpoint_limit else None
+        self.ticks = []  # one report per tick, see `run_tick`
+        self._lock = threading.Lock()
+        self._tick = None
+
+    def submit(self, fn, *args, label=None, **kwargs):
+        """Submit fn(*args, **kwargs), returns a ScheduledTask."""
+        return ScheduledTask(self, label or getattr(fn, "__name__", "task"), fn, args, kwargs)
+
+    def run_all(self, tasks):
+        """
+        Run [(label, fn, args), ...] concurrently, e.g. the subtasks of a task.
+
+        Returns:
+            list: The results, in the order of `tasks`.
+        """
+        handles = [self.submit(fn, *args, label=label) for label, fn, args in tasks]
+        return [handle.result() for handle in handles]
+
+    def run_tick(self, tasks):
+        """
+        Run the tasks [(label, fn, args), ...] of one tick and record its timings.
+
+        Returns:
+            tuple: (results in the order of `tasks`, tick report: {"tick", "wall",
+                "critical_task", "critical_path", "critical_queue", "busy", "parallelism",
+                "max_queue", "tasks": {label: [queued, started, finished] seconds since the
+                start of the tick}})
+        """
+        with self._lock:
+            self._tick = {"start": time.perf_counter(), "tasks": []}
+        try:
+            results = self.run_all(tasks)
+        finally:
+            with self._lock:
+                tick, self._tick = self._tick, None
+        end = time.perf_counter()
+        start = tick["start"]
+        top_level = [task for task in tick["tasks"] if "/" not in task[0]]
+        critical = max(top_level, key=lambda task: task[3], default=None)
+        busy = sum(finished - started for _, _, started, finished in top_level)
+        report = {
+            "tick": len(self.ticks) + 1,
+            "wall": end - start,
+            "critical_task": critical[0] if critical else None,
+            "critical_path": critical[3] - start if critical else 0.0,
+            "critical_queue": critical[2] - critical[1] if critical else 0.0,
+            "busy": busy,
+            "parallelism": busy / (end - start) if end > start else 0.0,
+            "max_queue": max((started - queued for _, queued, started, _ in tick["tasks"]), default=0.0),
+            "tasks": {
+                label: [round(queued - start, 4), round(started - start, 4), round(finished - start, 4)]
+                for label, queued, started, finished in tick["tasks"]
+            },
+        }
+        self.ticks.append(report)
+        return results, report
+
+    def record(self, label, queued, started, finished):
+        with self._lock:
+            if self._tick is not None:
+                self._tick["tasks"].append((label, queued, started, finished))
+
+    def summary(self):
+        """Totals over the ticks: wall and critical path seconds, busy seconds, max queue wait."""
+        return {
+            "ticks": len(self.ticks),
+            "wall": sum(tick["wall"] for tick in self.ticks),
+            "critical_path": sum(tick["critical_path"] for tick in self.ticks),
+            "busy": sum(tick["busy"] for tick in self.ticks),
+            "max_queue": max((tick["max_queue"] for tick in self.ticks), default=0.0),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -5,9 +5,10 @@ import pprint
 import re
 import time
 
-import cv2
-import matplotlib.path as mpath
 import numpy as np
+from reachable_grid import parse_point_strings
+from scene_cache import get_object_meta
+from spatial_index import distances, nearest_point_index, planar
 from unity.ue_api import (
     get_object_info,
     get_object_type,
@@ -25,14 +26,11 @@ from unity.ue_api import (
 )
 
 
-def get_moving_direction(Moveable_object, trapped_object):
-    getObjectType = {"object_list": [Moveable_object]}
-    edge_points = parse_coordinates_from_string(
-        get_object_type(getObjectType)["data"][Moveable_object + "EdgePoints"]
-    )
+def get_moving_direction(Moveable_object, trapped_object, client=None):
+    edge_points = get_object_meta([Moveable_object], client=client)[Moveable_object].edge_points
 
     getObjectLoc = {"object_list": [trapped_object]}
-    object_state = get_object_info(getObjectLoc)[trapped_object]
+    object_state = get_object_info(getObjectLoc, client=client)[trapped_object]
     trapped_location = object_state["location"]
 
     # Initialize movement direction
@@ -77,6 +75,9 @@ def is_point_in_quadrilateral(points, point):
     if len(points) != 4:
         raise ValueError("必须提供四个点来定义四边形")
 
+    # matplotlib is only needed here, imported on first use
+    import matplotlib.path as mpath
+
     # 确保点按顺时针或逆时针排列（简单实现，假设用户输入正确）
     polygon = mpath.Path(points)
     return polygon.contains_point(point)
@@ -90,49 +91,25 @@ def is_point_in_quadrilateral(points, point):
 # print(f"点 {test_point} {'在' if result else '不在'} 四边形内")
 
 
-def obs_get_nearest_edge_point_list(robot_loc, object_name, avoid_loc_list):
+def obs_get_nearest_edge_point_list(robot_loc, object_name, avoid_loc_list, client=None):
     if avoid_loc_list == []:
-        return get_nearest_edge_point(robot_loc, object_name)
+        return get_nearest_edge_point(robot_loc, object_name, client=client)
 
-    getObjectType = {"object_list": [object_name]}
-    edge_points = parse_coordinates_from_string(
-        get_object_type(getObjectType)["data"][object_name + "EdgePoints"]
-    )
-    # Initialize min_distance to infinity
-    min_distance = float("inf")
-    closest_point = edge_points[0]
-
-    for point in edge_points:
-        # Check validity of the point
-        is_valid = True
-        for avoid_loc in avoid_loc_list:
-            if get_2d_distance(point, avoid_loc) < 0.5:
-                is_valid = False
-                break
-
-        # Update closest point if valid and distance is smaller
-        if is_valid:
-            distance = get_2d_distance(point, robot_loc)
-            if distance < min_distance:
-                min_distance = distance
-                closest_point = point
-
-    return closest_point
-
-
-def get_nearest_edge_point(robot_loc, object_name):
-    getObjectType = {"object_list": [object_name]}
-    edge_points = parse_coordinates_from_string(
-        get_object_type(getObjectType)["data"][object_name + "EdgePoints"]
-    )
-    minima = 1000
-    res = edge_points[0]
-    for point in edge_points:
-        dis = get_2d_distance(point, robot_loc)
-        if dis < minima:
-            minima = dis
-            res = point
-    return res
+    meta = get_object_meta([object_name], client=client)[object_name]
+    edge_xz = planar(meta.edge_array)
+    # A point is valid if it is at least 0.5 away from every location to avoid
+    is_valid = np.ones(len(edge_xz), dtype=bool)
+    for avoid_loc in avoid_loc_list:
+        is_valid &= distances(edge_xz, planar(avoid_loc)[0]) >= 0.5
+
+    # Closest valid point, the first edge point if none is valid
+    closest = nearest_point_index(edge_xz, planar(robot_loc)[0], is_valid)
+    return list(meta.edge_points[max(closest, 0)])
+
+
+def get_nearest_edge_point(robot_loc, object_name, client=None):
+    meta = get_object_meta([object_name], client=client)[object_name]
+    return list(meta.edge_points[max(nearest_point_index(meta.edge_array, robot_loc), 0)])
 
 
 def relation_to_str(objects, relation_dict: dict):
@@ -160,46 +137,47 @@ def relation_to_str(objects, relation_dict: dict):
     return object_str
 
 
+def parse_offset(rel_pos):
+    """Relative position key of get_object_neighbors, e.g. "(0, -1, 0)", as a float tuple."""
+    return tuple(map(float, rel_pos.strip("()").split(",")))
+
+
 def parse_relations(object_neighbors):
+    """
+    "on" and "between" relations of the objects of a get_object_neighbors response.
+
+    A neighbor at offset (0, -1, 0) is under the object, two different neighbors at offsets
+    mirrored in x or in z are on both sides of it. Every offset is parsed once and the
+    neighbors are grouped by offset, so the pairs are found by looking up the mirrored
+    offsets instead of comparing every neighbor with every other one.
+
+    Returns:
+        dict: {object: {"on": [neighbor, ...], "between": [(neighbor, neighbor), ...]}}
+    """
     relations = {}
 
     for obj, neighbors in object_neighbors.items():
         if obj in ["error_info", "is_success"]:  # Skip non-object keys
             continue
 
-        on_relations = set()
-        between_relations = set()
-
+        by_offset = {}
         for rel_pos, neighbor in neighbors.items():
-            # Convert string positions to tuples
-            rel_pos_tuple = tuple(map(float, rel_pos.strip("()").split(",")))
+            by_offset.setdefault(parse_offset(rel_pos), []).append(neighbor)
 
-            # Check "on" relation: y-axis is -1
-            if rel_pos_tuple == (0.0, -1.0, 0.0):
-                on_relations.add(neighbor)
+        # Check "on" relation: y-axis is -1
+        on_relations = set(by_offset.get((0.0, -1.0, 0.0), ()))
 
-            # Check "between" relation: Opposite x or z axis
-            for other_rel_pos, other_neighbor in neighbors.items():
-                if neighbor == other_neighbor or other_neighbor == obj:
+        # Check "between" relation: opposite x or z axis
+        between_relations = set()
+        for (x, y, z), group in by_offset.items():
+            for mirrored in ((-x, y, z), (x, y, -z)):
+                others = by_offset.get(mirrored)
+                if not others:
                     continue
-
-                other_rel_pos_tuple = tuple(
-                    map(float, other_rel_pos.strip("()").split(","))
-                )
-
-                # Opposite x-axis
-                if (
-                    rel_pos_tuple[0] == -other_rel_pos_tuple[0]
-                    and rel_pos_tuple[1:] == other_rel_pos_tuple[1:]
-                ):
-                    between_relations.add(tuple(sorted([neighbor, other_neighbor])))
-
-                # Opposite z-axis
-                if (
-                    rel_pos_tuple[2] == -other_rel_pos_tuple[2]
-                    and rel_pos_tuple[:2] == other_rel_pos_tuple[:2]
-                ):
-                    between_relations.add(tuple(sorted([neighbor, other_neighbor])))
+                for neighbor in group:
+                    for other_neighbor in others:
+                        if neighbor != other_neighbor:
+                            between_relations.add(tuple(sorted([neighbor, other_neighbor])))
 
         relations[obj] = {
             "on": list(on_relations),
@@ -284,20 +262,9 @@ def parse_reachable_points(raw_reachable_points):
     Returns:
     set: A set containing the 2D coordinates (x, z) of each reachable point.
     """
-    reachable_points = set()
-
-    # Iterate over the raw reachable points
-    for point in raw_reachable_points:
-        # Convert the string representation of the point into an actual tuple
-        point = eval(point)  # Assumes point is a string like "(x, y, z)"
-
-        # Extract x, y, z coordinates (we will only use x and z for 2D movement)
-        x, y, z = point
-
-        # Add the (x, z) coordinates to the set of reachable points
-        reachable_points.add((x, z))
-
-    return reachable_points
+    # Parse the "(x, y, z)" strings without eval and keep the (x, z) coordinates for 2D movement
+    points = parse_point_strings(raw_reachable_points)
+    return set(map(tuple, points[:, [0, 2]].tolist()))
 
 
 if __name__ == "__main__":
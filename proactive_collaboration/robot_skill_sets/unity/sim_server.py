@@ -0,0 +1,358 @@
+"""
+Local stand-in for the Unity simulator, serving the v1 API of ue_api.py from recorded
+scene snapshots (see snapshot.py), so navigation and observation code can be run and
+benchmarked without the Unity build.
+
+The scene state (robots, held objects, object locations) is simulated with simple
+rules, not physics:
+    - get_obs returns the objects within `view_range` meters and `fov` degrees of the
+      robot heading (no occlusion);
+    - an object moved by move_object / place rests on the placeable object with the
+      nearest put point (within 0.75 m), else on the floor;
+    - a held object follows its robot;
+    - joint_pull shifts the object and its edge / put points by `pull_distance` meters,
+      the reachable points stay those of the snapshot.
+
+Usage (from proactive_collaboration/):
+    python robot_skill_sets/unity/sim_server.py --port 18766
+and point args/select_args.json "remote_url" at http://127.0.0.1:18766/.
+"""
+import argparse
+import copy
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import Flask, jsonify, request
+from snapshot import SNAPSHOT_DIR, load_snapshot
+
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+SUPPORT_RADIUS = 0.75
+ON = "(0, -1, 0)"
+SUCCESS = {"result": "Success"}
+
+
+def parse_vector(value):
+    """[x, y, z] of a list or a "(x, y, z)" string."""
+    if isinstance(value, str):
+        return [float(v) for v in NUMBER_PATTERN.findall(value)]
+    return [float(v) for v in value]
+
+
+def shift_points(points_str, offset):
+    """Shift an "(x, y, z);(x, y, z);..." string (EdgePoints / PutPoints) by `offset`."""
+    shifted = []
+    for point in points_str.split(";"):
+        if not point.strip():
+            continue
+        x, y, z = parse_vector(point)[:3]
+        shifted.append("(%s, %s, %s)" % (round(x + offset[0], 4), round(y + offset[1], 4), round(z + offset[2], 4)))
+    return ";".join(shifted)
+
+
+class SimulatorState:
+    """
+    Scene state of one simulator instance.
+
+    Args:
+        snapshot_dir (str): Directory of the scene snapshots.
+        view_range (float): Max distance of an observed object in meters.
+        fov (float): Horizontal field of view in degrees.
+        pull_distance (float): Distance an object is moved by joint_pull in meters.
+    """
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, view_range=3.0, fov=90.0, pull_distance=0.5):
+        self.snapshot_dir = snapshot_dir
+        self.view_range = view_range
+        self.fov = fov
+        self.pull_distance = pull_distance
+        self.lock = threading.Lock()
+        self.snapshots = {}
+        self.snapshot = None
+        self.calls = Counter()
+        self.handlers = {
+            "v1/env/select_scene": self.select_scene,
+            "v1/env/scene_reset": self.scene_reset,
+            "v1/env/robot_setup": self.robot_setup,
+            "v1/agent/robot_teleport": self.robot_teleport,
+            "v1/env/move_object": self.move_object,
+            "v1/info/get_object_info": self.get_object_info,
+            "v1/info/get_reachable_points": self.get_reachable_points,
+            "v1/agent/pick": self.pick,
+            "v1/env/get_obs": self.get_obs,
+            "v1/info/get_object_neighbors": self.get_object_neighbors,
+            "v1/info/robot_status": self.robot_status,
+            "v1/info/object_type": self.object_type,
+            "v1/agent/place": self.place,
+            "v1/agent/joint_pull": self.joint_pull,
+        }
+        self.reset()
+
+    def handle(self, endpoint, payload):
+        handler = self.handlers.get(endpoint)
+        if handler is None:
+            return None
+        with self.lock:
+            self.calls[endpoint] += 1
+            if self.snapshot is None and endpoint != "v1/env/select_scene":
+                return {"result": "Failed", "error_info": "No scene selected"}
+            return handler(payload)
+
+    def reset(self):
+        snapshot = self.snapshot or {}
+        self.objects = copy.deepcopy(snapshot.get("objects", {}))
+        self.types = copy.deepcopy(snapshot.get("object_types", {}))
+        self.neighbors = copy.deepcopy(snapshot.get("neighbors", {}))
+        self.floor = snapshot.get("floor", "Floor")
+        self.robots = {}  # {name: {"config", "location", "rotation", "holding"}}
+
+    # v1/env
+
+    def select_scene(self, payload):
+        scene_id = str(payload.get("scene_id"))
+        if scene_id not in self.snapshots:
+            snapshot = load_snapshot(scene_id, self.snapshot_dir)
+            if snapshot is None:
+                return {"result": "Failed", "error_info": "No snapshot of scene %s" % scene_id}
+            self.snapshots[scene_id] = snapshot
+        self.snapshot = self.snapshots[scene_id]
+        self.reset()
+        return SUCCESS
+
+    def scene_reset(self, payload):
+        self.reset()
+        return SUCCESS
+
+    def robot_setup(self, payload):
+        """The robots of the payload replace the robots of the scene, a robot set up again
+        keeps the object it holds."""
+        previous, self.robots = self.robots, {}
+        for config in payload.values():
+            name = config["name"]
+            self.robots[name] = {
+                "config": config,
+                "location": list(config["init_location"]),
+                "rotation": list(config["init_rotation"]),
+                "holding": previous[name]["holding"] if name in previous else None,
+            }
+        for name, robot in previous.items():
+            if name not in self.robots and robot["holding"] is not None:
+                self.objects[robot["holding"]]["location"] = list(robot["location"])
+                self._settle(robot["holding"])
+        return SUCCESS
+
+    def move_object(self, payload):
+        for name, pose in payload.items():
+            location = pose.get("init_location", pose.get("location"))
+            rotation = pose.get("init_rotation", pose.get("rotation"))
+            if name in self.robots:
+                self._move_robot(name, location, rotation)
+                continue
+            info = self.objects.setdefault(name, {})
+            if location is not None:
+                info["location"] = list(location)
+            if rotation is not None:
+                info["rotation"] = list(rotation)
+            self._settle(name)
+        return SUCCESS
+
+    def get_obs(self, payload):
+        res = {}
+        for name in payload.get("robot_list", []):
+            robot = self.robots.get(name)
+            if robot is None:
+                continue
+            x, _, z = robot["location"]
+            yaw = robot["rotation"][1]
+            held = {r["holding"] for r in self.robots.values()}
+            seen = []
+            for obj, info in self.objects.items():
+                if obj in held or "location" not in info:
+                    continue
+                dx, dz = info["location"][0] - x, info["location"][2] - z
+                distance = math.hypot(dx, dz)
+                if distance > self.view_range:
+                    continue
+                angle = (math.degrees(math.atan2(dx, dz)) - yaw + 180) % 360 - 180
+                if distance < 1e-6 or abs(angle) <= self.fov / 2:
+                    seen.append(obj)
+            res[name] = sorted(seen)
+        return res
+
+    # v1/agent
+
+    def robot_teleport(self, payload):
+        for name, pose in payload.items():
+            if name in self.robots:
+                self._move_robot(name, pose.get("location"), pose.get("rotation"))
+        return SUCCESS
+
+    def pick(self, payload):
+        for name, order in payload.items():
+            robot = self.robots.get(name)
+            obj = order.get("object_name")
+            if robot is None or obj not in self.objects:
+                return {"result": "Failed", "error_info": "Unknown robot or object"}
+            robot["holding"] = obj
+            self._detach(obj)
+            self.neighbors[obj] = {}
+        return SUCCESS
+
+    def place(self, payload):
+        for name, order in payload.items():
+            robot = self.robots.get(name)
+            if robot is None or robot["holding"] is None:
+                return {"result": "Failed", "error_info": "Robot is not holding an item"}
+            obj = robot["holding"]
+            robot["holding"] = None
+            self.objects[obj]["location"] = list(order.get("target_location", robot["location"]))
+            self.objects[obj]["rotation"] = list(order.get("target_rotation", [0, 0, 0]))
+            self._settle(obj)
+        return SUCCESS
+
+    def joint_pull(self, payload):
+        obj = payload.get("object_name")
+        if obj not in self.objects:
+            return {"result": "Failed", "error_info": "Unknown object %s" % obj}
+        if any(name not in self.robots for name in payload.get("robot_list", [])):
+            return {"result": "Failed", "error_info": "Unknown robot"}
+        direction = parse_vector(payload.get("direction", "(0, 0, 0)"))[:3]
+        norm = math.sqrt(sum(d * d for d in direction)) or 1.0
+        offset = [self.pull_distance * d / norm for d in direction]
+        location = self.objects[obj]["location"]
+        self.objects[obj]["location"] = [round(v + d, 4) for v, d in zip(location, offset)]
+        for key in (obj + "EdgePoints", obj + "PutPoints"):
+            if isinstance(self.types.get(key), str):
+                self.types[key] = shift_points(self.types[key], offset)
+        return SUCCESS
+
+    # v1/info
+
+    def get_object_info(self, payload):
+        res = {}
+        for name in payload.get("object_list", []):
+            if name in self.robots:
+                robot = self.robots[name]
+                res[name] = {"location": list(robot["location"]), "rotation": list(robot["rotation"])}
+            elif name in self.objects:
+                info = copy.deepcopy(self.objects[name])
+                holder = self._holder(name)
+                if holder is not None:
+                    info["location"] = list(self.robots[holder]["location"])
+                res[name] = info
+        return res
+
+    def get_reachable_points(self, payload):
+        recorded = self.snapshot["reachable_points"]
+        step = "%g" % float(payload.get("step_size", 0.1))
+        if step not in recorded:
+            return {"reachable_point": [], "error_info": "No reachable points recorded for step %s" % step}
+        return {"reachable_point": recorded[step]}
+
+    def get_object_neighbors(self, payload):
+        return {
+            name: copy.deepcopy(self.neighbors.get(name, {}))
+            for name in payload.get("object_list", [])
+            if name in self.objects
+        }
+
+    def robot_status(self, payload):
+        res = {}
+        for name in payload.get("robot_list", []):
+            robot = self.robots.get(name)
+            if robot is None:
+                continue
+            config = robot["config"]
+            arm_length = config.get("arm_length", 1)
+            res[name] = {
+                "type": config.get("type"),
+                "hand": "True" if arm_length > 0 else "False",
+                "isHold": "True" if robot["holding"] is not None else "False",
+                "Holding": robot["holding"] or "None",
+                "armLength": arm_length,
+                "strength": config.get("strength", 0),
+                "robotHigh": config.get("robot_high"),
+                "robotLow": config.get("robot_low"),
+            }
+        return res
+
+    def object_type(self, payload):
+        data = {}
+        for name in payload.get("object_list", []):
+            for key in (name, name + "Placeable", name + "EdgePoints", name + "PutPoints"):
+                if key in self.types:
+                    data[key] = self.types[key]
+        return {"data": data}
+
+    # helpers
+
+    def _holder(self, obj):
+        return next((name for name, robot in self.robots.items() if robot["holding"] == obj), None)
+
+    def _move_robot(self, name, location, rotation):
+        robot = self.robots[name]
+        if location is not None:
+            robot["location"] = list(location)
+        if rotation is not None:
+            robot["rotation"] = list(rotation)
+
+    def _detach(self, obj):
+        """Remove `obj` from the neighbors of the other objects."""
+        for relations in self.neighbors.values():
+            for position in [p for p, neighbor in relations.items() if neighbor == obj]:
+                del relations[position]
+
+    def _settle(self, obj):
+        """Put `obj` on the placeable object with the nearest put point, else the floor."""
+        self._detach(obj)
+        x, y, z = self.objects[obj]["location"][:3]
+        support, best = self.floor, SUPPORT_RADIUS
+        for name in self.objects:
+            if name == obj or self.types.get(name + "Placeable") != "True":
+                continue
+            for point in (self.types.get(name + "PutPoints") or "").split(";"):
+                if not point.strip():
+                    continue
+                px, py, pz = parse_vector(point)[:3]
+                distance = math.hypot(px - x, pz - z)
+                if distance < best and py <= y + 0.1:
+                    support, best = name, distance
+        self.neighbors[obj] = {ON: support}
+
+
+def create_app(state, latency=0.0):
+    app = Flask(__name__)
+
+    @app.route("/<path:endpoint>", methods=["POST"])
+    def call(endpoint):
+        response = state.handle(endpoint, request.get_json(force=True, silent=True) or {})
+        if response is None:
+            return jsonify({"result": "Failed", "error_info": "Unknown endpoint %s" % endpoint}), 404
+        if latency > 0:
+            time.sleep(latency)
+        return jsonify(response)
+
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        with state.lock:
+            return jsonify(dict(state.calls))
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18766)
+    parser.add_argument("--snapshots", default=SNAPSHOT_DIR)
+    parser.add_argument("--view-range", type=float, default=3.0)
+    parser.add_argument("--fov", type=float, default=90.0)
+    parser.add_argument("--pull-distance", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay of every response in seconds")
+    args = parser.parse_args()
+
+    state = SimulatorState(args.snapshots, args.view_range, args.fov, args.pull_distance)
+    print("Simulator stand-in on http://%s:%d/ (snapshots: %s)" % (args.host, args.port, args.snapshots))
+    create_app(state, args.latency).run(host=args.host, port=args.port, threaded=True)
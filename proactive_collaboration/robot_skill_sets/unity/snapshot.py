@@ -0,0 +1,149 @@
+"""
+Recorded snapshots of the simulator scenes, served by sim_server.py.
+
+A snapshot holds everything the v1 API returns about a scene at select_scene time:
+the reachable points, and the info, type data and neighbors of every object. It is
+saved as gzip JSON in cfg/sim_snapshots/scene_<id>.json.gz:
+    {
+        "scene_id": "0",
+        "floor": "Floor",
+        "objects": {name: get_object_info entry},
+        "object_types": get_object_type(...)["data"],
+        "neighbors": get_object_neighbors(...),
+        "reachable_points": {"0.1": get_reachable_points(...)["reachable_point"]},
+    }
+
+Capture (from proactive_collaboration/, with the simulator running):
+    python robot_skill_sets/unity/snapshot.py --scenes 0 1 --datasets ../dataset/dataset_s*_72.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+CONSTANTS_PATH = os.path.join(REPO_DIR, "cfg", "constants.json")
+SNAPSHOT_DIR = os.path.join(REPO_DIR, "cfg", "sim_snapshots")
+# robot used to look around the scene while capturing
+PROBE_ROBOT = {
+    "type": "LoCoBot",
+    "name": "Robot_0",
+    "init_location": [0, 0.9, 0],
+    "init_rotation": [0, 0, 0],
+    "robot_high": 3,
+    "robot_low": -0.5,
+    "arm_length": 1,
+    "strength": 100,
+}
+
+
+def snapshot_path(scene_id, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, "scene_%s.json.gz" % scene_id)
+
+
+def save_snapshot(snapshot, directory=SNAPSHOT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(snapshot_path(snapshot["scene_id"], directory), "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+def load_snapshot(scene_id, directory=SNAPSHOT_DIR):
+    """Snapshot of the scene, None if it has not been captured."""
+    path = snapshot_path(scene_id, directory)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def capture_snapshot(scene_id, explore_points, extra_objects=(), step_sizes=(0.1,), yaws=(0, 90, 180, 270)):
+    """
+    Capture a snapshot from the running simulator (args/select_args.json).
+
+    The object list is the union of what a probe robot sees at every explore point of
+    the scene and every yaw, plus `extra_objects` (e.g. the misplaced objects of the
+    dataset, which may be hidden at select_scene time).
+
+    Args:
+        scene_id (str): Scene to capture.
+        explore_points (dict): {room_name: [[x, y, z], ...]}, EXPLOREPOINTS of the scene.
+        extra_objects (iterable): Object names to add to the snapshot.
+        step_sizes (tuple): Step sizes of the recorded reachable points.
+        yaws (tuple): Headings of the probe robot at every explore point.
+
+    Returns:
+        dict: The snapshot.
+    """
+    from ue_api import (
+        get_object_info,
+        get_object_neighbors,
+        get_object_type,
+        get_reachable_points,
+        get_robot_obs,
+        robot_setup,
+        robot_teleport,
+        select_scene,
+    )
+
+    select_scene(scene_id)
+    time.sleep(2)
+    reachable_points = {
+        "%g" % step: get_reachable_points({"step_size": step})["reachable_point"] for step in step_sizes
+    }
+
+    probe = PROBE_ROBOT["name"]
+    robot_setup({probe: PROBE_ROBOT})
+    seen = set(extra_objects)
+    for points in explore_points.values():
+        for point in points:
+            for yaw in yaws:
+                robot_teleport({probe: {"location": point, "rotation": [0, yaw, 0]}})
+                seen.update(get_robot_obs({"robot_list": [probe]}).get(probe) or [])
+    seen.discard(probe)
+    object_list = sorted(seen)
+
+    infos = get_object_info({"object_list": object_list})
+    neighbors = get_object_neighbors({"object_list": object_list})
+    floor = "Floor"
+    for relations in neighbors.values():
+        if isinstance(relations, dict):
+            floor = next((name for name in relations.values() if "loor" in str(name)), floor)
+    # select_scene again so the object info is not disturbed by the probe robot
+    select_scene(scene_id)
+    time.sleep(2)
+    return {
+        "scene_id": str(scene_id),
+        "floor": floor,
+        "objects": {name: infos[name] for name in object_list if name in infos},
+        "object_types": get_object_type({"object_list": object_list}).get("data", {}),
+        "neighbors": {name: neighbors[name] for name in object_list if name in neighbors},
+        "reachable_points": reachable_points,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", nargs="*", default=None, help="default: every scene of EXPLOREPOINTS")
+    parser.add_argument("--datasets", nargs="*", default=[], help="dataset files whose misplaced objects are added")
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    with open(CONSTANTS_PATH, "r") as f:
+        explore_points = json.load(f)["EXPLOREPOINTS"]
+    misplaced = {}
+    for pattern in args.datasets:
+        for path in glob.glob(pattern):
+            with open(path, "r") as f:
+                for episode in json.load(f):
+                    misplaced.setdefault(str(episode["scene_index"]), set()).update(episode["misplaced_objects"])
+
+    for scene in args.scenes or list(explore_points):
+        start_time = time.time()
+        snapshot = capture_snapshot(scene, explore_points[scene], misplaced.get(scene, ()))
+        save_snapshot(snapshot, args.out)
+        print(
+            "scene %s: %d objects, %.2fs -> %s"
+            % (scene, len(snapshot["objects"]), time.time() - start_time, snapshot_path(scene, args.out))
+        )
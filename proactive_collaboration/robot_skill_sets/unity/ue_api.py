@@ -7,28 +7,398 @@
 # import os
 # os.environ['NO_PROXY'] = '127.0.0.1,localhost'
 
-import base64
+import gzip
+import json
+import os
 import pprint
+import threading
 import time
-from io import BytesIO
+from collections import defaultdict, deque
 
-import cv2
-import matplotlib.pyplot as plt
-import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
-# import torch
-from flask import Flask, jsonify, request
-from PIL import Image
-import json
-
-from tenacity import retry, stop_after_attempt, wait_random_exponential
-
-app = Flask(__name__)
+# only the HTTP client is imported here: cv2 / matplotlib / flask / PIL were never used by
+# the API calls and made every `import env` pay for them (see benchmarks/bench_startup.py)
 
 # REMOTE_URL = "http://127.0.0.1:1217/"
-REMOTE_URL = json.load(open('args/select_args.json','r'))["remote_url"]
+SELECT_ARGS_PATH = "args/select_args.json"
+# default endpoint, read from SELECT_ARGS_PATH on first use unless set with `configure`
+REMOTE_URL = None
+# keep-alive connections kept per simulator endpoint, >= the number of robots acting in parallel
+POOL_SIZE = None
+DEFAULT_POOL_SIZE = 16
 HEADERS = {"Content-Type": "application/json"}
+
+
+class SimulatorClient:
+    """
+    Keep-alive HTTP client for one simulator endpoint.
+
+    All threads share a single connection pool (one HTTPAdapter). Each thread gets its
+    own requests.Session mounted on that adapter, so the sessions' non thread-safe state
+    (cookies, hooks) is never shared while TCP connections are reused across threads.
+    With pool_block=True a thread waits for a free connection instead of opening a
+    throwaway one when more than `pool_size` requests are in flight.
+
+    The traffic can be recorded to or replayed from a trace, see `start_traffic`.
+    """
+
+    def __init__(self, remote_url, pool_size=DEFAULT_POOL_SIZE, timeout=20):
+        self.remote_url = remote_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True
+        )
+        self._local = threading.local()
+        self.recorder = None  # TrafficRecorder
+        self.replayer = None  # TrafficReplayer
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def post(self, suffix, json):
+        if self.replayer is not None:
+            return self.replayer.post(suffix, json)
+        start = time.time()
+        with self._session().post(
+            self.remote_url + suffix, json=json, timeout=self.timeout
+        ) as response:
+            result = response.json()
+            if self.recorder is not None:
+                self.recorder.record(
+                    suffix, json, result, start, time.time() - start, len(response.content)
+                )
+            return result
+
+    def close(self):
+        self.adapter.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _load_defaults():
+    """Fill the unset REMOTE_URL / POOL_SIZE from SELECT_ARGS_PATH (if it exists)."""
+    global REMOTE_URL, POOL_SIZE
+    with _clients_lock:
+        if REMOTE_URL is not None and POOL_SIZE is not None:
+            return
+        select_args = {}
+        if os.path.exists(SELECT_ARGS_PATH):
+            with open(SELECT_ARGS_PATH, "r") as f:
+                select_args = json.load(f)
+        if REMOTE_URL is None:
+            REMOTE_URL = select_args.get("remote_url")
+        if POOL_SIZE is None:
+            POOL_SIZE = int(select_args.get("pool_size", DEFAULT_POOL_SIZE))
+
+
+def get_client(remote_url=None):
+    """Return the shared SimulatorClient of `remote_url` (default: REMOTE_URL)."""
+    if POOL_SIZE is None or (remote_url is None and REMOTE_URL is None):
+        _load_defaults()
+    remote_url = remote_url or REMOTE_URL
+    if remote_url is None:
+        raise ValueError(f"No simulator endpoint: pass remote_url, call configure() or create {SELECT_ARGS_PATH}.")
+    client = _clients.get(remote_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(remote_url)
+            if client is None:
+                client = SimulatorClient(remote_url, POOL_SIZE)
+                _clients[remote_url] = client
+    return client
+
+
+def configure(remote_url=None, pool_size=None):
+    """
+    Change the default simulator endpoint and/or the connection pool size.
+    When the pool size changes, existing clients are closed and rebuilt on next use.
+    """
+    global REMOTE_URL, POOL_SIZE
+    with _clients_lock:
+        if remote_url is not None:
+            REMOTE_URL = remote_url
+        if pool_size is not None and int(pool_size) != POOL_SIZE:
+            POOL_SIZE = int(pool_size)
+            for client in _clients.values():
+                client.close()
+            _clients.clear()
+    return get_client()
+
+
+def _payload_key(suffix, payload):
+    return suffix + " " + json.dumps(payload, sort_keys=True)
+
+
+class TrafficStats:
+    """Per-endpoint call count, bytes sent / received and time of the simulator traffic."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = defaultdict(lambda: {"calls": 0, "bytes_out": 0, "bytes_in": 0, "seconds": 0.0})
+
+    def add(self, suffix, bytes_out, bytes_in, seconds):
+        with self._lock:
+            entry = self.endpoints[suffix]
+            entry["calls"] += 1
+            entry["bytes_out"] += bytes_out
+            entry["bytes_in"] += bytes_in
+            entry["seconds"] += seconds
+
+    def summary(self):
+        with self._lock:
+            endpoints = {suffix: dict(entry) for suffix, entry in sorted(self.endpoints.items())}
+        total = {"calls": 0, "bytes_out": 0, "bytes_in": 0, "seconds": 0.0}
+        for entry in endpoints.values():
+            for key in total:
+                total[key] += entry[key]
+        return {"endpoints": endpoints, "total": total}
+
+
+class TrafficRecorder:
+    """
+    Writes every request / response pair of a client to a gzip JSONL trace, one line per
+    call: {"endpoint", "request", "response", "start", "elapsed", "bytes_out", "bytes_in"}.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.stats = TrafficStats()
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def record(self, suffix, payload, response, start, elapsed, bytes_in):
+        bytes_out = len(json.dumps(payload))
+        line = json.dumps(
+            {
+                "endpoint": suffix,
+                "request": payload,
+                "response": response,
+                "start": start,
+                "elapsed": elapsed,
+                "bytes_out": bytes_out,
+                "bytes_in": bytes_in,
+            }
+        )
+        self.stats.add(suffix, bytes_out, bytes_in, elapsed)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay when a request is not in the trace."""
+
+
+# endpoints answering for a list of names with one entry per name: {endpoint: (list field,
+# names of the response entries of a name)}
+LIST_ENDPOINTS = {
+    "v1/env/get_obs": ("robot_list", lambda name: (name,)),
+    "v1/info/get_object_info": ("object_list", lambda name: (name,)),
+    "v1/info/get_object_neighbors": ("object_list", lambda name: (name,)),
+    "v1/info/robot_status": ("robot_list", lambda name: (name,)),
+    "v1/info/object_type": (
+        "object_list",
+        lambda name: (name, name + "Placeable", name + "EdgePoints", name + "PutPoints"),
+    ),
+}
+
+
+def _response_entries(suffix, response):
+    """The {name: entry} dict of a list endpoint response (object_type nests it in "data")."""
+    if suffix == "v1/info/object_type":
+        return response.get("data") if isinstance(response, dict) else None
+    return response
+
+
+def split_list_call(suffix, payload, response):
+    """
+    {name: part of the response} of a list endpoint call, None if the call is not a list
+    call or its response has entries of no requested name (e.g. an error).
+    """
+    if suffix not in LIST_ENDPOINTS or not isinstance(payload, dict):
+        return None
+    field, entry_keys = LIST_ENDPOINTS[suffix]
+    names = payload.get(field)
+    entries = _response_entries(suffix, response)
+    if set(payload) != {field} or not isinstance(names, list) or not isinstance(entries, dict):
+        return None
+    parts = {}
+    for name in dict.fromkeys(names):
+        parts[name] = {key: entries[key] for key in entry_keys(name) if key in entries}
+    if sum(len(part) for part in parts.values()) != len(entries):
+        return None
+    return parts
+
+
+class TrafficReplayer:
+    """
+    Serves the responses of a trace written by TrafficRecorder, keyed by endpoint and
+    payload. Identical requests get the recorded responses in their recorded order, the
+    last one is repeated once they are used up.
+
+    The calls of the LIST_ENDPOINTS are served per name instead: every recorded call is
+    split into the response of each name it asked for, and a replayed call gets the merged
+    responses of its names. Which names are fetched together (ObservationBatcher,
+    get_object_meta) depends on the thread timing of the robots, so the recorded batches
+    would rarely be asked again as they were.
+
+    Args:
+        path (str): The gzip JSONL trace.
+        timed (bool): Sleep the recorded elapsed time of every call, to replay with the
+            latency of the simulator.
+    """
+
+    def __init__(self, path, timed=False):
+        self.path = path
+        self.timed = timed
+        self.stats = TrafficStats()
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._responses = defaultdict(deque)
+        self._parts = defaultdict(deque)  # {(endpoint, name): deque of (part, elapsed)}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    parts = split_list_call(entry["endpoint"], entry["request"], entry["response"])
+                    if parts is None:
+                        self._responses[_payload_key(entry["endpoint"], entry["request"])].append(entry)
+                        continue
+                    for name, part in parts.items():
+                        self._parts[(entry["endpoint"], name)].append((part, entry["elapsed"]))
+
+    @staticmethod
+    def _next(entries):
+        return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def post(self, suffix, payload):
+        key = _payload_key(suffix, payload)
+        with self._lock:
+            entries = self._responses.get(key)
+            if entries:
+                entry = self._next(entries)
+            else:
+                entry = self._merge(suffix, payload)
+            if entry is None:
+                self.misses += 1
+                raise ReplayMiss(f"No recorded response for {suffix} {payload}")
+        if self.timed:
+            time.sleep(entry["elapsed"])
+        self.stats.add(suffix, entry["bytes_out"], entry["bytes_in"], entry["elapsed"])
+        return entry["response"]
+
+    def _merge(self, suffix, payload):
+        """Entry of a list endpoint call built from the recorded responses of its names, None on a miss."""
+        if suffix not in LIST_ENDPOINTS or not isinstance(payload, dict):
+            return None
+        field, _ = LIST_ENDPOINTS[suffix]
+        names = payload.get(field)
+        if set(payload) != {field} or not isinstance(names, list):
+            return None
+        names = list(dict.fromkeys(names))
+        if not all(self._parts.get((suffix, name)) for name in names):
+            return None
+        entries = {}
+        elapsed = 0.0
+        for name in names:
+            part, part_elapsed = self._next(self._parts[(suffix, name)])
+            entries.update(part)
+            elapsed = max(elapsed, part_elapsed)
+        # a fresh copy, the parts are shared with the other calls asking for the same names
+        text = json.dumps({"data": entries} if suffix == "v1/info/object_type" else entries)
+        return {
+            "response": json.loads(text),
+            "elapsed": elapsed,
+            "bytes_out": len(json.dumps(payload)),
+            "bytes_in": len(text),
+        }
+
+    def close(self):
+        pass
+
+
+def start_traffic(mode, path, remote_url=None, timed=False):
+    """
+    Record the traffic of a client to `path` (mode "record") or serve it from the trace
+    at `path` (mode "replay", `timed` replays the recorded latency). Ends any recording
+    or replay already running on that client.
+    """
+    client = get_client(remote_url)
+    stop_traffic(remote_url)
+    if mode == "record":
+        client.recorder = TrafficRecorder(path)
+    elif mode == "replay":
+        client.replayer = TrafficReplayer(path, timed)
+    else:
+        raise ValueError(f"traffic mode must be 'record' or 'replay', got {mode!r}")
+    return client
+
+
+def stop_traffic(remote_url=None):
+    """End the recording / replay of a client, returns its per-endpoint stats or None."""
+    client = get_client(remote_url)
+    stats = None
+    for attr in ("recorder", "replayer"):
+        handler = getattr(client, attr)
+        if handler is not None:
+            handler.close()
+            stats = handler.stats.summary()
+            if attr == "replayer":
+                stats["misses"] = handler.misses
+            setattr(client, attr, None)
+    return stats
+
+
+# a request missing from a replayed trace is not retried
+sim_retry = retry(
+    wait=wait_random_exponential(multiplier=1, max=40),
+    stop=stop_after_attempt(5),
+    retry=retry_if_not_exception_type(ReplayMiss),
+)
+
+
+_state_listeners = []
+
+
+def add_state_listener(listener):
+    """
+    Register `listener(event, client, payload)`. It is called after every call that changes
+    the scene state (select_scene, scene_reset, robot_setup, move_object, pick, place,
+    joint_pull), e.g. to invalidate caches built from earlier responses of that client.
+    """
+    if listener not in _state_listeners:
+        _state_listeners.append(listener)
+
+
+def _notify(event, client, payload):
+    for listener in list(_state_listeners):
+        listener(event, client, payload)
+
+
 INFO_DATA = {"ID": -1, "ImageSize": [-1, -1]}
 # RGB_DATA = {
 #     "ID": -1,
@@ -37,23 +407,25 @@ INFO_DATA = {"ID": -1, "ImageSize": [-1, -1]}
 # GATE_INIT_DICT = {"x": -469, "y": 673, "z": 168}
 # AGENTS_NAME = ["BP_Player_C_1", "BP_Dogbot_C_1", "BP_Soldier_C_0", "BP_Soldier_C_1"]
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def select_scene(contant = 5,suffix="v1/env/select_scene"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def select_scene(contant = 5,suffix="v1/env/select_scene", client=None):
     json = {
         "scene_id": contant
     }
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("select_scene", client, json)
+    return response
 
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def scene_reset(suffix="v1/env/scene_reset"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def scene_reset(suffix="v1/env/scene_reset", client=None):
     json = {
-    }   
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    }
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("scene_reset", client, json)
+    return response
 
 setup = {
     "robot_0": {
@@ -81,12 +453,13 @@ setup = {
     
 }
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def robot_setup(contant=setup, suffix="v1/env/robot_setup"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def robot_setup(contant=setup, suffix="v1/env/robot_setup", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("robot_setup", client, json)
+    return response
 
 
 teleport = {
@@ -107,12 +480,10 @@ teleport = {
     }
 }
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def robot_teleport(contant = teleport, suffix="v1/agent/robot_teleport"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def robot_teleport(contant = teleport, suffix="v1/agent/robot_teleport", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
     
 
 moveApple = {
@@ -128,33 +499,30 @@ moveApple = {
     }
 }
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def move_object(contant=moveApple, suffix = "v1/env/move_object"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def move_object(contant=moveApple, suffix = "v1/env/move_object", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("move_object", client, json)
+    return response
 
 getApple = {
     "object_list":["fridge_16","Robot_0"]
 }
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_object_info(contant = getApple, suffix = "v1/info/get_object_info"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_object_info(contant = getApple, suffix = "v1/info/get_object_info", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
 
 stepsize = {
     "step_size": 0.1
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_reachable_points(contant = stepsize, suffix = "v1/info/get_reachable_points"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_reachable_points(contant = stepsize, suffix = "v1/info/get_reachable_points", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
 
 robotPickup = {
         "Robot_0":
@@ -163,54 +531,47 @@ robotPickup = {
         }
     }
 
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def pick_up(contant = robotPickup, suffix = "v1/agent/pick"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def pick_up(contant = robotPickup, suffix = "v1/agent/pick", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("pick", client, json)
+    return response
 
 robot_list = {
     "robot_list":["Robot_1"]
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_robot_obs(contant = robot_list, suffix = "v1/env/get_obs"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_robot_obs(contant = robot_list, suffix = "v1/env/get_obs", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
 
 getNeighbor = {
     "object_list":["Pillow_11","Pillow_02","AlarmClock_01"]
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_object_neighbors(contant = getNeighbor, suffix = "v1/info/get_object_neighbors"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_object_neighbors(contant = getNeighbor, suffix = "v1/info/get_object_neighbors", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
 
 
 getRobotStatus = {
     "robot_list":["Robot_1","Robot_0","Robot_2"]
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_robot_status(contant = getRobotStatus, suffix = "v1/info/robot_status"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_robot_status(contant = getRobotStatus, suffix = "v1/info/robot_status", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
 
 
 getObjectType = {
     "object_list":["Toilet_01","Bed_01","AlarmClock_01"]
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def get_object_type(contant = getObjectType, suffix = "v1/info/object_type"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def get_object_type(contant = getObjectType, suffix = "v1/info/object_type", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    return (client or get_client()).post(suffix, json)
     
 
 placeLocatioin =   {
@@ -221,12 +582,13 @@ placeLocatioin =   {
             "target_rotation": [0,0,0]
         }
     }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def place_object(contant = placeLocatioin, suffix = "v1/agent/place"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def place_object(contant = placeLocatioin, suffix = "v1/agent/place", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("place", client, json)
+    return response
 
 
 pullInfos = {
@@ -234,12 +596,13 @@ pullInfos = {
   "object_name": "Bed_01",
   "direction": "(1,0,0)"
 }
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(5))
-def pull_object(contant = pullInfos, suffix = "v1/agent/joint_pull"):
-    remote_url = REMOTE_URL + suffix
+@sim_retry
+def pull_object(contant = pullInfos, suffix = "v1/agent/joint_pull", client=None):
     json = contant
-    with requests.post(remote_url, json=json, headers=HEADERS, timeout=20) as response:
-        return response.json()
+    client = client or get_client()
+    response = client.post(suffix, json)
+    _notify("joint_pull", client, json)
+    return response
     
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+"""
+Run the episodes of a dataset in parallel over several simulator endpoints.
+
+One worker process per endpoint pulls episode ids from a shared queue, so a fast
+endpoint simply takes more episodes. A failed episode is put back in the queue and
+retried (on any endpoint) up to --retries times, a worker whose endpoint fails
+--max-failures episodes in a row retires, and a crashed worker is restarted. Episodes
+with a result file in the save directory are skipped, so an interrupted sweep can be
+resumed by running the same command again.
+
+Usage (from proactive_collaboration/, args/select_args.json must exist):
+    python runner.py --scene 0 --endpoints 192.168.1.53:7210-7249 --exclude-ports 7226
+    python runner.py --scene 0 --endpoints http://127.0.0.1:18766/ http://127.0.0.1:18767/
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import re
+import time
+import traceback
+
+ENDPOINT_PATTERN = re.compile(r"^(?:(https?)://)?([^:/]+):(\d+)(?:-(\d+))?/?$")
+
+
+def expand_endpoints(specs, exclude_ports=()):
+    """
+    Endpoint URLs of "http://host:port/" or "host:first-last" port range specs.
+
+    Returns:
+        list: ["http://host:port/", ...] without duplicates, in order.
+    """
+    endpoints = []
+    for spec in specs:
+        match = ENDPOINT_PATTERN.match(spec.strip())
+        if match is None:
+            raise ValueError(f"Invalid endpoint: {spec}")
+        scheme, host, first, last = match.groups()
+        for port in range(int(first), int(last or first) + 1):
+            url = f"{scheme or 'http'}://{host}:{port}/"
+            if port not in exclude_ports and url not in endpoints:
+                endpoints.append(url)
+    return endpoints
+
+
+def finished_episodes(save_dir):
+    """Ids of the episodes with a dataset_<id>.json result in `save_dir`."""
+    if not os.path.isdir(save_dir):
+        return set()
+    done = set()
+    for name in os.listdir(save_dir):
+        match = re.match(r"^dataset_(\d+)\.json$", name)
+        if match:
+            done.add(int(match.group(1)))
+    return done
+
+
+def worker(endpoint, config, tasks, results):
+    """
+    Worker process of one endpoint: runs the episodes taken from `tasks` until it gets
+    None and reports ("start" | "done" | "failed", endpoint, episode id, info) to
+    `results`. After config["max_failures"] failures in a row it reports "retired" and
+    exits without taking another episode.
+    """
+    if config["log_dir"]:
+        from logger_manager import LoggerManager
+
+        port = endpoint.rstrip("/").split(":")[-1]
+        LoggerManager(os.path.join(config["log_dir"], port))
+
+    import main
+    from episode_context import EpisodeContext
+
+    context = EpisodeContext(
+        endpoint,
+        config["scene"],
+        dataset=config["dataset"],
+        save_dir=config["save_dir"],
+        trace_dir=config["trace_dir"],
+    )
+
+    failures = 0
+    while failures < config["max_failures"]:
+        dataset_id = tasks.get()
+        if dataset_id is None:
+            return
+        results.put(("start", endpoint, dataset_id, None))
+        start_time = time.time()
+        try:
+            if_success = main.run(dataset_id, context)
+        except Exception:
+            failures += 1
+            results.put(("failed", endpoint, dataset_id, traceback.format_exc()))
+        else:
+            failures = 0
+            results.put(("done", endpoint, dataset_id, {"success": if_success, "seconds": time.time() - start_time}))
+    results.put(("retired", endpoint, None, None))
+
+
+class EpisodeRunner:
+    """
+    Args:
+        endpoints (list): Simulator endpoint URLs, one worker each.
+        scene (str): Scene of the dataset.
+        dataset (str): Dataset file.
+        save_dir (str): Directory of the episode results.
+        trace_dir (str): Directory of the simulator traffic traces.
+        log_dir (str): Root of the per-endpoint log directories, None to keep stdout.
+        retries (int): Max retries of a failed episode.
+        max_failures (int): Consecutive failures after which an endpoint is retired.
+    """
+
+    def __init__(self, endpoints, scene, dataset, save_dir, trace_dir, log_dir=None, retries=2, max_failures=3):
+        self.endpoints = endpoints
+        self.config = {
+            "scene": scene,
+            "dataset": dataset,
+            "save_dir": save_dir,
+            "trace_dir": trace_dir,
+            "log_dir": log_dir,
+            "max_failures": max_failures,
+        }
+        self.retries = retries
+        self.max_failures = max_failures
+        self.context = multiprocessing.get_context("spawn")
+
+    def _start_worker(self, endpoint, tasks, results):
+        process = self.context.Process(
+            target=worker, args=(endpoint, self.config, tasks, results), name=f"episode-worker-{endpoint}", daemon=True
+        )
+        process.start()
+        return process
+
+    def run(self, dataset_ids):
+        """
+        Run the episodes `dataset_ids` that are not finished yet.
+
+        Returns:
+            dict: {"done": {id: {"success", "seconds", "endpoint"}}, "failed": {id: last traceback},
+                "skipped": [ids], "retired": [endpoints], "seconds": wall time}
+        """
+        start_time = time.time()
+        finished = finished_episodes(self.config["save_dir"])
+        pending = [i for i in dataset_ids if i not in finished]
+        summary = {"done": {}, "failed": {}, "skipped": sorted(set(dataset_ids) & finished), "retired": []}
+        print(f"{len(pending)} episodes to run on {len(self.endpoints)} endpoints, {len(summary['skipped'])} already finished")
+        if not pending or not self.endpoints:
+            summary["failed"].update({i: "no endpoint" for i in pending})
+            summary["seconds"] = time.time() - start_time
+            return summary
+
+        tasks = self.context.Queue()
+        results = self.context.Queue()
+        for dataset_id in pending:
+            tasks.put(dataset_id)
+        attempts = {dataset_id: 0 for dataset_id in pending}
+        running = {}  # {endpoint: dataset id}
+        workers = {endpoint: self._start_worker(endpoint, tasks, results) for endpoint in self.endpoints}
+        unresolved = len(pending)
+
+        def fail(endpoint, dataset_id, error):
+            nonlocal unresolved
+            attempts[dataset_id] += 1
+            if attempts[dataset_id] <= self.retries:
+                print(f"episode {dataset_id} failed on {endpoint}, retry {attempts[dataset_id]}/{self.retries}")
+                tasks.put(dataset_id)
+            else:
+                print(f"episode {dataset_id} failed on {endpoint}, giving up")
+                summary["failed"][dataset_id] = error
+                unresolved -= 1
+
+        while unresolved > 0 and workers:
+            try:
+                kind, endpoint, dataset_id, info = results.get(timeout=1)
+            except queue.Empty:
+                kind = None
+            if kind == "start":
+                running[endpoint] = dataset_id
+            elif kind == "done":
+                running.pop(endpoint, None)
+                summary["done"][dataset_id] = dict(info, endpoint=endpoint)
+                unresolved -= 1
+                print(f"episode {dataset_id} done on {endpoint}: success={info['success']}, {info['seconds']:.0f}s ({unresolved} left)")
+            elif kind == "failed":
+                running.pop(endpoint, None)
+                fail(endpoint, dataset_id, info)
+            elif kind == "retired" and endpoint in workers:
+                print(f"retiring endpoint {endpoint} after {self.max_failures} failures in a row")
+                summary["retired"].append(endpoint)
+                workers.pop(endpoint).join()
+
+            # restart crashed workers (a retired worker exits with code 0 before its message is read)
+            for endpoint, process in list(workers.items()):
+                if process.is_alive() or process.exitcode == 0:
+                    continue
+                print(f"worker of {endpoint} exited with code {process.exitcode}, restarting")
+                if endpoint in running:
+                    fail(endpoint, running.pop(endpoint), f"worker exited with code {process.exitcode}")
+                workers[endpoint] = self._start_worker(endpoint, tasks, results)
+
+        if unresolved > 0:
+            print("no endpoint left")
+            for dataset_id in pending:
+                if dataset_id not in summary["done"]:
+                    summary["failed"].setdefault(dataset_id, "no endpoint left")
+
+        for _ in workers:
+            tasks.put(None)
+        for process in workers.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        summary["seconds"] = time.time() - start_time
+        return summary
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoints", nargs="+", required=True, help='"http://host:port/" or "host:first-last" port ranges')
+    parser.add_argument("--exclude-ports", nargs="*", type=int, default=[])
+    parser.add_argument("--scene", default=None, help="default: the scene of args/select_args.json")
+    parser.add_argument("--dataset", default=None, help="default: datasets/dataset_s<scene>_72.json")
+    parser.add_argument("--save-dir", default=None, help="default: output/120_ours/<scene>")
+    parser.add_argument("--trace-dir", default=None, help="default: traces/120_ours/<scene>")
+    parser.add_argument("--log-dir", default=None, help="default: logs/120_ours/<scene>, 'none' to keep stdout")
+    parser.add_argument("--episodes", nargs="*", type=int, default=None, help="default: every episode of the dataset")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--max-failures", type=int, default=3)
+    args = parser.parse_args()
+
+    scene = args.scene if args.scene is not None else json.load(open("args/select_args.json", "r"))["scene"]
+    dataset = args.dataset or f"datasets/dataset_s{scene}_72.json"
+    log_dir = args.log_dir or f"logs/120_ours/{scene}"
+    with open(dataset, "r") as f:
+        episodes = args.episodes if args.episodes is not None else list(range(len(json.load(f))))
+
+    runner = EpisodeRunner(
+        expand_endpoints(args.endpoints, args.exclude_ports),
+        scene,
+        dataset,
+        args.save_dir or f"output/120_ours/{scene}",
+        args.trace_dir or f"traces/120_ours/{scene}",
+        None if log_dir.lower() == "none" else log_dir,
+        args.retries,
+        args.max_failures,
+    )
+    summary = runner.run(episodes)
+    success = sum(1 for info in summary["done"].values() if info["success"])
+    print()
+    print(f"done: {len(summary['done'])}, success: {success}, failed: {sorted(summary['failed'])}, "
+          f"skipped: {len(summary['skipped'])}, retired endpoints: {summary['retired']}, {summary['seconds'] / 60:.1f} min")
@@ -32,7 +32,7 @@ def get_robot_observation(robot, env, item_mapper):
 
 # TODO: Load from config
 def build_robot_from_config(
-    robot_config: dict, ROOMS=["bedroom"], TALK_ALGORITHM="plan"
+    robot_config: dict, ROOMS=["bedroom"], TALK_ALGORITHM="plan", llm=None
 ):
     from robot import Robot
 
@@ -48,16 +48,17 @@ def build_robot_from_config(
         room_list=ROOMS,
         manipulation_capacity=robot_config["strength"] > 0,
         comm_mode=TALK_ALGORITHM,
+        llm=llm,
     )
     return robot
 
 
-def init_robot_pool_and_team_from_config(env_robot_pool, env_robot_team, ROOMS):
+def init_robot_pool_and_team_from_config(env_robot_pool, env_robot_team, ROOMS, llm=None):
     robot_pool = []
     robot_team = []
     # init robot pool
     for _, robot_config in env_robot_pool.items():
-        robot = build_robot_from_config(robot_config, ROOMS)
+        robot = build_robot_from_config(robot_config, ROOMS, llm=llm)
         robot_pool.append(robot)
     # init robot team
     robot_team = [r for r in robot_pool if r.name in env_robot_team]
@@ -67,11 +68,14 @@ def init_robot_pool_and_team_from_config(env_robot_pool, env_robot_team, ROOMS):
 
 
 # TODO: Load ROOM_LIST and TALK_ALGORITHM from config
-def init_config(dataset_index: int, dataset_dir: str):
+def init_config(dataset_index: int, dataset_dir: str, context=None, **env_kwargs):
     """
     Init the environment, robot pool, robot team, rooms from the config file.
     Args:
         dataset_index (int): The index of the dataset in the config file.
+        context (EpisodeContext): Simulator endpoint and LLM client of the episode, None for
+            the process defaults.
+        env_kwargs: Extra keyword arguments of Env (e.g. cooperative_planning=True).
     Returns:
         env (Env): The environment object.
         robot_pool (list[Robot]): The robot pool.
@@ -89,9 +93,9 @@ def init_config(dataset_index: int, dataset_dir: str):
         scene_room = json.load(f)
         rooms = scene_room[str(scene_index)]
     robot_pool, robot_team = init_robot_pool_and_team_from_config(
-        env_robot_pool, env_robot_team, rooms
+        env_robot_pool, env_robot_team, rooms, llm=context.llm if context is not None else None
     )
-    env = Env(env_robot_pool, env_robot_team)
+    env = Env(env_robot_pool, env_robot_team, context=context, **env_kwargs)
     env.rooms = rooms
     env.init_scene(scene_index)
     time.sleep(1)